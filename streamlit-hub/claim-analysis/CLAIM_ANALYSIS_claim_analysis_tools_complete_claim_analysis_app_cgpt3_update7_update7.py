@@ -11,7 +11,6 @@ CXR Exchange  Final Unified Version
 import streamlit as st
 import json
 import pandas as pd
-import pyodbc
 import sys
 import os
 from typing import Dict, Any, Optional
@@ -29,6 +28,8 @@ from claim_corrector_claims3_archetype_driven_update10 import ArchetypeDrivenCla
 # from claim_corrector_claims3_calibrated import CalibratedClaimCorrector
 from claim_corrector_claims import ClaimCorrector
 from fhir_adapter import validate_fhir_claim as _validate_fhir, convert_fhir_claim as _convert_fhir
+from sql_connection_pool import pooled_connect
+from resource_registry import memory_report, teardown as teardown_resources, warm_up
 
 # ----------------------------------------------------
 # Page + Unified CSS
@@ -149,7 +150,8 @@ def get_sql_conn():
         "Server=localhost,1433;Database=_claims;"
         "UID=SA;PWD=Bbanwo@1980!;Encrypt=yes;TrustServerCertificate=yes;Connection Timeout=30;"
     )
-    return pyodbc.connect(conn_str)
+    # Pooled: the `with` block returns the connection instead of reconnecting on every rerun
+    return pooled_connect(conn_str)
 
 @st.cache_data(show_spinner=False)
 def list_tables() -> Dict[str, str]:
@@ -202,7 +204,8 @@ def normalize_row_to_claim(row: pd.Series) -> Dict[str, Any]:
         "procedure_codes": proc_map,
     }
 
-# Runner wrappers (only working modes)
+# Runner wrappers (only working modes). Constructing the analyzer / correctors is
+# cheap: the embedder, Qdrant client and SQL connector come from resource_registry
 def run_basic(claim): return NewClaimAnalyzer().analyze_new_claim(claim)
 def run_pipeline(claim):
     a = NewClaimAnalyzer().analyze_new_claim(claim)
@@ -380,6 +383,21 @@ def show_v3_summary(data):
 # ----------------------------------------------------
 # Main
 # ----------------------------------------------------
+def show_resource_panel():
+    """Shared embedder / Qdrant / SQL resources: warm-up, release and memory use"""
+    with st.expander("Shared resources"):
+        warm_col, release_col = st.columns(2)
+        if warm_col.button("Warm up"):
+            with st.spinner("Loading embedding model and clients..."):
+                warm_up()
+        if release_col.button("Release"):
+            released = teardown_resources()
+            st.caption(f"Released {released} resources")
+        report = memory_report()
+        st.caption(f"Process RSS: {(report['process_rss_bytes'] or 0) / 2**20:.0f} MiB")
+        if report["resources"]:
+            st.dataframe(pd.DataFrame(report["resources"]), use_container_width=True, hide_index=True)
+
 def main():
     st.markdown(
         "<div class='custom-header'><h1>CXR Exchange  Claims Reasoning Kernel</h1><p>Automated claim validation, correction, and compliance.</p></div>",
@@ -408,6 +426,9 @@ def main():
         elif source == "Upload FHIR (JSON)":
             fhirf = st.file_uploader("Upload FHIR JSON", type=["json"])
 
+        st.divider()
+        show_resource_panel()
+
     claim = None
     if f:
         claim = json.load(f)
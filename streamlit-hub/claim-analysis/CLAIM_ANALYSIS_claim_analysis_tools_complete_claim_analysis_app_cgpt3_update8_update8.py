@@ -16,7 +16,6 @@ UPDATE8 Changes:
 import streamlit as st
 import json
 import pandas as pd
-import pyodbc
 import sys
 import os
 from typing import Dict, Any, Optional
@@ -34,6 +33,43 @@ from claim_corrector_claims3_archetype_driven_update10 import ArchetypeDrivenCla
 # from claim_corrector_claims3_calibrated import CalibratedClaimCorrector
 from claim_corrector_claims import ClaimCorrector
 from fhir_adapter import validate_fhir_claim as _validate_fhir, convert_fhir_claim as _convert_fhir
+from sql_connection_pool import pooled_connect
+from resource_registry import get_registry, get_resource, memory_report, teardown as teardown_resources, warm_up
+from embedding_cache import embedding_cache_stats
+from result_sink import ResultSink, list_result_files, read_results
+
+# Exported batch results (batch_analyzer.py --sink-dir) and the corrector runs below
+RESULT_SINK_DIR = os.environ.get("RESULT_SINK_DIR", "analysis_results")
+EXPORTED_TABLES = ["claim_summary", "detailed_issues", "actionable_fixes", "enriched_issues"]
+RESULT_SINK_KEY = ("result_sink", RESULT_SINK_DIR)
+# Corrector runs commit the shared sink at most this often (the Exported Results view commits it on open)
+RESULT_SINK_COMMIT_SECONDS = float(os.environ.get("RESULT_SINK_COMMIT_SECONDS", 300))
+
+
+def get_result_sink() -> ResultSink:
+    """Shared sink for the correctors' enriched issues (one per process, committed on resource release)"""
+    # Not closed on release: runs in other sessions may still be writing to it
+    return get_resource(
+        RESULT_SINK_KEY,
+        lambda: ResultSink(RESULT_SINK_DIR),
+        teardown=lambda sink: sink.commit()
+    )
+
+
+def commit_result_sink(sink: ResultSink, min_interval: float = 0):
+    """
+    Commit the rows written so far, so the Exported Results view sees them
+
+    Skipped when the last commit is less than min_interval seconds old: each
+    commit closes a part file per table and partition, so committing after
+    every claim would leave many tiny files.
+    """
+    if time.time() - sink.committed_at < min_interval:
+        return
+    try:
+        sink.commit()
+    except Exception as e:
+        print(f"Warning: Could not commit exported results: {e}")
 
 # ----------------------------------------------------
 # Page + Unified CSS
@@ -154,7 +190,8 @@ def get_sql_conn():
         "Server=localhost,1433;Database=_claims;"
         "UID=SA;PWD=Bbanwo@1980!;Encrypt=yes;TrustServerCertificate=yes;Connection Timeout=30;"
     )
-    return pyodbc.connect(conn_str)
+    # Pooled: the `with` block returns the connection instead of reconnecting on every rerun
+    return pooled_connect(conn_str)
 
 @st.cache_data(show_spinner=False)
 def list_tables() -> Dict[str, str]:
@@ -176,6 +213,25 @@ def load_claims(table: str, limit: int = 2000) -> pd.DataFrame:
         q = f"SELECT TOP {limit} * FROM [{table}]"
         return pd.read_sql(q, conn)
 
+@st.cache_data(show_spinner=False, ttl=60)
+def load_exported_results(base_dir: str, table: str, files: tuple) -> pd.DataFrame:
+    # `files` is part of the cache key, so newly committed files are picked up
+    return read_results(base_dir, table)
+
+def show_exported_results(base_dir: str, table: str):
+    files = tuple(list_result_files(base_dir, table))
+    if not files:
+        st.info(f"No exported {table} results under {base_dir}")
+        return
+    df = load_exported_results(base_dir, table, files)
+    id_col = next((c for c in ("CLM_ID", "claim_id") if c in df.columns), None)
+    claim_filter = st.text_input("Filter by claim ID") if id_col else ""
+    if claim_filter:
+        df = df[df[id_col].astype(str).str.contains(claim_filter.strip(), regex=False)]
+    st.markdown(f"<div class='result-card info'><b>{table}</b>: {len(df)} rows from {len(files)} files</div>",
+                unsafe_allow_html=True)
+    st.dataframe(df, use_container_width=True, hide_index=True)
+
 # ----------------------------------------------------
 # Claim normalization + runners
 # ----------------------------------------------------
@@ -207,18 +263,29 @@ def normalize_row_to_claim(row: pd.Series) -> Dict[str, Any]:
         "procedure_codes": proc_map,
     }
 
-# Runner wrappers (only working modes)
+# Runner wrappers (only working modes). Constructing the analyzer / correctors is
+# cheap: the embedder, Qdrant client and SQL connector come from resource_registry
 def run_basic(claim): return NewClaimAnalyzer().analyze_new_claim(claim)
 def run_pipeline(claim):
     a = NewClaimAnalyzer().analyze_new_claim(claim)
     c = ClaimCorrector().run_corrections(a.get('claim_summary',{}).get('CLM_ID', claim['CLM_ID']))
+    sink = get_result_sink()
+    try:
+        sink.write_correction(c, {key: claim.get(key) for key in ("DESYNPUF_ID", "CLM_FROM_DT", "PRVDR_NUM")})
+    except Exception as e:
+        print(f"Warning: Could not export corrections for claim {claim['CLM_ID']}: {e}")
+    commit_result_sink(sink, RESULT_SINK_COMMIT_SECONDS)
     return {"stage1": a, "stage2": c}
 
 # Broken modes commented out (calibrated versions have syntax errors)
 # def run_calibrated(cid): return CalibratedClaimCorrector().run_corrections(cid)
 # def run_two_stage_calibrated(cid): return TwoStageCalibratedClaimCorrector().run_two_stage_corrections(cid)
 # def run_archetype_v2(cid): return ArchetypeDrivenClaimCorrectorV2().run_archetype_driven_corrections(cid)
-def run_archetype_v3(cid): return ArchetypeDrivenClaimCorrectorV3().run_archetype_driven_corrections(cid)
+def run_archetype_v3(cid):
+    sink = get_result_sink()
+    result = ArchetypeDrivenClaimCorrectorV3(result_sink=sink).run_archetype_driven_corrections(cid)
+    commit_result_sink(sink, RESULT_SINK_COMMIT_SECONDS)
+    return result
 
 
 
@@ -385,6 +452,29 @@ def show_v3_summary(data):
 # ----------------------------------------------------
 # Main
 # ----------------------------------------------------
+def show_resource_panel():
+    """Shared embedder / Qdrant / SQL resources: warm-up, release and memory use"""
+    with st.expander("Shared resources"):
+        warm_col, release_col = st.columns(2)
+        if warm_col.button("Warm up"):
+            with st.spinner("Loading embedding model and clients..."):
+                warm_up()
+        if release_col.button("Release"):
+            released = teardown_resources()
+            st.caption(f"Released {released} resources")
+        report = memory_report()
+        st.caption(f"Process RSS: {(report['process_rss_bytes'] or 0) / 2**20:.0f} MiB")
+        if report["resources"]:
+            st.dataframe(pd.DataFrame(report["resources"]), use_container_width=True, hide_index=True)
+        try:
+            cache = embedding_cache_stats()
+        except Exception as e:
+            st.caption(f"Query-embedding cache unavailable: {e}")
+        else:
+            for model in cache["models"]:
+                st.caption(f"Query-embedding cache: {model['entries']} vectors, "
+                           f"{model['hit_rate']:.0%} hit rate ({model['hits']} hits / {model['misses']} misses)")
+
 def main():
     st.markdown(
         "<div class='custom-header'><h1>CXR Exchange  Claims Reasoning Kernel</h1><p>Automated claim validation, correction, and compliance.</p></div>",
@@ -396,7 +486,10 @@ def main():
         st.markdown("1. Upload claim JSON<br>2. Choose analysis mode<br>3. Run analysis", unsafe_allow_html=True)
         st.divider()
 
-        source = st.radio("Source", ["Upload JSON", "Upload FHIR (JSON)"], index=0)
+        source = st.radio("Source", ["Upload JSON", "Upload FHIR (JSON)", "Exported Results"], index=0)
+        if source == "Exported Results":
+            sink_dir = st.text_input("Results directory", RESULT_SINK_DIR)
+            table = st.selectbox("Table", EXPORTED_TABLES)
         mode = st.selectbox(
             "Mode",
             [
@@ -413,6 +506,17 @@ def main():
         elif source == "Upload FHIR (JSON)":
             fhirf = st.file_uploader("Upload FHIR JSON", type=["json"])
 
+        st.divider()
+        show_resource_panel()
+
+    if source == "Exported Results":
+        # Publish the corrector runs not committed yet (no new files if nothing was written)
+        sink = get_registry().peek(RESULT_SINK_KEY)
+        if sink is not None and os.path.abspath(sink_dir) == os.path.abspath(RESULT_SINK_DIR):
+            commit_result_sink(sink)
+        show_exported_results(sink_dir, table)
+        return
+
     claim = None
     if f:
         claim = json.load(f)
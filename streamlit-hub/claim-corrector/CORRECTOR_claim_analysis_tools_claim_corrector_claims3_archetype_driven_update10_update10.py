@@ -49,21 +49,32 @@ UPDATE 6 CHANGES:
 - M1611 now correctly maps to ICD-9 71515 with description
 """
 
+import functools
 import json
 import re
 import subprocess
+import threading
 import warnings
 from typing import Dict, Any, List, Tuple, Optional
-from sentence_transformers import SentenceTransformer
-import torch
-from qdrant_client import QdrantClient
 from qdrant_client import models
-import pyodbc
 import pandas as pd
+import os
+from reference_cache import get_reference_cache
+from reference_snapshot import get_reference_snapshot
+from sql_connection_pool import get_pool, pooled_connect
+from archetype_query_vectors import get_archetype_query_vectors
+from embedding_cache import get_cached_embedder
+from policy_search import search_collections
+from resource_registry import EMBEDDING_MODEL_NAME, get_collection_names, get_qdrant_client, get_resource, run_once
+from claim_metadata_store import (ensure_payload_indexes, fetch_claim_issues, fetch_claim_summaries,
+                                  fetch_issues_for_claims, join_claim_summaries)
 
 # Suppress pandas SQLAlchemy warning for pyodbc connections
 warnings.filterwarnings('ignore', message='.*pandas only supports SQLAlchemy.*', category=UserWarning)
 
+# Query texts of one claim are embedded together in batches of this size
+QUERY_EMBED_BATCH_SIZE = int(os.environ.get("QUERY_EMBED_BATCH_SIZE", 32))
+
 # -------------------------------------------------------------------------
 # SAFE OLLAMA EXECUTION (Prevents subprocess deadlocks)
 # -------------------------------------------------------------------------
@@ -324,6 +335,53 @@ ARCHETYPE_DEFINITIONS = {
     }
 }
 
+# Archetypes whose correction query depends on the CPT/HCPCS code alone; their
+# vectors are precomputed per code by archetype_query_vectors.py
+CODE_ONLY_QUERY_ARCHETYPES = ["NCCI_PTP_Conflict", "MUE_Risk", "NCD_Terminated", "Secondary_DX_Not_Covered"]
+
+
+def build_archetype_query(issue: Dict[str, Any], archetype: str) -> str:
+    """Build targeted query based on archetype and claim data"""
+    cpt_code = issue.get('hcpcs_code', '')
+    icd_code = issue.get('icd10_code', '')
+    procedure_name = issue.get('procedure_name', '')
+    diagnosis_name = issue.get('diagnosis_name', '')
+    
+    if archetype == "Primary_DX_Not_Covered":
+        query = (
+            f"covered ICD-10 codes for CPT {cpt_code} {procedure_name} "
+            f"LCD crosswalk covered diagnosis alternatives for {diagnosis_name} "
+            f"medicare coverage criteria medical necessity"
+        )
+    elif archetype == "NCCI_PTP_Conflict":
+        query = (
+            f"NCCI PTP edits for CPT {cpt_code} modifier exceptions "
+            f"59 XE XP XS XU bundling conflicts separate procedural service "
+            f"procedure to procedure edits"
+        )
+    elif archetype == "MUE_Risk":
+        query = (
+            f"MUE medically unlikely edit for CPT {cpt_code} unit limits "
+            f"maximum units threshold documentation medical necessity"
+        )
+    elif archetype == "NCD_Terminated":
+        query = (
+            f"NCD terminated replacement coverage for CPT {cpt_code} "
+            f"national coverage determination successor policy"
+        )
+    elif archetype == "Secondary_DX_Not_Covered":
+        query = (
+            f"secondary diagnosis coverage LCD crosswalk for CPT {cpt_code} "
+            f"co-diagnosis pairings medical necessity"
+        )
+    else:
+        query = (
+            f"CMS policy compliance for CPT {cpt_code} ICD {icd_code} "
+            f"medicare billing guidelines documentation requirements"
+        )
+    
+    return query
+
 # -------------------------------------------------------------------------
 # STAGE 1: CALIBRATED DENIAL REASONING PROMPT
 # -------------------------------------------------------------------------
@@ -455,6 +513,31 @@ REQUIRED OUTPUT FORMAT (MUST BE VALID JSON):
 CRITICAL: Output MUST be valid JSON. No narrative text outside the JSON structure.
 """
 
+
+def _with_connection(method):
+    """
+    Run a connector method with a connection for the call
+
+    The connector is shared by concurrent sessions, so its connection is
+    per thread and calls do not wait for each other. SQL Server connections
+    are checked out of the shared pool for each outermost call and returned
+    afterwards, so the pool's checkout health check replaces dropped
+    connections and a failed connect is retried on the next call instead of
+    sticking to the (process-wide) connector.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.connection is not None:
+            # Nested call (or the persistent snapshot connection)
+            return method(self, *args, **kwargs)
+        self._connect()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self._release_connection()
+    return wrapper
+
+
 # -------------------------------------------------------------------------
 # SQL DATABASE CONNECTION (UPDATE3: Enhanced validation & fallbacks)
 # -------------------------------------------------------------------------
@@ -462,8 +545,14 @@ CRITICAL: Output MUST be valid JSON. No narrative text outside the JSON structur
 class SQLDatabaseConnector:
     """SQL Server connection for archetype-specific evidence gathering"""
     
-    def __init__(self, connection_string: str = None):
-        """Initialize SQL connection"""
+    def __init__(self, connection_string: str = None, reference_backend: str = None, snapshot_path: str = None):
+        """
+        Initialize SQL connection
+        
+        reference_backend: "sql" (SQL Server, default) or "snapshot" (local
+        reference snapshot built by reference_snapshot.py; no ODBC needed).
+        Defaults to the REFERENCE_BACKEND environment variable.
+        """
         if connection_string is None:
             self.connection_string = (
                 "Driver={ODBC Driver 18 for SQL Server};"
@@ -478,17 +567,53 @@ class SQLDatabaseConnector:
         else:
             self.connection_string = connection_string
         
-        self.connection = None
+        self.reference_backend = (reference_backend or os.environ.get("REFERENCE_BACKEND", "sql")).lower()
+        self.snapshot_path = snapshot_path
+        
+        self._local = threading.local()  # per-thread connection (see connection)
+        self.reference_cache = get_reference_cache()
         self._connect()
+        if self.connection is not None and self.reference_backend != "snapshot":
+            print(" SQL Database connection established")
+        self._release_connection()
     
+    @property
+    def connection(self):
+        """The calling thread's connection (None outside a connector call)"""
+        return getattr(self._local, "connection", None)
+
+    @connection.setter
+    def connection(self, value):
+        self._local.connection = value
+
     def _connect(self):
         """Establish database connection"""
+        if self.reference_backend == "snapshot":
+            try:
+                snapshot = get_reference_snapshot(self.snapshot_path)
+                self.connection = snapshot.connect()
+                print(f" Reference snapshot opened: {snapshot.path}")
+            except Exception as e:
+                print(f" Reference snapshot unavailable: {e}")
+                self.connection = None
+            return
+        
         try:
-            self.connection = pyodbc.connect(self.connection_string)
-            print(" SQL Database connection established")
+            # Checked out from the shared pool (no new TLS handshake per call)
+            self.connection = pooled_connect(self.connection_string)
         except Exception as e:
             print(f" SQL Database connection failed: {e}")
             self.connection = None
+
+    def _release_connection(self):
+        """Return the call's pooled connection (the snapshot connection stays open)"""
+        if self.connection is None or self.reference_backend == "snapshot":
+            return
+        try:
+            self.connection.close()
+        except Exception:
+            pass
+        self.connection = None
     
     def _is_icd10(self, code: str) -> bool:
         """Check if code is ICD-10 (starts with letter, 7 chars)"""
@@ -520,6 +645,7 @@ class SQLDatabaseConnector:
         
         return gems_code
     
+    @_with_connection
     def _map_icd10_to_icd9(self, icd10: str) -> List[str]:
         """Map ICD-10 code to ICD-9 code(s) using master view (UPDATE6)"""
         if not self.connection or not icd10:
@@ -528,34 +654,48 @@ class SQLDatabaseConnector:
             # Normalize: M16.11  M1611 for GEMS query
             normalized_icd10 = self._normalize_icd10_for_gems(icd10)
             
+            hit, cached = self.reference_cache.lookup('gems_icd10_to_icd9', normalized_icd10)
+            if hit:
+                return cached
+            
             query = """
                 SELECT DISTINCT icd9_code
                 FROM [_gems].[dbo].[vw_icd9_to_icd10_master]
                 WHERE icd10_code = ? AND mapping_type = 'CM'
             """
             df = pd.read_sql(query, self.connection, params=[normalized_icd10])
-            return df['icd9_code'].tolist() if not df.empty else []
+            result = df['icd9_code'].tolist() if not df.empty else []
+            self.reference_cache.store('gems_icd10_to_icd9', normalized_icd10, result)
+            return result
         except Exception as e:
             print(f"    ICD-10 to ICD-9 mapping failed: {e}")
             return []
     
+    @_with_connection
     def _map_icd9_to_icd10(self, icd9: str) -> List[str]:
         """Map ICD-9 code to ICD-10 code(s) using master view (UPDATE6)"""
         if not self.connection or not icd9:
             return []
         try:
+            hit, cached = self.reference_cache.lookup('gems_icd9_to_icd10', icd9)
+            if hit:
+                return cached
+            
             query = """
                 SELECT DISTINCT icd10_code
                 FROM [_gems].[dbo].[vw_icd9_to_icd10_master]
                 WHERE icd9_code = ? AND mapping_type = 'CM'
             """
             df = pd.read_sql(query, self.connection, params=[icd9])
-            return df['icd10_code'].tolist() if not df.empty else []
+            result = df['icd10_code'].tolist() if not df.empty else []
+            self.reference_cache.store('gems_icd9_to_icd10', icd9, result)
+            return result
         except Exception as e:
             print(f"    ICD-9 to ICD-10 mapping failed: {e}")
             return []
     
     #  UPDATE6: Simplified to use master view (includes descriptions)
+    @_with_connection
     def _get_icd10_description(self, icd10_code: str) -> str:
         """Get ICD-10 description from master view (UPDATE6)"""
         if not self.connection or not icd10_code:
@@ -564,13 +704,19 @@ class SQLDatabaseConnector:
             # Normalize: M16.11  M1611
             normalized_icd10 = self._normalize_icd10_for_gems(icd10_code)
             
+            hit, cached = self.reference_cache.lookup('gems_icd10_description', normalized_icd10)
+            if hit:
+                return cached
+            
             query = """
                 SELECT TOP 1 icd10_description
                 FROM [_gems].[dbo].[vw_icd9_to_icd10_master]
                 WHERE icd10_code = ? AND mapping_type = 'CM'
             """
             df = pd.read_sql(query, self.connection, params=[normalized_icd10])
-            return df['icd10_description'].values[0] if not df.empty else ""
+            result = df['icd10_description'].values[0] if not df.empty else ""
+            self.reference_cache.store('gems_icd10_description', normalized_icd10, result)
+            return result
         except Exception as e:
             print(f"    ICD-10 description lookup failed: {e}")
             return ""
@@ -578,6 +724,7 @@ class SQLDatabaseConnector:
     #  UPDATE4: New method to get database-driven ICD-10 alternatives
     #  UPDATE5: Fixed to normalize ICD-10 codes for GEMS table queries
     #  UPDATE6: Updated to use master view with built-in descriptions
+    @_with_connection
     def _get_icd10_alternatives_from_db(self, icd10_code: str, limit: int = 5) -> List[Dict[str, Any]]:
         """
         Get alternative ICD-10 codes from database using multiple strategies:
@@ -595,6 +742,11 @@ class SQLDatabaseConnector:
             # Normalize: M16.11  M1611 for GEMS query
             normalized_icd10 = self._normalize_icd10_for_gems(icd10_code)
             
+            cache_key = (normalized_icd10, limit)
+            hit, cached = self.reference_cache.lookup('gems_icd10_alternatives', cache_key)
+            if hit:
+                return cached
+            
             # Strategy 1: Find alternatives via shared ICD-9 mapping (most reliable)
             query_shared_icd9 = f"""
                 WITH source_icd9 AS (
@@ -626,6 +778,7 @@ class SQLDatabaseConnector:
                         "confidence": 0.85  # High confidence - clinically related
                     })
                 print(f"    Found {len(alternatives)} alternatives via GEMS shared ICD-9 mapping")
+                self.reference_cache.store('gems_icd10_alternatives', cache_key, alternatives)
                 return alternatives
             
             # Strategy 2: Pattern-based fallback (same code family)
@@ -654,9 +807,11 @@ class SQLDatabaseConnector:
                         "confidence": 0.70  # Lower confidence - pattern match only
                     })
                 print(f"    Found {len(alternatives)} alternatives via pattern matching ({normalized_pattern})")
+                self.reference_cache.store('gems_icd10_alternatives', cache_key, alternatives)
                 return alternatives
             
             print(f"    No alternatives found for {icd10_code}")
+            self.reference_cache.store('gems_icd10_alternatives', cache_key, [])
             return []
             
         except Exception as e:
@@ -682,6 +837,7 @@ class SQLDatabaseConnector:
         return len(values) == 0
     
     #  UPDATE3: Enhanced execute_archetype_query with validation
+    @_with_connection
     def execute_archetype_query(self, archetype: str, codes: Dict[str, str]) -> List[Dict[str, Any]]:
         """Execute archetype-specific SQL query with smart ICD version detection and validation"""
         if not self.connection:
@@ -830,26 +986,37 @@ class SQLDatabaseConnector:
         }]
     
     def close(self):
-        """Close database connection"""
+        """Close the calling thread's database connection"""
         if self.connection:
+            # Returns the connection to the pool
             self.connection.close()
+            self.connection = None
             print(" SQL Database connection closed")
 
+    def close_pooled_connections(self):
+        """Close every pooled connection of the connector's connection string (checked-out ones when returned)"""
+        self.close()
+        if self.reference_backend != "snapshot":
+            get_pool(self.connection_string).close_all()
+
 # -------------------------------------------------------------------------
 # ARCHETYPE-DRIVEN CLAIM CORRECTOR (UPDATE3: Enhanced with fallbacks)
 # -------------------------------------------------------------------------
 
 class ArchetypeDrivenClaimCorrector:
-    def __init__(self, url: str = "http://localhost:6333", sql_connection_string: str = None):
-        self.client = QdrantClient(url=url)
-
-        self.embedder = SentenceTransformer(
-            "nomic-ai/nomic-embed-text-v1.5",
-            device="cuda" if torch.cuda.is_available() else "cpu",
-            trust_remote_code=True
-        )
-
-        all_collections = [c.name for c in self.client.get_collections().collections]
+    def __init__(self, url: str = "http://localhost:6333", sql_connection_string: str = None,
+                 reference_backend: str = None, result_sink=None):
+        # Embedder, Qdrant client, collection listing and SQL connector are shared
+        # process-wide (resource_registry), so constructing a corrector is cheap
+        self.client = get_qdrant_client(url)
+        # Optional result_sink.ResultSink: enriched issues are appended to it per claim (owned by the caller)
+        self.result_sink = result_sink
+
+        self.embedder = get_cached_embedder()
+        # Offline-built archetype query vectors (None until archetype_query_vectors.py build has run)
+        self.archetype_query_vectors = get_archetype_query_vectors(EMBEDDING_MODEL_NAME)
+
+        all_collections = get_collection_names(url)
         self.policy_collections = [c for c in all_collections if c.startswith("claims__")]
 
         print(f" Loaded {len(self.policy_collections)} claims collections:")
@@ -857,6 +1024,9 @@ class ArchetypeDrivenClaimCorrector:
             print(f"   - {c}")
 
         self.claims_collection = "claim_analysis_metadata"
+        if self.claims_collection in all_collections:
+            run_once(("payload_indexes", url, self.claims_collection),
+                     lambda: ensure_payload_indexes(self.client, self.claims_collection))
         
         self.source_mapping = {
             "clm104c": "Medicare Claims Processing Manual",
@@ -867,7 +1037,12 @@ class ArchetypeDrivenClaimCorrector:
             "bpm": "Medicare Benefit Policy Manual"
         }
         
-        self.sql_connector = SQLDatabaseConnector(sql_connection_string)
+        backend = (reference_backend or os.environ.get("REFERENCE_BACKEND", "sql")).lower()
+        self.sql_connector = get_resource(
+            ("sql_connector", __name__, sql_connection_string, backend),
+            lambda: SQLDatabaseConnector(sql_connection_string, reference_backend=backend),
+            teardown=lambda connector: connector.close_pooled_connections()
+        )
 
     def run_archetype_driven_corrections(self, claim_id: str) -> Dict[str, Any]:
         """Run archetype-driven two-stage corrections"""
@@ -884,21 +1059,24 @@ class ArchetypeDrivenClaimCorrector:
         print(f"  Found {len(issues)} issue(s) to process")
         print("-"*80)
         
+        for issue in issues:
+            cpt_code = issue.get('hcpcs_code', '')
+            if cpt_code:
+                issue['procedure_name'] = get_cpt_description(cpt_code)
+        query_vectors = self._embed_claim_queries(issues)
+        
         enriched_issues = []
         for idx, issue in enumerate(issues, 1):
             print(f"\n  ISSUE {idx}/{len(issues)}: {issue.get('hcpcs_code', 'N/A')} + {issue.get('icd10_code', 'N/A')}")
             
-            cpt_code = issue.get('hcpcs_code', '')
-            if cpt_code:
-                dynamic_procedure_name = get_cpt_description(cpt_code)
-                issue['procedure_name'] = dynamic_procedure_name
-                print(f"    Procedure: {dynamic_procedure_name}")
+            if issue.get('hcpcs_code', ''):
+                print(f"    Procedure: {issue['procedure_name']}")
             
             print(f"     STAGE 1: Calibrated denial reasoning analysis...")
-            stage1_result = self._stage1_calibrated_denial_reasoning(issue)
+            stage1_result = self._stage1_calibrated_denial_reasoning(issue, query_vectors)
             
             print(f"     STAGE 2: Archetype-driven corrective reasoning...")
-            stage2_result = self._stage2_archetype_corrective_reasoning(issue, stage1_result)
+            stage2_result = self._stage2_archetype_corrective_reasoning(issue, stage1_result, query_vectors)
             
             enriched_issue = {
                 **issue,
@@ -916,18 +1094,72 @@ class ArchetypeDrivenClaimCorrector:
         print(f"  CLAIM {claim_id} COMPLETE: Processed {len(enriched_issues)} issue(s)")
         print("="*80 + "\n")
         
-        return {
+        result = {
             "claim_id": claim_id,
             "enriched_issues": enriched_issues,
             "total_issues": len(enriched_issues)
         }
+        self._export_result(result)
+        return result
 
-    def _stage1_calibrated_denial_reasoning(self, issue: Dict[str, Any]) -> Dict[str, Any]:
+    def _export_result(self, result: Dict[str, Any]):
+        """Append the enriched issues to the result sink, partitioned by the claim summary's service date / provider"""
+        if self.result_sink is None:
+            return
+        try:
+            summaries = fetch_claim_summaries(self.client, [result["claim_id"]], self.claims_collection)
+            claim_fields = summaries.get(str(result["claim_id"]), {})
+            self.result_sink.write_correction(result, {
+                key: claim_fields.get(key) for key in ("patient_id", "provider_id", "service_date", "provider_type")
+            })
+        except Exception as e:
+            print(f" Warning: Could not export corrections for claim {result['claim_id']}: {e}")
+
+    def _embed_claim_queries(self, issues: List[Dict[str, Any]]) -> Dict[str, List[float]]:
+        """
+        Embed every stage 1 and stage 2 query text of a claim in one batched encode call
+
+        Returns: query text -> vector (empty if encoding fails; the searches then encode on their own)
+        """
+        query_vectors = {}
+        query_texts = []
+        for issue in issues:
+            query_texts.append(self._policy_query_text(issue))
+            archetype = self._detect_archetype(issue)
+            archetype_query = self._build_archetype_query(issue, archetype)
+            precomputed = self._precomputed_archetype_vector(issue, archetype, archetype_query)
+            if precomputed is not None:
+                query_vectors[archetype_query] = precomputed
+            else:
+                query_texts.append(archetype_query)
+        query_texts = [text for text in dict.fromkeys(query_texts) if text not in query_vectors]
+
+        try:
+            vectors = self.embedder.encode(query_texts, batch_size=QUERY_EMBED_BATCH_SIZE)
+        except Exception as e:
+            print(f" Warning: Batched query embedding failed, embedding per search: {e}")
+            return query_vectors
+        print(f"  Embedded {len(query_texts)} unique query text(s) for {len(issues)} issue(s)"
+              f" ({len(query_vectors)} precomputed)")
+        query_vectors.update((text, vector.tolist()) for text, vector in zip(query_texts, vectors))
+        return query_vectors
+
+    def _stage1_calibrated_denial_reasoning(self, issue: Dict[str, Any],
+                                            query_vectors: Optional[Dict[str, List[float]]] = None) -> Dict[str, Any]:
         """Stage 1: Calibrated denial reasoning using enhanced validation"""
+        query_vector = (query_vectors or {}).get(self._policy_query_text(issue))
+        if query_vector is None:
+            try:
+                query_vector = self.embedder.encode(self._policy_query_text(issue)).tolist()
+            except Exception as e:
+                print(f"    Warning: Policy query embedding failed: {e}")
+        
         all_policies = []
-        for collection in self.policy_collections:
-            policies = self._hybrid_search(collection, issue, top_k=3)
-            all_policies.extend(policies)
+        if query_vector is not None:
+            # All collections at once: strict + semantic fallback per collection, merged by score
+            hits = search_collections(self.client, self.policy_collections, query_vector,
+                                      limit=3, query_filter=self._policy_filter(issue))
+            all_policies = [{**hit["payload"], "score": hit["score"]} for hit in hits]
         
         validated_policies = self._calibrated_validate_and_deduplicate_policies(all_policies, issue)
         print(f"      Retrieved {len(validated_policies)} policies")
@@ -940,7 +1172,8 @@ class ArchetypeDrivenClaimCorrector:
             "stage": "calibrated_denial_reasoning"
         }
 
-    def _stage2_archetype_corrective_reasoning(self, issue: Dict[str, Any], stage1_result: Dict[str, Any]) -> Dict[str, Any]:
+    def _stage2_archetype_corrective_reasoning(self, issue: Dict[str, Any], stage1_result: Dict[str, Any],
+                                               query_vectors: Optional[Dict[str, List[float]]] = None) -> Dict[str, Any]:
         """Stage 2: SQL-driven archetype corrective reasoning with sub-archetype classification"""
         archetype = self._detect_archetype(issue)
         archetype_info = ARCHETYPE_DEFINITIONS.get(archetype, {})
@@ -965,7 +1198,8 @@ class ArchetypeDrivenClaimCorrector:
             sub_archetype_info = self._classify_mue_subtype(issue, sql_evidence)
             print(f"      Sub-type: {sub_archetype_info.get('sub_archetype')} (Strictness: {sub_archetype_info.get('strictness')})")
         
-        correction_policies = self._search_archetype_corrections(issue, archetype)
+        query_vector = (query_vectors or {}).get(self._build_archetype_query(issue, archetype))
+        correction_policies = self._search_archetype_corrections(issue, archetype, query_vector)
         print(f"      Policies: {len(correction_policies)} archetype-specific")
         
         #  UPDATE10: Pass sub-archetype info to LLM for enhanced guidance
@@ -1229,77 +1463,33 @@ class ArchetypeDrivenClaimCorrector:
 
     def _build_archetype_query(self, issue: Dict[str, Any], archetype: str) -> str:
         """Build targeted query based on archetype and claim data"""
-        cpt_code = issue.get('hcpcs_code', '')
-        icd_code = issue.get('icd10_code', '')
-        procedure_name = issue.get('procedure_name', '')
-        diagnosis_name = issue.get('diagnosis_name', '')
-        
-        if archetype == "Primary_DX_Not_Covered":
-            query = (
-                f"covered ICD-10 codes for CPT {cpt_code} {procedure_name} "
-                f"LCD crosswalk covered diagnosis alternatives for {diagnosis_name} "
-                f"medicare coverage criteria medical necessity"
-            )
-        elif archetype == "NCCI_PTP_Conflict":
-            query = (
-                f"NCCI PTP edits for CPT {cpt_code} modifier exceptions "
-                f"59 XE XP XS XU bundling conflicts separate procedural service "
-                f"procedure to procedure edits"
-            )
-        elif archetype == "MUE_Risk":
-            query = (
-                f"MUE medically unlikely edit for CPT {cpt_code} unit limits "
-                f"maximum units threshold documentation medical necessity"
-            )
-        elif archetype == "NCD_Terminated":
-            query = (
-                f"NCD terminated replacement coverage for CPT {cpt_code} "
-                f"national coverage determination successor policy"
-            )
-        elif archetype == "Secondary_DX_Not_Covered":
-            query = (
-                f"secondary diagnosis coverage LCD crosswalk for CPT {cpt_code} "
-                f"co-diagnosis pairings medical necessity"
-            )
-        else:
-            query = (
-                f"CMS policy compliance for CPT {cpt_code} ICD {icd_code} "
-                f"medicare billing guidelines documentation requirements"
-            )
-        
-        return query
-
-    def _search_archetype_corrections(self, issue: Dict[str, Any], archetype: str) -> List[Dict[str, Any]]:
-        """Search for archetype-specific correction policies"""
+        return build_archetype_query(issue, archetype)
+
+    def _precomputed_archetype_vector(self, issue: Dict[str, Any], archetype: str,
+                                      query_text: str) -> Optional[List[float]]:
+        """Offline-built vector of a code-only archetype query, or None to encode it live"""
+        if self.archetype_query_vectors is None or archetype not in CODE_ONLY_QUERY_ARCHETYPES:
+            return None
+        return self.archetype_query_vectors.lookup(archetype, issue.get('hcpcs_code', ''), query_text)
+
+    def _search_archetype_corrections(self, issue: Dict[str, Any], archetype: str,
+                                      query_vector: Optional[List[float]] = None) -> List[Dict[str, Any]]:
+        """Search for archetype-specific correction policies (query_vector: pre-computed query embedding)"""
         archetype_info = ARCHETYPE_DEFINITIONS.get(archetype, {})
         target_collections = archetype_info.get('qdrant_collections', self.policy_collections)
         
-        query_text = self._build_archetype_query(issue, archetype)
-        query_vector = self.embedder.encode(query_text).tolist()
-        
-        correction_policies = []
-        
-        for collection in target_collections:
-            if collection in self.policy_collections:
-                try:
-                    hits = self.client.query_points(
-                        collection_name=collection,
-                        query=query_vector,
-                        limit=3,
-                        with_payload=True,
-                        with_vectors=False,
-                    ).points
-                    
-                    for hit in hits:
-                        policy_dict = hit.payload.copy()
-                        policy_dict['score'] = hit.score
-                        policy_dict['collection'] = collection
-                        correction_policies.append(policy_dict)
-                        
-                except Exception as e:
-                    print(f" Archetype search failed for {collection}: {e}")
-        
-        correction_policies.sort(key=lambda x: x.get('score', 0), reverse=True)
+        if query_vector is None:
+            query_text = self._build_archetype_query(issue, archetype)
+            query_vector = self._precomputed_archetype_vector(issue, archetype, query_text)
+        if query_vector is None:
+            query_vector = self.embedder.encode(query_text).tolist()
+        
+        collections = [c for c in target_collections if c in self.policy_collections]
+        hits = search_collections(self.client, collections, query_vector, limit=3)
+        correction_policies = [
+            {**hit["payload"], "score": hit["score"], "collection": hit["collection"]} for hit in hits
+        ]
+        
         return self._deduplicate_policies(correction_policies)[:6]
 
     #  UPDATE3: New robust LLM method with fallbacks
@@ -1768,29 +1958,10 @@ Business Impact: {sub_archetype_info.get('business_impact', 'N/A')}
             return {"error": f"Calibrated Stage 1 processing failed: {e}"}
 
     def _get_claim_issues(self, claim_id: str) -> List[Dict[str, Any]]:
-        """Get claim issues from the claims collection"""
+        """Get claim issues from the claims collection (exact claim_id match, paginated scroll)"""
         try:
-            hits = self.client.query_points(
-                collection_name=self.claims_collection,
-                query=[0] * 768,
-                query_filter=models.Filter(
-                    must=[
-                        models.FieldCondition(
-                            key="claim_id",
-                            match=models.MatchValue(value=claim_id)
-                        )
-                    ]
-                ),
-                limit=100,
-                with_payload=True,
-                with_vectors=False,
-            ).points
-            
-            issues = []
-            for hit in hits:
-                if hit.payload:
-                    issues.append(hit.payload)
-            
+            issues = fetch_claim_issues(self.client, claim_id, self.claims_collection)
+            issues = join_claim_summaries(issues, fetch_claim_summaries(self.client, [claim_id], self.claims_collection))
             print(f"    Found {len(issues)} claim issues")
             return issues
             
@@ -1798,70 +1969,63 @@ Business Impact: {sub_archetype_info.get('business_impact', 'N/A')}
             print(f" Failed to get claim issues: {e}")
             return []
 
-    def _hybrid_search(self, collection: str, issue: Dict[str, Any], top_k: int = 5):
-        """Hybrid search with proper array matching"""
+    def get_issues_for_claims(self, claim_ids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """Get the issues of many claims at once, keyed by claim ID"""
         try:
-            icd_code = issue.get("icd10_code") or issue.get("icd9_code")
-            hcpcs_code = issue.get("hcpcs_code") or issue.get("cpt_code")
-            denial_reason = issue.get("ptp_denial_reason", "unspecified")
+            issues = fetch_issues_for_claims(self.client, claim_ids, self.claims_collection)
+            summaries = fetch_claim_summaries(self.client, claim_ids, self.claims_collection)
+            issues = {claim_id: join_claim_summaries(claim_issues, summaries)
+                      for claim_id, claim_issues in issues.items()}
+            print(f"    Found {sum(len(v) for v in issues.values())} issues across {len(issues)} claims")
+            return issues
+            
+        except Exception as e:
+            print(f" Failed to get claim issues: {e}")
+            return {str(claim_id): [] for claim_id in claim_ids}
 
-            query_text = (
-                f"CMS policy for CPT/HCPCS {hcpcs_code}, diagnosis {icd_code}, "
-                f"denial reason {denial_reason}. Include NCCI, LCD, and CMS manual sections."
-            )
-            query_vector = self.embedder.encode(query_text).tolist()
+    def _policy_query_text(self, issue: Dict[str, Any]) -> str:
+        """Stage 1 policy search query for an issue"""
+        icd_code = issue.get("icd10_code") or issue.get("icd9_code")
+        hcpcs_code = issue.get("hcpcs_code") or issue.get("cpt_code")
+        denial_reason = issue.get("ptp_denial_reason", "unspecified")
 
-            strict_filter = models.Filter(
-                should=[
-                    models.FieldCondition(
-                        key="cpt_codes",
-                        match=models.MatchAny(any=[str(hcpcs_code).upper()])
-                    ) if hcpcs_code else None,
-                    models.FieldCondition(
-                        key="hcpcs_codes",
-                        match=models.MatchAny(any=[str(hcpcs_code).upper()])
-                    ) if hcpcs_code else None,
-                    models.FieldCondition(
-                        key="icd10_codes",
-                        match=models.MatchAny(any=[str(icd_code).upper().replace(".", "")])
-                    ) if icd_code else None,
-                    models.FieldCondition(
-                        key="text",
-                        match=models.MatchText(text=str(hcpcs_code))
-                    ) if hcpcs_code else None,
-                    models.FieldCondition(
-                        key="text",
-                        match=models.MatchText(text=str(icd_code))
-                    ) if icd_code else None,
-                ]
-            )
+        return (
+            f"CMS policy for CPT/HCPCS {hcpcs_code}, diagnosis {icd_code}, "
+            f"denial reason {denial_reason}. Include NCCI, LCD, and CMS manual sections."
+        )
 
-            strict_filter.should = [f for f in strict_filter.should if f is not None]
-
-            hits = self.client.query_points(
-                collection_name=collection,
-                query=query_vector,
-                query_filter=strict_filter if strict_filter.should else None,
-                limit=top_k,
-                with_payload=True,
-                with_vectors=False,
-            ).points
-
-            if not hits or len(hits) == 0:
-                print(f"    No strict matches for {hcpcs_code}/{icd_code}, falling back to semantic search...")
-                hits = self.client.query_points(
-                    collection_name=collection,
-                    query=query_vector,
-                    query_filter=None,
-                    limit=top_k,
-                    with_payload=True,
-                    with_vectors=False,
-                ).points
-
-            return hits or []
-        except Exception as e:
-            print(f" Search failed for {collection}: {e}")
-            return []
+    def _policy_filter(self, issue: Dict[str, Any]) -> Optional[models.Filter]:
+        """Strict filter of the stage 1 policy search (code arrays or code mentions), or None without codes"""
+        icd_code = issue.get("icd10_code") or issue.get("icd9_code")
+        hcpcs_code = issue.get("hcpcs_code") or issue.get("cpt_code")
+
+        strict_filter = models.Filter(
+            should=[
+                models.FieldCondition(
+                    key="cpt_codes",
+                    match=models.MatchAny(any=[str(hcpcs_code).upper()])
+                ) if hcpcs_code else None,
+                models.FieldCondition(
+                    key="hcpcs_codes",
+                    match=models.MatchAny(any=[str(hcpcs_code).upper()])
+                ) if hcpcs_code else None,
+                models.FieldCondition(
+                    key="icd10_codes",
+                    match=models.MatchAny(any=[str(icd_code).upper().replace(".", "")])
+                ) if icd_code else None,
+                models.FieldCondition(
+                    key="text",
+                    match=models.MatchText(text=str(hcpcs_code))
+                ) if hcpcs_code else None,
+                models.FieldCondition(
+                    key="text",
+                    match=models.MatchText(text=str(icd_code))
+                ) if icd_code else None,
+            ]
+        )
+
+        strict_filter.should = [f for f in strict_filter.should if f is not None]
+        return strict_filter if strict_filter.should else None
 
     def _deduplicate_policies(self, policies: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Remove duplicate policies"""
@@ -1878,9 +2042,13 @@ Business Impact: {sub_archetype_info.get('business_impact', 'N/A')}
         return deduplicated
     
     def cleanup(self):
-        """Clean up resources"""
-        if self.sql_connector:
-            self.sql_connector.close()
+        """
+        Drop this corrector's references to the shared resources
+
+        The embedder, Qdrant client and SQL connector stay loaded for the next
+        corrector; resource_registry.teardown() releases them.
+        """
+        self.sql_connector = None
 
 
 if __name__ == "__main__":
@@ -49,17 +49,20 @@ UPDATE 6 CHANGES:
 - M1611 now correctly maps to ICD-9 71515 with description
 """
 
+import functools
 import json
 import re
 import subprocess
+import threading
 import warnings
 from typing import Dict, Any, List, Tuple, Optional
-from sentence_transformers import SentenceTransformer
-import torch
-from qdrant_client import QdrantClient
 from qdrant_client import models
-import pyodbc
 import pandas as pd
+from embedding_cache import get_cached_embedder
+from sql_connection_pool import get_pool, pooled_connect
+from resource_registry import get_collection_names, get_qdrant_client, get_resource, run_once
+from claim_metadata_store import (ensure_payload_indexes, fetch_claim_issues, fetch_claim_summaries,
+                                  fetch_issues_for_claims, join_claim_summaries)
 
 # Suppress pandas SQLAlchemy warning for pyodbc connections
 warnings.filterwarnings('ignore', message='.*pandas only supports SQLAlchemy.*', category=UserWarning)
@@ -453,6 +456,31 @@ REQUIRED OUTPUT FORMAT (MUST BE VALID JSON):
 CRITICAL: Output MUST be valid JSON. No narrative text outside the JSON structure.
 """
 
+
+def _with_connection(method):
+    """
+    Run a connector method with a connection for the call
+
+    The connector is shared by concurrent sessions, so its connection is
+    per thread and calls do not wait for each other. SQL Server connections
+    are checked out of the shared pool for each outermost call and returned
+    afterwards, so the pool's checkout health check replaces dropped
+    connections and a failed connect is retried on the next call instead of
+    sticking to the (process-wide) connector.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.connection is not None:
+            # Nested call: reuse the outer call's connection
+            return method(self, *args, **kwargs)
+        self._connect()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self._release_connection()
+    return wrapper
+
+
 # -------------------------------------------------------------------------
 # SQL DATABASE CONNECTION (UPDATE3: Enhanced validation & fallbacks)
 # -------------------------------------------------------------------------
@@ -476,17 +504,39 @@ class SQLDatabaseConnector:
         else:
             self.connection_string = connection_string
         
-        self.connection = None
+        self._local = threading.local()  # per-thread connection (see connection)
         self._connect()
+        if self.connection is not None:
+            print(" SQL Database connection established")
+        self._release_connection()
     
+    @property
+    def connection(self):
+        """The calling thread's connection (None outside a connector call)"""
+        return getattr(self._local, "connection", None)
+
+    @connection.setter
+    def connection(self, value):
+        self._local.connection = value
+
     def _connect(self):
         """Establish database connection"""
         try:
-            self.connection = pyodbc.connect(self.connection_string)
-            print(" SQL Database connection established")
+            # Checked out from the shared pool (no new TLS handshake per call)
+            self.connection = pooled_connect(self.connection_string)
         except Exception as e:
             print(f" SQL Database connection failed: {e}")
             self.connection = None
+
+    def _release_connection(self):
+        """Return the call's connection to the pool"""
+        if self.connection is None:
+            return
+        try:
+            self.connection.close()
+        except Exception:
+            pass
+        self.connection = None
     
     def _is_icd10(self, code: str) -> bool:
         """Check if code is ICD-10 (starts with letter, 7 chars)"""
@@ -518,6 +568,7 @@ class SQLDatabaseConnector:
         
         return gems_code
     
+    @_with_connection
     def _map_icd10_to_icd9(self, icd10: str) -> List[str]:
         """Map ICD-10 code to ICD-9 code(s) using master view (UPDATE6)"""
         if not self.connection or not icd10:
@@ -537,6 +588,7 @@ class SQLDatabaseConnector:
             print(f"    ICD-10 to ICD-9 mapping failed: {e}")
             return []
     
+    @_with_connection
     def _map_icd9_to_icd10(self, icd9: str) -> List[str]:
         """Map ICD-9 code to ICD-10 code(s) using master view (UPDATE6)"""
         if not self.connection or not icd9:
@@ -554,6 +606,7 @@ class SQLDatabaseConnector:
             return []
     
     #  UPDATE6: Simplified to use master view (includes descriptions)
+    @_with_connection
     def _get_icd10_description(self, icd10_code: str) -> str:
         """Get ICD-10 description from master view (UPDATE6)"""
         if not self.connection or not icd10_code:
@@ -576,6 +629,7 @@ class SQLDatabaseConnector:
     #  UPDATE4: New method to get database-driven ICD-10 alternatives
     #  UPDATE5: Fixed to normalize ICD-10 codes for GEMS table queries
     #  UPDATE6: Updated to use master view with built-in descriptions
+    @_with_connection
     def _get_icd10_alternatives_from_db(self, icd10_code: str, limit: int = 5) -> List[Dict[str, Any]]:
         """
         Get alternative ICD-10 codes from database using multiple strategies:
@@ -680,6 +734,7 @@ class SQLDatabaseConnector:
         return len(values) == 0
     
     #  UPDATE3: Enhanced execute_archetype_query with validation
+    @_with_connection
     def execute_archetype_query(self, archetype: str, codes: Dict[str, str]) -> List[Dict[str, Any]]:
         """Execute archetype-specific SQL query with smart ICD version detection and validation"""
         if not self.connection:
@@ -828,26 +883,31 @@ class SQLDatabaseConnector:
         }]
     
     def close(self):
-        """Close database connection"""
+        """Close the calling thread's database connection"""
         if self.connection:
+            # Returns the connection to the pool
             self.connection.close()
+            self.connection = None
             print(" SQL Database connection closed")
 
+    def close_pooled_connections(self):
+        """Close every pooled connection of the connector's connection string (checked-out ones when returned)"""
+        self.close()
+        get_pool(self.connection_string).close_all()
+
 # -------------------------------------------------------------------------
 # ARCHETYPE-DRIVEN CLAIM CORRECTOR (UPDATE3: Enhanced with fallbacks)
 # -------------------------------------------------------------------------
 
 class ArchetypeDrivenClaimCorrector:
     def __init__(self, url: str = "http://localhost:6333", sql_connection_string: str = None):
-        self.client = QdrantClient(url=url)
+        # Embedder, Qdrant client, collection listing and SQL connector are shared
+        # process-wide (resource_registry), so constructing a corrector is cheap
+        self.client = get_qdrant_client(url)
 
-        self.embedder = SentenceTransformer(
-            "nomic-ai/nomic-embed-text-v1.5",
-            device="cuda" if torch.cuda.is_available() else "cpu",
-            trust_remote_code=True
-        )
+        self.embedder = get_cached_embedder()
 
-        all_collections = [c.name for c in self.client.get_collections().collections]
+        all_collections = get_collection_names(url)
         self.policy_collections = [c for c in all_collections if c.startswith("claims__")]
 
         print(f" Loaded {len(self.policy_collections)} claims collections:")
@@ -855,6 +915,9 @@ class ArchetypeDrivenClaimCorrector:
             print(f"   - {c}")
 
         self.claims_collection = "claim_analysis_metadata"
+        if self.claims_collection in all_collections:
+            run_once(("payload_indexes", url, self.claims_collection),
+                     lambda: ensure_payload_indexes(self.client, self.claims_collection))
         
         self.source_mapping = {
             "clm104c": "Medicare Claims Processing Manual",
@@ -865,7 +928,11 @@ class ArchetypeDrivenClaimCorrector:
             "bpm": "Medicare Benefit Policy Manual"
         }
         
-        self.sql_connector = SQLDatabaseConnector(sql_connection_string)
+        self.sql_connector = get_resource(
+            ("sql_connector", __name__, sql_connection_string),
+            lambda: SQLDatabaseConnector(sql_connection_string),
+            teardown=lambda connector: connector.close_pooled_connections()
+        )
 
     def run_archetype_driven_corrections(self, claim_id: str) -> Dict[str, Any]:
         """Run archetype-driven two-stage corrections"""
@@ -1498,29 +1565,10 @@ class ArchetypeDrivenClaimCorrector:
             return {"error": f"Calibrated Stage 1 processing failed: {e}"}
 
     def _get_claim_issues(self, claim_id: str) -> List[Dict[str, Any]]:
-        """Get claim issues from the claims collection"""
+        """Get claim issues from the claims collection (exact claim_id match, paginated scroll)"""
         try:
-            hits = self.client.query_points(
-                collection_name=self.claims_collection,
-                query=[0] * 768,
-                query_filter=models.Filter(
-                    must=[
-                        models.FieldCondition(
-                            key="claim_id",
-                            match=models.MatchValue(value=claim_id)
-                        )
-                    ]
-                ),
-                limit=100,
-                with_payload=True,
-                with_vectors=False,
-            ).points
-            
-            issues = []
-            for hit in hits:
-                if hit.payload:
-                    issues.append(hit.payload)
-            
+            issues = fetch_claim_issues(self.client, claim_id, self.claims_collection)
+            issues = join_claim_summaries(issues, fetch_claim_summaries(self.client, [claim_id], self.claims_collection))
             print(f"    Found {len(issues)} claim issues")
             return issues
             
@@ -1528,6 +1576,20 @@ class ArchetypeDrivenClaimCorrector:
             print(f" Failed to get claim issues: {e}")
             return []
 
+    def get_issues_for_claims(self, claim_ids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """Get the issues of many claims at once, keyed by claim ID"""
+        try:
+            issues = fetch_issues_for_claims(self.client, claim_ids, self.claims_collection)
+            summaries = fetch_claim_summaries(self.client, claim_ids, self.claims_collection)
+            issues = {claim_id: join_claim_summaries(claim_issues, summaries)
+                      for claim_id, claim_issues in issues.items()}
+            print(f"    Found {sum(len(v) for v in issues.values())} issues across {len(issues)} claims")
+            return issues
+            
+        except Exception as e:
+            print(f" Failed to get claim issues: {e}")
+            return {str(claim_id): [] for claim_id in claim_ids}
+
     def _hybrid_search(self, collection: str, issue: Dict[str, Any], top_k: int = 5):
         """Hybrid search with proper array matching"""
         try:
@@ -1608,9 +1670,13 @@ class ArchetypeDrivenClaimCorrector:
         return deduplicated
     
     def cleanup(self):
-        """Clean up resources"""
-        if self.sql_connector:
-            self.sql_connector.close()
+        """
+        Drop this corrector's references to the shared resources
+
+        The embedder, Qdrant client and SQL connector stay loaded for the next
+        corrector; resource_registry.teardown() releases them.
+        """
+        self.sql_connector = None
 
 
 if __name__ == "__main__":
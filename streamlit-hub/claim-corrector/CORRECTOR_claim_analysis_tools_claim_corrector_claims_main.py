@@ -11,12 +11,13 @@ Claim Corrector (Claims Domain Version)
 import os
 import re
 import json
-import torch
 from typing import Dict, Any, List
-from qdrant_client import QdrantClient
 from qdrant_client.http import models
-from sentence_transformers import SentenceTransformer
 import subprocess
+from embedding_cache import get_cached_embedder
+from resource_registry import get_collection_names, get_qdrant_client, run_once
+from claim_metadata_store import (ensure_payload_indexes, fetch_claim_issues, fetch_claim_summaries,
+                                  fetch_issues_for_claims, join_claim_summaries)
 
 
 LLM_PROMPT = """
@@ -54,17 +55,14 @@ Return your answer in structured JSON format:
 
 class ClaimCorrector:
     def __init__(self, url: str = "http://localhost:6333"):
-        self.client = QdrantClient(url=url)
+        # Shared process-wide (resource_registry): no model reload or collection listing per corrector
+        self.client = get_qdrant_client(url)
 
         #  Match embedding model from your Qdrant ingestion
-        self.embedder = SentenceTransformer(
-            "nomic-ai/nomic-embed-text-v1.5",
-            device="cuda" if torch.cuda.is_available() else "cpu",
-            trust_remote_code=True
-        )
+        self.embedder = get_cached_embedder()
 
         #  Load only "claims__" policy collections
-        all_collections = [c.name for c in self.client.get_collections().collections]
+        all_collections = get_collection_names(url)
         self.policy_collections = [c for c in all_collections if c.startswith("claims__")]
 
         print(f" Loaded {len(self.policy_collections)} claims collections:")
@@ -73,6 +71,9 @@ class ClaimCorrector:
 
         #  Fixed claim data collection name
         self.claim_collection = "claim_analysis_metadata"
+        if self.claim_collection in all_collections:
+            run_once(("payload_indexes", url, self.claim_collection),
+                     lambda: ensure_payload_indexes(self.client, self.claim_collection))
 
     # ----------------------------------------------------
     # MAIN EXECUTION
@@ -122,20 +123,25 @@ class ClaimCorrector:
     # CLAIM RETRIEVAL
     # ----------------------------------------------------
     def _get_claim_issues(self, claim_id: str) -> List[Dict[str, Any]]:
-        """Retrieve claim issues from Qdrant collection"""
+        """Retrieve claim issues from Qdrant collection (exact claim_id match, all pages)"""
         try:
-            hits, _ = self.client.scroll(
-                collection_name=self.claim_collection,
-                scroll_filter=models.Filter(
-                    must=[models.FieldCondition(key="claim_id", match=models.MatchText(text=claim_id))]
-                ),
-                limit=100
-            )
-            return [h.payload for h in hits]
+            issues = fetch_claim_issues(self.client, claim_id, self.claim_collection)
+            return join_claim_summaries(issues, fetch_claim_summaries(self.client, [claim_id], self.claim_collection))
         except Exception as e:
             print(f" Failed to pull claim issues: {e}")
             return []
 
+    def get_issues_for_claims(self, claim_ids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """Retrieve the issues of many claims at once, keyed by claim ID"""
+        try:
+            issues = fetch_issues_for_claims(self.client, claim_ids, self.claim_collection)
+            summaries = fetch_claim_summaries(self.client, claim_ids, self.claim_collection)
+            return {claim_id: join_claim_summaries(claim_issues, summaries)
+                    for claim_id, claim_issues in issues.items()}
+        except Exception as e:
+            print(f" Failed to pull claim issues: {e}")
+            return {str(claim_id): [] for claim_id in claim_ids}
+
     # ----------------------------------------------------
     # HYBRID SEARCH
     # ----------------------------------------------------
@@ -116,6 +116,24 @@ echo ""
 # === NEW CLAIM ANALYZER APPS ===
 echo " New Claim Analyzer Apps:"
 create_smart_link "$BASE_DIR/cms/manuals/Raw Data/claim_analysis_tools/new_claim_analyzer1.py" "$HUB_DIR/new-claim-analyzer" "NEW_ANALYZER" "v1"
+create_smart_link "$BASE_DIR/cms/manuals/Raw Data/claim_analysis_tools/reference_cache.py" "$HUB_DIR/new-claim-analyzer" "NEW_ANALYZER" "main"
+create_smart_link "$BASE_DIR/cms/manuals/Raw Data/claim_analysis_tools/reference_snapshot.py" "$HUB_DIR/new-claim-analyzer" "NEW_ANALYZER" "main"
+create_smart_link "$BASE_DIR/cms/manuals/Raw Data/claim_analysis_tools/qdrant_batch_writer.py" "$HUB_DIR/new-claim-analyzer" "NEW_ANALYZER" "main"
+create_smart_link "$BASE_DIR/cms/manuals/Raw Data/claim_analysis_tools/claim_metadata_store.py" "$HUB_DIR/new-claim-analyzer" "NEW_ANALYZER" "main"
+create_smart_link "$BASE_DIR/cms/manuals/Raw Data/claim_analysis_tools/batch_analyzer.py" "$HUB_DIR/new-claim-analyzer" "NEW_ANALYZER" "main"
+create_smart_link "$BASE_DIR/cms/manuals/Raw Data/claim_analysis_tools/sql_connection_pool.py" "$HUB_DIR/new-claim-analyzer" "NEW_ANALYZER" "main"
+create_smart_link "$BASE_DIR/cms/manuals/Raw Data/claim_analysis_tools/risk_rules.py" "$HUB_DIR/new-claim-analyzer" "NEW_ANALYZER" "main"
+create_smart_link "$BASE_DIR/cms/manuals/Raw Data/claim_analysis_tools/lcd_coverage.py" "$HUB_DIR/new-claim-analyzer" "NEW_ANALYZER" "main"
+create_smart_link "$BASE_DIR/cms/manuals/Raw Data/claim_analysis_tools/combination_memo.py" "$HUB_DIR/new-claim-analyzer" "NEW_ANALYZER" "main"
+create_smart_link "$BASE_DIR/cms/manuals/Raw Data/claim_analysis_tools/similar_claim_index.py" "$HUB_DIR/new-claim-analyzer" "NEW_ANALYZER" "main"
+create_smart_link "$BASE_DIR/cms/manuals/Raw Data/claim_analysis_tools/code_set_lsh.py" "$HUB_DIR/new-claim-analyzer" "NEW_ANALYZER" "main"
+create_smart_link "$BASE_DIR/cms/manuals/Raw Data/claim_analysis_tools/columnar_results.py" "$HUB_DIR/new-claim-analyzer" "NEW_ANALYZER" "main"
+create_smart_link "$BASE_DIR/cms/manuals/Raw Data/claim_analysis_tools/result_sink.py" "$HUB_DIR/new-claim-analyzer" "NEW_ANALYZER" "main"
+create_smart_link "$BASE_DIR/cms/manuals/Raw Data/claim_analysis_tools/reporting_writer.py" "$HUB_DIR/new-claim-analyzer" "NEW_ANALYZER" "main"
+create_smart_link "$BASE_DIR/cms/manuals/Raw Data/claim_analysis_tools/resource_registry.py" "$HUB_DIR/new-claim-analyzer" "NEW_ANALYZER" "main"
+create_smart_link "$BASE_DIR/cms/manuals/Raw Data/claim_analysis_tools/embedding_cache.py" "$HUB_DIR/new-claim-analyzer" "NEW_ANALYZER" "main"
+create_smart_link "$BASE_DIR/cms/manuals/Raw Data/claim_analysis_tools/archetype_query_vectors.py" "$HUB_DIR/new-claim-analyzer" "NEW_ANALYZER" "main"
+create_smart_link "$BASE_DIR/cms/manuals/Raw Data/claim_analysis_tools/policy_search.py" "$HUB_DIR/new-claim-analyzer" "NEW_ANALYZER" "main"
 create_smart_link "$BASE_DIR/cms/claim_analysis_tools/new_claim_analyzer.py" "$HUB_DIR/new-claim-analyzer" "NEW_ANALYZER" "cms_tools"
 create_smart_link "$BASE_DIR/cms/manuals/Raw Data/claim_analysis_tools/archive_20251011_161233/new_claim_analyzer.py" "$HUB_DIR/new-claim-analyzer" "NEW_ANALYZER" "archive"
 create_smart_link "$BASE_DIR/cms/manuals/Raw Data/claim_analysis_tools/archive_20251011_161233/new_claim_analyzer_bckup_768.py" "$HUB_DIR/new-claim-analyzer" "NEW_ANALYZER" "backup_768"
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Precomputed Archetype Query Vectors
+Most archetype correction queries (ArchetypeDrivenClaimCorrector) depend on
+the CPT/HCPCS code alone, and codes come from a finite set. The build job
+renders build_archetype_query() for every code in [_ref].[dbo].[hcpcs_master]
+and every code-only archetype and embeds them offline. The vectors go into a
+float32 .npy matrix that the correctors memory-map, plus a JSON index
+(archetype -> code -> row).
+
+Each row also records the hash of the text it was built from. A lookup whose
+rendered query no longer matches (templates changed since the build) misses,
+like diagnosis-dependent archetypes, and the corrector encodes it live.
+
+Build: python archetype_query_vectors.py build [--output archetype_query_vectors.npy] [--backend sql|snapshot]
+Info:  python archetype_query_vectors.py info  [--output archetype_query_vectors.npy]
+"""
+
+import argparse
+import json
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from embedding_cache import normalize_text, text_hash
+from reference_snapshot import get_reference_snapshot
+from resource_registry import EMBEDDING_MODEL_NAME, get_embedder, get_resource
+from sql_connection_pool import pooled_connect
+
+DEFAULT_VECTORS_PATH = os.environ.get(
+    "ARCHETYPE_QUERY_VECTORS_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "archetype_query_vectors.npy")
+)
+DEFAULT_CONNECTION_STRING = (
+    "Driver={ODBC Driver 18 for SQL Server};"
+    "Server=localhost,1433;"
+    "UID=SA;"
+    "PWD=Bbanwo@1980!;"
+    "Database=_ref;"
+    "Encrypt=yes;"
+    "TrustServerCertificate=yes;"
+    "Connection Timeout=30;"
+)
+HCPCS_CODES_QUERY = """
+SELECT DISTINCT hcpcs_code
+FROM [_ref].[dbo].[hcpcs_master]
+WHERE hcpcs_code IS NOT NULL
+"""
+BUILD_BATCH_SIZE = 256
+
+
+def index_path_for(vectors_path: str) -> str:
+    return os.path.splitext(vectors_path)[0] + ".json"
+
+
+def _code_key(code) -> str:
+    return str(code or "").strip().upper()
+
+
+def _query_hash(query_text: str) -> str:
+    return text_hash(normalize_text(query_text))[:16]
+
+# -------------------------------------------------------------------------
+# Lookup
+# -------------------------------------------------------------------------
+
+class ArchetypeQueryVectors:
+    """Memory-mapped archetype query vectors with a (archetype, code) -> row index"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or DEFAULT_VECTORS_PATH
+        with open(index_path_for(self.path)) as f:
+            index = json.load(f)
+        self.model_name = index["model"]
+        self.built_at = index.get("built_at")
+        self.rows = index["rows"]
+        self.text_hashes = index["text_hashes"]
+        self.matrix = np.load(self.path, mmap_mode="r")
+        if self.matrix.shape[0] != len(self.text_hashes):
+            raise ValueError(f"{self.path} has {self.matrix.shape[0]} rows, index lists {len(self.text_hashes)}")
+
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, archetype: str, code: str, query_text: str) -> Optional[List[float]]:
+        """Stored vector for the code's archetype query, or None if absent or built from another text"""
+        row = self.rows.get(archetype, {}).get(_code_key(code))
+        if row is None or self.text_hashes[row] != _query_hash(query_text):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self.matrix[row].tolist()
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "model": self.model_name,
+            "built_at": self.built_at,
+            "vectors": int(self.matrix.shape[0]),
+            "dim": int(self.matrix.shape[1]) if self.matrix.ndim == 2 else 0,
+            "codes_per_archetype": {archetype: len(codes) for archetype, codes in self.rows.items()},
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+def get_archetype_query_vectors(model_name: str = EMBEDDING_MODEL_NAME,
+                                path: Optional[str] = None) -> Optional[ArchetypeQueryVectors]:
+    """
+    Shared vectors for model_name, or None when they have not been built (or were
+    built with another model); callers then encode every query live
+    """
+    path = path or DEFAULT_VECTORS_PATH
+
+    def load():
+        if not os.path.exists(path):
+            return None
+        try:
+            vectors = ArchetypeQueryVectors(path)
+        except Exception as e:
+            print(f"Warning: Could not load archetype query vectors {path}: {e}")
+            return None
+        if vectors.model_name != model_name:
+            print(f"Warning: {path} was built with {vectors.model_name}, not {model_name}; encoding queries live")
+            return None
+        print(f"Loaded {vectors.matrix.shape[0]} precomputed archetype query vectors")
+        return vectors
+
+    return get_resource(("archetype_query_vectors", path, model_name), load)
+
+# -------------------------------------------------------------------------
+# Offline build
+# -------------------------------------------------------------------------
+
+def load_hcpcs_codes(connection_string: Optional[str] = None, reference_backend: str = "sql",
+                     snapshot_path: Optional[str] = None) -> List[str]:
+    """Distinct codes of hcpcs_master (SQL Server or the local reference snapshot)"""
+    if reference_backend == "snapshot":
+        conn = get_reference_snapshot(snapshot_path).connect()
+    else:
+        conn = pooled_connect(connection_string or DEFAULT_CONNECTION_STRING)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(HCPCS_CODES_QUERY)
+        codes = {_code_key(row[0]) for row in cursor.fetchall()}
+    finally:
+        conn.close()
+    codes.discard("")
+    return sorted(codes)
+
+
+def build_archetype_query_vectors(output_path: Optional[str] = None, codes: Optional[List[str]] = None,
+                                  connection_string: Optional[str] = None, reference_backend: str = "sql",
+                                  snapshot_path: Optional[str] = None, model_name: str = EMBEDDING_MODEL_NAME,
+                                  batch_size: int = BUILD_BATCH_SIZE) -> Dict[str, Any]:
+    """
+    Render and embed every code-only archetype query for every HCPCS code
+
+    Both files are written next to their targets and renamed into place, so a
+    running corrector never maps a half-written matrix.
+    """
+    # The corrector imports this module, so its templates are imported here
+    from claim_corrector_claims3_archetype_driven_update10 import (
+        ARCHETYPE_DEFINITIONS, CODE_ONLY_QUERY_ARCHETYPES, build_archetype_query, get_cpt_description
+    )
+
+    output_path = output_path or DEFAULT_VECTORS_PATH
+    if codes is None:
+        codes = load_hcpcs_codes(connection_string, reference_backend, snapshot_path)
+    archetypes = [archetype for archetype in ARCHETYPE_DEFINITIONS if archetype in CODE_ONLY_QUERY_ARCHETYPES]
+
+    rows = {archetype: {} for archetype in archetypes}
+    texts = []
+    for archetype in archetypes:
+        for code in codes:
+            issue = {"hcpcs_code": code, "procedure_name": get_cpt_description(code)}
+            rows[archetype][code] = len(texts)
+            texts.append(build_archetype_query(issue, archetype))
+    if not texts:
+        raise ValueError("No HCPCS codes to build archetype query vectors for")
+    print(f"Embedding {len(texts)} archetype queries ({len(archetypes)} archetypes x {len(codes)} codes)")
+
+    embedder = get_embedder(model_name)
+    start = time.perf_counter()
+    tmp_path = output_path + ".tmp.npy"
+    matrix = None
+    try:
+        for batch_start in range(0, len(texts), batch_size):
+            batch = embedder.encode(texts[batch_start:batch_start + batch_size], batch_size=batch_size)
+            batch = np.asarray(batch, dtype=np.float32)
+            if matrix is None:
+                matrix = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32,
+                                                   shape=(len(texts), batch.shape[1]))
+            matrix[batch_start:batch_start + len(batch)] = batch
+            if (batch_start // batch_size) % 20 == 0:
+                print(f"   {batch_start + len(batch)}/{len(texts)}")
+        matrix.flush()
+        dim = int(matrix.shape[1])
+        del matrix
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    index = {
+        "model": model_name,
+        "built_at": datetime.now().isoformat(),
+        "dim": dim,
+        "rows": rows,
+        "text_hashes": [_query_hash(text) for text in texts]
+    }
+    index_path = index_path_for(output_path)
+    with open(index_path + ".tmp", "w") as f:
+        json.dump(index, f)
+    os.replace(tmp_path, output_path)
+    os.replace(index_path + ".tmp", index_path)
+
+    seconds = time.perf_counter() - start
+    print(f"Archetype query vectors written to {output_path} ({len(texts)} x {dim}, {seconds:.1f}s)")
+    return {"path": output_path, "vectors": len(texts), "dim": dim, "codes": len(codes),
+            "archetypes": archetypes, "seconds": round(seconds, 1)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or inspect precomputed archetype query vectors")
+    parser.add_argument("command", choices=["build", "info"])
+    parser.add_argument("--output", default=DEFAULT_VECTORS_PATH, help="Vector matrix path (.npy)")
+    parser.add_argument("--backend", choices=["sql", "snapshot"], default=os.environ.get("REFERENCE_BACKEND", "sql"),
+                        help="Where to read hcpcs_master from")
+    parser.add_argument("--connection-string", default=None, help="SQL Server ODBC connection string")
+    parser.add_argument("--snapshot-path", default=None, help="Reference snapshot file (--backend snapshot)")
+    parser.add_argument("--model", default=EMBEDDING_MODEL_NAME)
+    parser.add_argument("--batch-size", type=int, default=BUILD_BATCH_SIZE)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        summary = build_archetype_query_vectors(
+            args.output, connection_string=args.connection_string, reference_backend=args.backend,
+            snapshot_path=args.snapshot_path, model_name=args.model, batch_size=args.batch_size
+        )
+    else:
+        summary = ArchetypeQueryVectors(args.output).info()
+    print(json.dumps(summary, indent=2))
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Streaming Batch Claim Analysis
+Streams claim rows from a _claims table (or any DB-API cursor) in chunks and
+runs NewClaimAnalyzer.analyze_new_claim across a pool of worker processes.
+Results are yielded in completion order; only a bounded number of claims is
+in flight at any time, so the input is read no faster than it is analyzed.
+Similar-claim searches are collected from the workers and sent to Qdrant as
+one batch query per group of finished claims (or answered from the compact
+in-memory index when analyzer_kwargs sets compact_similar_search).
+
+Run:  python batch_analyzer.py <table> [--limit N] [--workers N] [--output results.jsonl]
+                                 [--sink-dir DIR [--sink-format parquet|jsonl] [--partition-by service_month|provider|none]]
+                                 [--reporting [--reporting-batch-rows N]]
+"""
+
+import argparse
+import json
+import math
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+from multiprocessing import util
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+import pyodbc
+from qdrant_client import QdrantClient
+
+from claim_metadata_store import query_similar_claims
+from reporting_writer import DEFAULT_BATCH_ROWS, ReportingWriter
+from result_sink import PARTITION_KEYS, SINK_FORMATS, ResultSink
+from resource_registry import get_qdrant_client
+from similar_claim_index import SimilarClaimIndex, claim_index_payload, get_similar_claim_index
+
+CLAIMS_CONNECTION_STRING = (
+    "Driver={ODBC Driver 18 for SQL Server};"
+    "Server=localhost,1433;Database=_claims;"
+    "UID=SA;PWD=Bbanwo@1980!;Encrypt=yes;TrustServerCertificate=yes;Connection Timeout=30;"
+)
+
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_SIMILAR_BATCH_SIZE = 32
+
+# -------------------------------------------------------------------------
+# Row streaming
+# -------------------------------------------------------------------------
+
+def iter_cursor_rows(cursor, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+    """Yield rows of an executed cursor as dicts, fetching chunk_size rows at a time"""
+    columns = [col[0] for col in cursor.description]
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        for row in rows:
+            yield dict(zip(columns, row))
+
+
+def stream_claim_rows(table: str, limit: Optional[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                      connection_string: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Stream the rows of a claims table without loading it into memory
+
+    Args:
+        table: Table name in the _claims database
+        limit: Optional maximum number of rows
+        chunk_size: Rows fetched per round-trip
+        connection_string: ODBC connection string (defaults to _claims)
+    """
+    quoted_table = "[" + table.replace("]", "]]") + "]"
+    top = f"TOP {int(limit)} " if limit else ""
+
+    conn = pyodbc.connect(connection_string or CLAIMS_CONNECTION_STRING)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT {top}* FROM {quoted_table}")
+        yield from iter_cursor_rows(cursor, chunk_size)
+        cursor.close()
+    finally:
+        conn.close()
+
+
+def _present(value) -> bool:
+    """Non-null check matching pd.notna for scalar DB values"""
+    if value is None:
+        return False
+    return not (isinstance(value, float) and math.isnan(value))
+
+
+def normalize_claim_row(row: Dict[str, Any], row_number: int = 0) -> Dict[str, Any]:
+    """
+    Convert a raw claims-table row into the claim dict analyze_new_claim expects
+
+    Same column detection as normalize_row_to_claim in the claim analysis app.
+    """
+    def pick(*keys):
+        for k in keys:
+            if k in row and _present(row[k]):
+                return str(row[k]).strip()
+        return None
+
+    clm_id = pick('CLM_ID', 'claim_id', 'clm_id', 'claimid') or f"cms-{row_number}"
+    desyn = pick('DESYNPUF_ID', 'bene_id', 'patient_id') or "unknown-patient"
+    from_dt = pick('CLM_FROM_DT', 'service_date', 'from_date', 'srvc_from_dt') or ""
+    thru_dt = pick('CLM_THRU_DT', 'thru_date', 'srvc_thru_dt') or from_dt
+    prvdr = pick('PRVDR_NUM', 'provider_id', 'npi', 'tin') or "unknown-provider"
+
+    dx_map, proc_map = {}, {}
+    dx_cols = [c for c in row if str(c).lower().startswith(('icd9', 'icd10', 'dx', 'diag'))]
+    for i, c in enumerate(dx_cols[:10], 1):
+        if _present(row[c]):
+            dx_map[f"ICD9_DGNS_CD_{i}"] = str(row[c]).strip()
+    hcpcs_cols = [c for c in row if str(c).lower().startswith(('hcpcs', 'cpt', 'proc'))]
+    for i, c in enumerate(hcpcs_cols[:45], 1):
+        if _present(row[c]):
+            proc_map[f"HCPCS_CD_{i}"] = str(row[c]).strip()
+
+    return {
+        "CLM_ID": clm_id,
+        "DESYNPUF_ID": desyn,
+        "CLM_FROM_DT": from_dt,
+        "CLM_THRU_DT": thru_dt,
+        "PRVDR_NUM": prvdr,
+        "diagnosis_codes": dx_map,
+        "procedure_codes": proc_map,
+    }
+
+# -------------------------------------------------------------------------
+# Worker process
+# -------------------------------------------------------------------------
+
+_worker_analyzer = None
+
+
+def _shutdown_worker():
+    """Make the worker's queued Qdrant points durable and release its connection"""
+    global _worker_analyzer
+    if _worker_analyzer is None:
+        return
+    try:
+        _worker_analyzer.flush_qdrant_writes()
+    except Exception as e:
+        print(f"Warning: Final Qdrant flush failed in worker {os.getpid()}: {e}")
+    _worker_analyzer.close()
+    _worker_analyzer = None
+
+
+def _init_worker(analyzer_kwargs: Dict[str, Any]):
+    """Create the per-process analyzer (one connection, batched Qdrant writes)"""
+    global _worker_analyzer
+    from new_claim_analyzer1 import NewClaimAnalyzer
+
+    options = {"persistent_connection": True, "qdrant_batch_mode": True, "defer_similar_search": True}
+    options.update(analyzer_kwargs or {})
+    _worker_analyzer = NewClaimAnalyzer(**options)
+
+    # Runs when the pool shuts the worker down
+    util.Finalize(None, _shutdown_worker, exitpriority=10)
+
+
+def _analyze_in_worker(claim: Dict[str, Any]) -> Dict[str, Any]:
+    start = time.perf_counter()
+    try:
+        result = _worker_analyzer.analyze_new_claim(claim)
+    except Exception as e:
+        result = {"error": f"Analysis failed: {e}"}
+    return {
+        "claim_id": claim.get("CLM_ID"),
+        "worker_pid": os.getpid(),
+        "seconds": round(time.perf_counter() - start, 4),
+        "result": result
+    }
+
+# -------------------------------------------------------------------------
+# Similar-claim search
+# -------------------------------------------------------------------------
+
+def _attach_similar_claims(items, client: QdrantClient, limit: int = 5,
+                           similar_index: Optional[SimilarClaimIndex] = None, **search_kwargs):
+    """
+    Run the deferred similar-claim queries of finished claims as one batch request
+
+    With a similar_index the queries are answered from memory and the finished
+    claims are added to the index for the next batch.
+    """
+    queued = []
+    for item in items:
+        query = item["result"].pop("similar_claims_query", None) if isinstance(item["result"], dict) else None
+        if query:
+            queued.append((item, query))
+    if not queued:
+        return items
+
+    try:
+        if similar_index is not None:
+            found = similar_index.search([query for _, query in queued], limit=limit, **search_kwargs)
+        else:
+            found = query_similar_claims(client, [query for _, query in queued], limit=limit, **search_kwargs)
+    except Exception as e:
+        print(f"Warning: Batched similar-claim search failed: {e}")
+        found = [[] for _ in queued]
+
+    if similar_index is not None:
+        for item, query in queued:
+            result = item["result"]
+            similar_index.add(query["claim_id"], query["vector"], claim_index_payload(
+                query["claim_id"], result.get("metadata", {}), result.get("detailed_issues", [])
+            ))
+
+    for (item, _), similar_claims in zip(queued, found):
+        item["result"]["similar_claims"] = similar_claims
+    return items
+
+# -------------------------------------------------------------------------
+# Public API
+# -------------------------------------------------------------------------
+
+def analyze_claims(claims: Iterable[Dict[str, Any]], workers: Optional[int] = None,
+                   max_in_flight: Optional[int] = None,
+                   analyzer_kwargs: Optional[Dict[str, Any]] = None,
+                   similar_batch_size: int = DEFAULT_SIMILAR_BATCH_SIZE,
+                   similar_search_kwargs: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Analyze claims across a pool of worker processes
+
+    Args:
+        claims: Claim dicts (as analyze_new_claim expects) or raw claims-table rows
+        workers: Worker processes (defaults to the CPU count)
+        max_in_flight: Claims submitted but not yet yielded (defaults to 2 x workers);
+            the input is only read as results are consumed
+        analyzer_kwargs: Extra NewClaimAnalyzer constructor arguments for every worker
+        similar_batch_size: Finished claims per batched similar-claim query
+            (0 = each worker searches per claim)
+        similar_search_kwargs: Extra query_similar_claims arguments (limit, provider_type,
+            risk_category, payload_fields)
+
+    Yields:
+        {"claim_id", "worker_pid", "seconds", "result"} in completion order
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max(1, max_in_flight or workers * 2)
+
+    worker_kwargs = dict(analyzer_kwargs or {})
+    client = None
+    similar_index = None
+    if similar_batch_size > 0:
+        client = get_qdrant_client(host="localhost", port=6333)
+        # The parent answers the deferred queries, so only it needs the compact index
+        if worker_kwargs.pop("compact_similar_search", False):
+            similar_index = get_similar_claim_index(client)
+    else:
+        worker_kwargs.setdefault("defer_similar_search", False)
+
+    finished = []
+
+    def drain(force=False):
+        # Hand finished claims out once a full similar-claim batch is ready
+        if client is None or force or len(finished) >= similar_batch_size:
+            if client is not None:
+                _attach_similar_claims(finished, client, similar_index=similar_index,
+                                       **(similar_search_kwargs or {}))
+            ready = finished[:]
+            del finished[:]
+            return ready
+        return []
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(worker_kwargs,)) as pool:
+        in_flight = set()
+        row_number = 0
+
+        for claim in claims:
+            if "diagnosis_codes" not in claim and "procedure_codes" not in claim:
+                claim = normalize_claim_row(claim, row_number)
+            row_number += 1
+
+            in_flight.add(pool.submit(_analyze_in_worker, claim))
+            if len(in_flight) < max_in_flight:
+                continue
+
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            finished.extend(future.result() for future in done)
+            yield from drain()
+
+        while in_flight:
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            finished.extend(future.result() for future in done)
+            yield from drain()
+
+    yield from drain(force=True)
+
+
+def analyze_table(table: str, limit: Optional[int] = None, workers: Optional[int] = None,
+                  chunk_size: int = DEFAULT_CHUNK_SIZE, **kwargs) -> Iterator[Dict[str, Any]]:
+    """Stream a _claims table through analyze_claims"""
+    return analyze_claims(stream_claim_rows(table, limit, chunk_size), workers=workers, **kwargs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyze a claims table with a process pool")
+    parser.add_argument("table", help="Table in the _claims database")
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--output", default=None, help="Write one JSON result per line")
+    parser.add_argument("--sink-dir", default=None, help="Export result tables (partitioned Parquet/JSONL) under this directory")
+    parser.add_argument("--sink-format", choices=SINK_FORMATS, default="parquet")
+    parser.add_argument("--partition-by", choices=PARTITION_KEYS + ("none",), default="service_month")
+    parser.add_argument("--reporting", action="store_true", help="Merge per-combination results into _reporting")
+    parser.add_argument("--reporting-batch-rows", type=int, default=DEFAULT_BATCH_ROWS)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    analyzed = failed = 0
+    out = open(args.output, "w") if args.output else None
+    sink = ResultSink(args.sink_dir, fmt=args.sink_format,
+                      partition_by=None if args.partition_by == "none" else args.partition_by) if args.sink_dir else None
+    reporting = ReportingWriter(batch_rows=args.reporting_batch_rows) if args.reporting else None
+    try:
+        for item in analyze_table(args.table, args.limit, args.workers, args.chunk_size):
+            analyzed += 1
+            if "error" in item["result"]:
+                failed += 1
+                print(f"  {item['claim_id']}: {item['result']['error']}")
+            if out:
+                out.write(json.dumps(item, default=str) + "\n")
+            if sink:
+                sink.write_analysis(item["result"])
+            if reporting:
+                reporting.add_result(item["result"], item["claim_id"])
+            if analyzed % 100 == 0:
+                rate = analyzed / (time.perf_counter() - started)
+                print(f"{datetime.now():%H:%M:%S} analyzed {analyzed} claims ({rate:.1f}/s, {failed} failed)")
+    finally:
+        if out:
+            out.close()
+        if sink:
+            sink.close()
+            print(f"Exported {sink.rows_written} rows to {len(sink.files_committed)} files under {args.sink_dir}")
+        if reporting:
+            reporting.flush()
+            print(f"Reporting write-back: {reporting.stats()}")
+
+    print(f"Done: {analyzed} claims, {failed} failed, {time.perf_counter() - started:.1f}s")
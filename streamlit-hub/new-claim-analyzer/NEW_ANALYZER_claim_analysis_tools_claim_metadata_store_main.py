@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+"""
+Claim Metadata Store Maintenance
+Deterministic point IDs for the claim_analysis_metadata collection, removal of
+a claim's stale points after re-analysis, compaction of duplicates left by
+earlier analyzer versions, keyword payload indexes with scroll-based issue
+retrieval, and batched similar-claim queries
+
+The collection holds two record types: one "combination" point per DX-PROC
+pair (combination-specific fields only) and one "claim_summary" point per
+claim with the claim-level metadata. Issue readers skip summary points and
+join them back by claim_id when they need the claim-level fields.
+
+Compact: python claim_metadata_store.py compact [--dry-run] [--host localhost] [--port 6333]
+Indexes: python claim_metadata_store.py index
+"""
+
+import argparse
+import uuid
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+from qdrant_client import QdrantClient
+from qdrant_client import models
+
+COLLECTION_NAME = "claim_analysis_metadata"
+SCROLL_BATCH_SIZE = 1000
+DELETE_BATCH_SIZE = 1000
+ISSUE_PAGE_SIZE = 256
+CLAIM_ID_BATCH_SIZE = 256
+
+# Point types stored in the collection (payload field "record_type")
+COMBINATION_RECORD = "combination"
+CLAIM_SUMMARY_RECORD = "claim_summary"
+
+# Exact-match keyword indexes for the fields issue retrieval and similar-claim filters use
+PAYLOAD_INDEX_FIELDS = ["claim_id", "hcpcs_code", "icd10_code", "risk_category", "denial_risk_level",
+                        "provider_type", "record_type"]
+
+COMPACTION_FIELDS = ["claim_id", "dx_position", "hcpcs_position", "analysis_id", "analysis_timestamp"]
+
+# Payload projection for similar-claim results that only need the summary
+SIMILAR_CLAIM_SUMMARY_FIELDS = [
+    "claim_id", "provider_type", "icd10_code", "hcpcs_code",
+    "denial_risk_level", "denial_risk_score", "risk_category"
+]
+
+# Summary payload keys that describe the stored record rather than the claim
+SUMMARY_BOOKKEEPING_FIELDS = {"record_type", "analysis_id", "analysis_timestamp", "combination_count", "code_signature"}
+
+
+def combination_point_id(clm_id, dx_position, hcpcs_position, dx_code, hcpcs_code) -> str:
+    """Deterministic point ID for one DX-PROC combination of a claim (re-analysis overwrites it)"""
+    key = f"{clm_id}_{dx_position}_{hcpcs_position}_{dx_code or ''}_{hcpcs_code or ''}"
+    return str(uuid.uuid5(uuid.NAMESPACE_DNS, key))
+
+
+def claim_summary_point_id(clm_id) -> str:
+    """Deterministic point ID for a claim's summary point"""
+    return str(uuid.uuid5(uuid.NAMESPACE_DNS, f"{clm_id}_claim_summary"))
+
+
+def delete_stale_claim_points(client: QdrantClient, claim_id: str, keep_ids: List[str],
+                              collection_name: str = COLLECTION_NAME, wait: bool = False):
+    """
+    Delete a claim's points that are not part of its latest analysis
+
+    Args:
+        client: QdrantClient
+        claim_id: Claim whose points are being replaced
+        keep_ids: Point IDs written by the latest analysis
+        collection_name: Target collection
+        wait: Wait for the delete to be applied
+    """
+    client.delete(
+        collection_name=collection_name,
+        points_selector=models.FilterSelector(
+            filter=models.Filter(
+                must=[models.FieldCondition(key="claim_id", match=models.MatchValue(value=str(claim_id)))],
+                must_not=[models.HasIdCondition(has_id=list(keep_ids))]
+            )
+        ),
+        wait=wait
+    )
+
+
+def ensure_payload_indexes(client: QdrantClient, collection_name: str = COLLECTION_NAME,
+                           fields: List[str] = None) -> List[str]:
+    """
+    Create the missing keyword payload indexes
+
+    Returns:
+        Fields that were indexed by this call
+    """
+    fields = fields or PAYLOAD_INDEX_FIELDS
+    try:
+        existing = set((client.get_collection(collection_name).payload_schema or {}).keys())
+    except Exception as e:
+        print(f"Warning: Could not read payload indexes of {collection_name}: {e}")
+        return []
+
+    created = []
+    for field in fields:
+        if field in existing:
+            continue
+        try:
+            client.create_payload_index(
+                collection_name=collection_name,
+                field_name=field,
+                field_schema=models.PayloadSchemaType.KEYWORD,
+                wait=True
+            )
+            created.append(field)
+        except Exception as e:
+            print(f"Warning: Could not create payload index on {field}: {e}")
+
+    if created:
+        print(f"Created keyword payload indexes on {collection_name}: {', '.join(created)}")
+    return created
+
+
+def _scroll_filtered(client: QdrantClient, collection_name: str, scroll_filter: models.Filter,
+                     page_size: int, with_payload=True, with_vectors: bool = False):
+    """Yield every point matching the filter, one scroll page at a time"""
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection_name,
+            scroll_filter=scroll_filter,
+            limit=page_size,
+            offset=offset,
+            with_payload=with_payload,
+            with_vectors=with_vectors
+        )
+        for point in points:
+            yield point
+        if offset is None:
+            break
+
+
+def _exclude_summaries() -> List[models.FieldCondition]:
+    # must_not condition, so combination points written before record_type existed still match
+    return [_match("record_type", CLAIM_SUMMARY_RECORD)]
+
+
+def fetch_claim_issues(client: QdrantClient, claim_id: str, collection_name: str = COLLECTION_NAME,
+                       page_size: int = ISSUE_PAGE_SIZE) -> List[Dict[str, Any]]:
+    """
+    All stored issue payloads of one claim (exact claim_id match, paginated scroll)
+
+    Args:
+        client: QdrantClient
+        claim_id: Claim to fetch
+        collection_name: Source collection
+        page_size: Points per scroll request
+    """
+    scroll_filter = models.Filter(must=[_match("claim_id", claim_id)], must_not=_exclude_summaries())
+    return [
+        point.payload for point in _scroll_filtered(client, collection_name, scroll_filter, page_size)
+        if point.payload
+    ]
+
+
+def fetch_issues_for_claims(client: QdrantClient, claim_ids: List[str], collection_name: str = COLLECTION_NAME,
+                            page_size: int = SCROLL_BATCH_SIZE,
+                            id_batch_size: int = CLAIM_ID_BATCH_SIZE) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Issue payloads for many claims at once (MatchAny over claim_id, paginated scroll)
+
+    Returns:
+        Issues keyed by claim ID; every requested ID is present, with an empty list if it has none
+    """
+    claim_ids = list(dict.fromkeys(str(claim_id) for claim_id in claim_ids))
+    issues = {claim_id: [] for claim_id in claim_ids}
+
+    for start in range(0, len(claim_ids), id_batch_size):
+        scroll_filter = models.Filter(must=[_match("claim_id", claim_ids[start:start + id_batch_size])],
+                                      must_not=_exclude_summaries())
+        for point in _scroll_filtered(client, collection_name, scroll_filter, page_size):
+            payload = point.payload or {}
+            claim_id = str(payload.get("claim_id"))
+            if payload and claim_id in issues:
+                issues[claim_id].append(payload)
+
+    return issues
+
+
+def fetch_claim_summaries(client: QdrantClient, claim_ids: List[str],
+                          collection_name: str = COLLECTION_NAME) -> Dict[str, Dict[str, Any]]:
+    """
+    Claim summary payloads by claim ID (point lookups by deterministic ID, no filter scan)
+
+    Claims without a summary point (analyzed before summaries existed) are absent.
+    """
+    claim_ids = list(dict.fromkeys(str(claim_id) for claim_id in claim_ids))
+    summaries = {}
+    for start in range(0, len(claim_ids), CLAIM_ID_BATCH_SIZE):
+        chunk = claim_ids[start:start + CLAIM_ID_BATCH_SIZE]
+        points = client.retrieve(
+            collection_name=collection_name,
+            ids=[claim_summary_point_id(claim_id) for claim_id in chunk],
+            with_payload=True,
+            with_vectors=False
+        )
+        for point in points:
+            payload = point.payload or {}
+            summaries[str(payload.get("claim_id"))] = payload
+    return summaries
+
+
+def claim_summaries_filter() -> models.Filter:
+    """Filter selecting only claim summary points"""
+    return models.Filter(must=[_match("record_type", CLAIM_SUMMARY_RECORD)])
+
+
+def iter_claim_summaries(client: QdrantClient, collection_name: str = COLLECTION_NAME,
+                         page_size: int = SCROLL_BATCH_SIZE, payload_fields=True, with_vectors: bool = False):
+    """Yield every claim summary point of the collection (paginated scroll)"""
+    yield from _scroll_filtered(client, collection_name, claim_summaries_filter(), page_size,
+                                with_payload=payload_fields, with_vectors=with_vectors)
+
+
+def join_claim_summaries(issues: List[Dict[str, Any]], summaries: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Add the claim-level fields of each issue's summary (patient, provider, service
+    date, claim_metadata totals) to the issue payloads; issue fields win on conflict
+    """
+    joined = []
+    for issue in issues:
+        summary = summaries.get(str(issue.get("claim_id")), {})
+        claim_fields = {k: v for k, v in summary.items() if k not in SUMMARY_BOOKKEEPING_FIELDS}
+        joined.append({**claim_fields, **issue})
+    return joined
+
+
+def _match(key: str, value: Union[str, Sequence[str]]) -> models.FieldCondition:
+    """MatchValue for a single value, MatchAny for a list"""
+    if isinstance(value, (list, tuple, set)):
+        return models.FieldCondition(key=key, match=models.MatchAny(any=[str(v) for v in value]))
+    return models.FieldCondition(key=key, match=models.MatchValue(value=str(value)))
+
+
+def similar_claims_filter(exclude_claim_id: Optional[str] = None,
+                          provider_type: Union[str, Sequence[str], None] = None,
+                          risk_category: Union[str, Sequence[str], None] = None) -> Optional[models.Filter]:
+    """
+    Payload filter for a similar-claim query
+
+    Args:
+        exclude_claim_id: Query claim, so its own combination points are not returned
+            (claim summary points are always excluded)
+        provider_type: Only claims of this provider type (or any of a list)
+        risk_category: Only combinations in this risk category (or any of a list)
+    """
+    must = []
+    if provider_type:
+        must.append(_match("provider_type", provider_type))
+    if risk_category:
+        must.append(_match("risk_category", risk_category))
+    must_not = _exclude_summaries()
+    if exclude_claim_id is not None:
+        must_not.append(_match("claim_id", exclude_claim_id))
+    return models.Filter(must=must or None, must_not=must_not)
+
+
+def query_similar_claims(client: QdrantClient, queries: List[Dict[str, Any]], limit: int = 5,
+                         provider_type: Union[str, Sequence[str], None] = None,
+                         risk_category: Union[str, Sequence[str], None] = None,
+                         payload_fields: Optional[List[str]] = None,
+                         collection_name: str = COLLECTION_NAME) -> List[List[Dict[str, Any]]]:
+    """
+    Similar-claim search for many claims in one query_batch_points request
+
+    Args:
+        client: QdrantClient
+        queries: One {"vector": [...], "claim_id": ...} per claim; the claim's own points are excluded
+        limit: Results per claim
+        provider_type: Optional provider type restriction (str or list)
+        risk_category: Optional risk category restriction (str or list)
+        payload_fields: Payload keys to return (e.g. SIMILAR_CLAIM_SUMMARY_FIELDS); None returns the full payload
+        collection_name: Target collection
+
+    Returns:
+        Per query, a list of {"score", "vector_id", "payload"} in score order
+    """
+    if not queries:
+        return []
+
+    requests = [
+        models.QueryRequest(
+            query=list(query["vector"]),
+            filter=similar_claims_filter(query.get("claim_id"), provider_type, risk_category),
+            limit=limit,
+            with_payload=payload_fields if payload_fields is not None else True,
+            with_vector=False
+        )
+        for query in queries
+    ]
+    responses = client.query_batch_points(collection_name=collection_name, requests=requests)
+
+    return [
+        [{"score": point.score, "vector_id": point.id, "payload": point.payload} for point in response.points]
+        for response in responses
+    ]
+
+
+def _scroll_all(client: QdrantClient, collection_name: str, fields: List[str]):
+    """Yield every point of the collection (payload subset only, no vectors)"""
+    yield from _scroll_filtered(client, collection_name, None, SCROLL_BATCH_SIZE, with_payload=fields)
+
+
+def find_redundant_points(points) -> Dict[str, Any]:
+    """
+    Pick the points to delete
+
+    Per claim, the newest analysis wins: if any point carries an analysis_id,
+    only the points of the most recent analysis are kept. Claims written before
+    analysis_id existed keep the newest point per (dx_position, hcpcs_position).
+
+    Returns:
+        Dictionary with the IDs to delete and counts
+    """
+    by_claim = {}
+    for point in points:
+        payload = point.payload or {}
+        by_claim.setdefault(str(payload.get("claim_id", "unknown")), []).append(point)
+
+    delete_ids = []
+    stale = 0
+    duplicates = 0
+
+    for claim_points in by_claim.values():
+        tagged = [p for p in claim_points if (p.payload or {}).get("analysis_id")]
+
+        if tagged:
+            latest = max(tagged, key=lambda p: str(p.payload.get("analysis_timestamp", "")))
+            latest_analysis = latest.payload["analysis_id"]
+            for point in claim_points:
+                if (point.payload or {}).get("analysis_id") != latest_analysis:
+                    delete_ids.append(point.id)
+                    stale += 1
+            continue
+
+        newest = {}
+        for point in claim_points:
+            payload = point.payload or {}
+            key = (payload.get("dx_position"), payload.get("hcpcs_position"))
+            current = newest.get(key)
+            if current is None or str(payload.get("analysis_timestamp", "")) > str(current.payload.get("analysis_timestamp", "")):
+                if current is not None:
+                    delete_ids.append(current.id)
+                    duplicates += 1
+                newest[key] = point
+            else:
+                delete_ids.append(point.id)
+                duplicates += 1
+
+    return {
+        "claims": len(by_claim),
+        "delete_ids": delete_ids,
+        "stale_points": stale,
+        "duplicate_points": duplicates
+    }
+
+
+def compact_collection(client: QdrantClient, collection_name: str = COLLECTION_NAME,
+                       dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Remove duplicate and superseded claim points from the collection
+
+    Returns:
+        Compaction report
+    """
+    print(f"=== Compacting {collection_name} ===")
+    points = list(_scroll_all(client, collection_name, COMPACTION_FIELDS))
+    plan = find_redundant_points(points)
+    delete_ids = plan["delete_ids"]
+
+    print(f"  Scanned {len(points)} points across {plan['claims']} claims")
+    print(f"  Superseded analyses: {plan['stale_points']} points")
+    print(f"  Duplicate combinations: {plan['duplicate_points']} points")
+
+    if delete_ids and not dry_run:
+        for start in range(0, len(delete_ids), DELETE_BATCH_SIZE):
+            client.delete(
+                collection_name=collection_name,
+                points_selector=models.PointIdsList(points=delete_ids[start:start + DELETE_BATCH_SIZE]),
+                wait=True
+            )
+        print(f"  Deleted {len(delete_ids)} points")
+    elif dry_run:
+        print(f"  Dry run: {len(delete_ids)} points would be deleted")
+
+    return {
+        "collection": collection_name,
+        "scanned_points": len(points),
+        "claims": plan["claims"],
+        "stale_points": plan["stale_points"],
+        "duplicate_points": plan["duplicate_points"],
+        "deleted_points": 0 if dry_run else len(delete_ids),
+        "dry_run": dry_run
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the claim_analysis_metadata collection")
+    parser.add_argument("command", choices=["compact", "index"])
+    parser.add_argument("--dry-run", action="store_true", help="Report what would be deleted without deleting")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=6333)
+    parser.add_argument("--collection", default=COLLECTION_NAME)
+    args = parser.parse_args()
+
+    client = QdrantClient(host=args.host, port=args.port)
+    if args.command == "index":
+        print({"collection": args.collection, "created": ensure_payload_indexes(client, args.collection)})
+    else:
+        report = compact_collection(client, args.collection, args.dry_run)
+        print(report)
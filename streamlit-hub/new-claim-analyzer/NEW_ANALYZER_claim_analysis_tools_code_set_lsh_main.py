@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Code-Set MinHash / LSH Index
+Finds claims billed with nearly the same codes. Each claim's set of CPT/HCPCS,
+ICD and modifier codes is reduced to a MinHash signature (computed in
+NewClaimAnalyzer._extract_metadata); an LSH banding index over the signatures
+returns the claims whose estimated Jaccard similarity is high without
+comparing against every stored claim.
+
+The index lives in process memory, takes incremental inserts as claims are
+analyzed and can be rebuilt from the "code_signature" of the collection's
+claim summary points. The summary points also carry the INDEX_PAYLOAD_FIELDS,
+so a rebuilt index returns the same match payloads as one filled in process.
+"""
+
+import hashlib
+import json
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from claim_metadata_store import COLLECTION_NAME, iter_claim_summaries
+
+NUM_PERMUTATIONS = 64
+NUM_BANDS = 16  # 4 rows per band: pairs above ~0.5 Jaccard share a bucket with high probability
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+PERMUTATION_SEED = 1
+
+# Payload kept next to each signature and returned with matches
+INDEX_PAYLOAD_FIELDS = ["claim_id", "provider_type", "all_cpt_codes", "icd_codes", "modifiers"]
+
+
+def claim_code_tokens(cpt_codes: Iterable[str], icd_codes: Iterable[str], modifiers: Iterable[str] = ()) -> set:
+    """Set elements of a claim: codes are prefixed by kind so a CPT and an ICD code never collide"""
+    tokens = {f"CPT:{str(code).strip().upper()}" for code in cpt_codes if code}
+    tokens.update(f"ICD:{str(code).strip().upper()}" for code in icd_codes if code)
+    tokens.update(f"MOD:{str(mod).strip().upper()}" for mod in modifiers if mod)
+    return tokens
+
+
+def _token_hashes(tokens: Iterable[str]) -> np.ndarray:
+    return np.array(
+        [int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=4).digest(), "little") for token in tokens],
+        dtype=np.uint64
+    )
+
+
+class MinHasher:
+    """MinHash signatures with universal hashes (a * x + b) mod p, truncated to 32 bits"""
+
+    def __init__(self, num_permutations: int = NUM_PERMUTATIONS, seed: int = PERMUTATION_SEED):
+        rng = np.random.RandomState(seed)
+        # a, b < 2^31 and x < 2^32 keep a * x + b below 2^64 (no uint64 overflow)
+        self.a = rng.randint(1, 1 << 31, size=num_permutations, dtype=np.uint64)
+        self.b = rng.randint(0, 1 << 31, size=num_permutations, dtype=np.uint64)
+        self.num_permutations = num_permutations
+
+    def signature(self, tokens: Iterable[str]) -> np.ndarray:
+        """(num_permutations,) uint32 signature; an empty set gives all MAX_HASH"""
+        hashes = _token_hashes(tokens)
+        if hashes.size == 0:
+            return np.full(self.num_permutations, MAX_HASH, dtype=np.uint32)
+        permuted = (np.outer(hashes, self.a) + self.b) % np.uint64(MERSENNE_PRIME)
+        return (permuted & np.uint64(MAX_HASH)).min(axis=0).astype(np.uint32)
+
+
+_default_hasher = None
+
+
+def code_set_signature(cpt_codes: Iterable[str], icd_codes: Iterable[str], modifiers: Iterable[str] = ()) -> List[int]:
+    """MinHash signature of a claim's (CPT, ICD, modifier) set as a JSON-friendly list"""
+    global _default_hasher
+    if _default_hasher is None:
+        _default_hasher = MinHasher()
+    return _default_hasher.signature(claim_code_tokens(cpt_codes, icd_codes, modifiers)).tolist()
+
+
+def estimated_jaccard(signature_a, signature_b) -> float:
+    """Share of equal signature positions (unbiased Jaccard estimate)"""
+    return float(np.mean(np.asarray(signature_a) == np.asarray(signature_b)))
+
+
+class CodeSetLSHIndex:
+    """LSH banding index over MinHash signatures, keyed by claim ID"""
+
+    def __init__(self, num_permutations: int = NUM_PERMUTATIONS, num_bands: int = NUM_BANDS):
+        if num_permutations % num_bands:
+            raise ValueError(f"num_permutations ({num_permutations}) must be a multiple of num_bands ({num_bands})")
+        self.num_permutations = num_permutations
+        self.num_bands = num_bands
+        self.rows_per_band = num_permutations // num_bands
+
+        self._buckets = [{} for _ in range(num_bands)]  # band -> bucket key -> set of claim IDs
+        self._signatures = {}  # claim_id -> uint32 signature
+        self._payloads = {}
+        self._lock = threading.RLock()
+        self.queries = 0
+        self.candidates_checked = 0
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def __contains__(self, claim_id):
+        return str(claim_id) in self._signatures
+
+    def _band_keys(self, signature: np.ndarray):
+        rows = self.rows_per_band
+        return [signature[band * rows:(band + 1) * rows].tobytes() for band in range(self.num_bands)]
+
+    def _as_signature(self, signature) -> np.ndarray:
+        signature = np.asarray(signature, dtype=np.uint32)
+        if signature.shape != (self.num_permutations,):
+            raise ValueError(f"Expected a signature of {self.num_permutations} values, got {signature.shape}")
+        return signature
+
+    # ------------------------------------------------------------------
+    # Updates
+    # ------------------------------------------------------------------
+    def insert(self, claim_id, signature, payload: Optional[Dict[str, Any]] = None):
+        """Add a claim, replacing its previous signature on re-analysis"""
+        claim_id = str(claim_id)
+        signature = self._as_signature(signature)
+        with self._lock:
+            self._remove_locked(claim_id)
+            for band, key in enumerate(self._band_keys(signature)):
+                self._buckets[band].setdefault(key, set()).add(claim_id)
+            self._signatures[claim_id] = signature
+            self._payloads[claim_id] = {k: v for k, v in (payload or {}).items() if k in INDEX_PAYLOAD_FIELDS}
+
+    def remove(self, claim_id) -> bool:
+        with self._lock:
+            return self._remove_locked(str(claim_id))
+
+    def _remove_locked(self, claim_id: str) -> bool:
+        signature = self._signatures.pop(claim_id, None)
+        if signature is None:
+            return False
+        self._payloads.pop(claim_id, None)
+        for band, key in enumerate(self._band_keys(signature)):
+            bucket = self._buckets[band].get(key)
+            if bucket is not None:
+                bucket.discard(claim_id)
+                if not bucket:
+                    del self._buckets[band][key]
+        return True
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    def query(self, signature, limit: int = 10, min_similarity: float = 0.0,
+              exclude_claim_id=None) -> List[Dict[str, Any]]:
+        """
+        Claims sharing at least one band with the signature, ranked by estimated Jaccard
+
+        Args:
+            signature: MinHash signature of the query claim
+            limit: Maximum matches
+            min_similarity: Drop candidates below this estimated Jaccard similarity
+            exclude_claim_id: Query claim, so it does not match itself
+
+        Returns:
+            List of {"claim_id", "similarity", "payload"} in descending similarity
+        """
+        signature = self._as_signature(signature)
+        exclude = str(exclude_claim_id) if exclude_claim_id is not None else None
+        with self._lock:
+            candidates = set()
+            for band, key in enumerate(self._band_keys(signature)):
+                candidates.update(self._buckets[band].get(key, ()))
+            candidates.discard(exclude)
+
+            self.queries += 1
+            self.candidates_checked += len(candidates)
+            if not candidates:
+                return []
+
+            claim_ids = list(candidates)
+            stored = np.stack([self._signatures[claim_id] for claim_id in claim_ids])
+            similarities = (stored == signature).mean(axis=1)
+
+            order = np.argsort(-similarities, kind="stable")
+            matches = []
+            for position in order:
+                similarity = float(similarities[position])
+                if similarity < min_similarity or len(matches) >= limit:
+                    break
+                claim_id = claim_ids[position]
+                matches.append({
+                    "claim_id": claim_id,
+                    "similarity": round(similarity, 4),
+                    "payload": dict(self._payloads.get(claim_id, {}))
+                })
+            return matches
+
+    def query_many(self, queries: List[Dict[str, Any]], limit: int = 10,
+                   min_similarity: float = 0.0) -> List[List[Dict[str, Any]]]:
+        """query() for many {"claim_id", "signature"} dicts"""
+        return [
+            self.query(query["signature"], limit=limit, min_similarity=min_similarity,
+                       exclude_claim_id=query.get("claim_id"))
+            for query in queries
+        ]
+
+    # ------------------------------------------------------------------
+    # Loading / persistence
+    # ------------------------------------------------------------------
+    def load_from_qdrant(self, client, collection_name: str = COLLECTION_NAME) -> int:
+        """Insert the code_signature of every claim summary point in the collection"""
+        loaded = 0
+        for point in iter_claim_summaries(client, collection_name,
+                                          payload_fields=INDEX_PAYLOAD_FIELDS + ["code_signature"]):
+            payload = point.payload or {}
+            signature = payload.get("code_signature")
+            if payload.get("claim_id") is None or not signature or len(signature) != self.num_permutations:
+                continue
+            self.insert(payload["claim_id"], signature, payload)
+            loaded += 1
+        return loaded
+
+    def save(self, path: str):
+        """Write the signatures to an .npz file (buckets are rebuilt on load)"""
+        with self._lock:
+            claim_ids = list(self._signatures)
+            np.savez(
+                path,
+                signatures=np.stack([self._signatures[c] for c in claim_ids]) if claim_ids
+                else np.zeros((0, self.num_permutations), dtype=np.uint32),
+                claim_ids=np.array(claim_ids, dtype=object),
+                payloads=np.array([json.dumps(self._payloads.get(c, {}), default=str) for c in claim_ids], dtype=object),
+                num_bands=self.num_bands
+            )
+
+    @classmethod
+    def load(cls, path: str) -> "CodeSetLSHIndex":
+        data = np.load(path, allow_pickle=True)
+        signatures = data["signatures"]
+        index = cls(num_permutations=signatures.shape[1], num_bands=int(data["num_bands"]))
+        for claim_id, signature, payload in zip(data["claim_ids"], signatures, data["payloads"]):
+            index.insert(claim_id, signature, json.loads(payload))
+        return index
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "claims": len(self._signatures),
+                "num_permutations": self.num_permutations,
+                "num_bands": self.num_bands,
+                "rows_per_band": self.rows_per_band,
+                "buckets": sum(len(band) for band in self._buckets),
+                "queries": self.queries,
+                "avg_candidates_per_query": round(self.candidates_checked / self.queries, 2) if self.queries else 0.0
+            }
+
+
+_shared_index = None
+_shared_index_lock = threading.Lock()
+
+
+def get_code_set_index(client=None, collection_name: str = COLLECTION_NAME) -> CodeSetLSHIndex:
+    """
+    Get the process-wide code-set index, rebuilt from the summary points on first use
+
+    A failed load leaves an empty index that fills up as claims are analyzed.
+    """
+    global _shared_index
+
+    if _shared_index is None:
+        with _shared_index_lock:
+            if _shared_index is None:
+                index = CodeSetLSHIndex()
+                if client is not None:
+                    try:
+                        loaded = index.load_from_qdrant(client, collection_name)
+                        print(f"Code-set LSH index: loaded {loaded} claims")
+                    except Exception as e:
+                        print(f"Warning: Could not load code-set LSH index from Qdrant: {e}")
+                _shared_index = index
+    return _shared_index
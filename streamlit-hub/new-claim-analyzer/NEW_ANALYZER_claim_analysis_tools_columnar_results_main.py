@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Columnar Claim Results
+One DataFrame per claim (one row per DX-PROC combination) in place of a list
+of per-combination dicts. The claim summary, actionable fixes and the
+metadata blocks (risk metadata, issue categories, denial indicators, issue
+counts) are computed as column operations and group-bys over the frame; dict
+rows are built once by frame_to_records() where the API returns them.
+
+The rule tables below are shared with the list-of-dicts code path in
+NewClaimAnalyzer, so both produce the same output.
+"""
+
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from risk_rules import RISK_OUTPUT_COLUMNS
+
+# Column order of a detailed_issues row
+PAIR_COLUMNS = [
+    'CLM_ID', 'DESYNPUF_ID', 'clm_from_dt', 'clm_thru_dt', 'PRVDR_NUM',
+    'dx_position', 'icd9_dgns_code', 'mapped_icd10_code', 'diagnosis_name',
+    'hcpcs_position', 'hcpcs_code', 'procedure_name',
+    'ncd_id', 'ncd_title', 'ncd_status', 'lcd_icd10_covered_group',
+    'ptp_denial_reason', 'mue_threshold', 'mue_denial_type'
+]
+RESULT_COLUMNS = PAIR_COLUMNS + RISK_OUTPUT_COLUMNS + ['analysis_timestamp', 'content_hash']
+
+# -------------------------------------------------------------------------
+# Rule tables (first match wins, matched as substrings of denial_risk_level)
+# -------------------------------------------------------------------------
+
+FIX_TEMPLATES = [
+    ('Duplicate Procedure Billing', "Remove duplicate procedure {hcpcs_code} or verify multiple units are justified"),
+    ('Global Period Bundling', "Verify procedure {hcpcs_code} is not bundled under surgical global period"),
+    ('Prior Authorization Missing', "Obtain prior authorization for procedure {hcpcs_code} before billing"),
+    ('Provider Credentialing Issue', "Verify provider credentials and NPI/TIN are valid and active"),
+    ('Required Modifier Missing', "Add required modifiers for procedure {hcpcs_code}"),
+    ('Frequency Limit Exceeded', "Reduce frequency of procedure {hcpcs_code} to within allowed limits"),
+    ('NCCI PTP Conflict', "Remove conflicting procedure or verify they can be billed together"),
+    ('Primary DX Not Covered', "Replace primary diagnosis {dx_code} with a diagnosis that justifies procedure {hcpcs_code}"),
+    ('MUE Risk', "Verify documentation supports units billed for procedure {hcpcs_code}"),
+    ('NCD Terminated', "Check if NCD termination affects coverage for procedure {hcpcs_code}"),
+    ('Secondary DX Not Covered', "Review secondary diagnosis {dx_code} for procedure {hcpcs_code}"),
+]
+
+ISSUE_CATEGORY_RULES = [
+    ('Duplicate', 'duplicate_billing'),
+    ('Bundling', 'global_period_bundling'),
+    ('Prior Authorization', 'prior_authorization'),
+    ('Credentialing', 'provider_credentialing'),
+    ('Modifier', 'modifier_requirements'),
+    ('Frequency', 'frequency_limits'),
+    ('NCCI', 'ncci_conflicts'),
+    ('Not Covered', 'coverage_issues'),
+    ('MUE', 'mue_risks'),
+    ('NCD', 'ncd_issues'),
+]
+
+# Indicator -> substrings of denial_risk_level (any match sets it); critical_issues_present uses risk_category
+DENIAL_INDICATOR_RULES = [
+    ("high_denial_risk", ('HIGH', 'CRITICAL')),
+    ("critical_issues_present", None),
+    ("duplicate_billing_risk", ('Duplicate',)),
+    ("bundling_risk", ('Bundling',)),
+    ("pa_required", ('Prior Authorization',)),
+    ("credentialing_issues", ('Credentialing',)),
+    ("modifier_issues", ('Modifier',)),
+    ("frequency_issues", ('Frequency',)),
+    ("coverage_issues", ('Not Covered',)),
+    ("ncci_conflicts", ('NCCI',)),
+]
+
+# Risk-metadata issue counts -> substring of denial_risk_level
+RISK_METADATA_COUNT_RULES = [
+    ("duplicate_issues", 'Duplicate'),
+    ("bundling_issues", 'Bundling'),
+    ("pa_issues", 'Prior Authorization'),
+    ("credentialing_issues", 'Credentialing'),
+    ("modifier_issues", 'Modifier'),
+    ("frequency_issues", 'Frequency'),
+]
+
+# (category count, decision, priority, action_required, business_impact, submission_recommendation)
+SUMMARY_DECISIONS = [
+    ('critical_issues', 'DENY', 'CRITICAL',
+     'IMMEDIATE: Fix critical issues or claim will be denied',
+     'HIGH: Full denial risk due to critical issues',
+     'DO NOT SUBMIT - Fix critical issues first'),
+    ('high_issues', 'REVIEW', 'HIGH',
+     'REVIEW: Address high-risk issues before submission',
+     'MEDIUM: Partial denial risk',
+     'REVIEW BEFORE SUBMISSION - Address high-risk issues'),
+    ('medium_issues', 'MONITOR', 'MEDIUM',
+     'MONITOR: Review medium-risk issues',
+     'LOW: Minor issues to monitor',
+     'SUBMIT WITH CAUTION - Monitor medium-risk issues'),
+]
+DEFAULT_SUMMARY_DECISION = (None, 'APPROVE', 'LOW',
+                            'NO ACTION: Claim appears compliant',
+                            'NO IMPACT: Claim should process normally',
+                            'SUBMIT - Claim appears compliant')
+
+# -------------------------------------------------------------------------
+# Shared helpers (also used by the list-of-dicts path)
+# -------------------------------------------------------------------------
+
+def fix_text(risk_level: str, hcpcs_code, dx_code, action_required) -> str:
+    """Actionable fix for one problematic combination"""
+    for marker, template in FIX_TEMPLATES:
+        if marker in risk_level:
+            return template.format(hcpcs_code=hcpcs_code, dx_code=dx_code)
+    return action_required
+
+
+def summary_decision(counts: Dict[str, int]) -> Dict[str, str]:
+    """Decision, priority and recommendation fields from the issue counts"""
+    _, decision, priority, action, impact, recommendation = next(
+        (rule for rule in SUMMARY_DECISIONS if counts[rule[0]] > 0), DEFAULT_SUMMARY_DECISION
+    )
+    return {
+        'decision': decision,
+        'priority': priority,
+        'action_required': action,
+        'business_impact': impact,
+        'submission_recommendation': recommendation
+    }
+
+# -------------------------------------------------------------------------
+# Frame construction / materialization
+# -------------------------------------------------------------------------
+
+def combination_frame(columns: Dict[str, List[Any]]) -> pd.DataFrame:
+    """
+    Frame from column lists
+
+    Object dtype keeps values exactly as given (None stays None, dates stay
+    dates, numpy scalars are not re-boxed).
+    """
+    return pd.DataFrame(columns, dtype=object)
+
+
+def frame_to_records(frame: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Dict rows, one per combination (values as stored; float columns as Python floats)"""
+    if frame.empty:
+        return []
+    columns = list(frame.columns)
+    values = [frame[column].tolist() for column in columns]
+    return [dict(zip(columns, row)) for row in zip(*values)]
+
+
+def _contains(levels: pd.Series, marker: str) -> np.ndarray:
+    return levels.str.contains(marker, regex=False).to_numpy(dtype=bool)
+
+# -------------------------------------------------------------------------
+# Columnar summaries
+# -------------------------------------------------------------------------
+
+def issue_counts(frame: pd.DataFrame) -> Dict[str, int]:
+    """Claim-level issue counts by risk category (one group-by)"""
+    by_category = frame['risk_category'].value_counts()
+    return {
+        'total_issues': int((frame['denial_risk_level'] != 'OK').sum()),
+        'critical_issues': int(by_category.get('CRITICAL', 0)),
+        'high_issues': int(by_category.get('HIGH', 0)),
+        'medium_issues': int(by_category.get('MEDIUM', 0)),
+        'low_issues': int(by_category.get('LOW', 0))
+    }
+
+
+def _scores(frame: pd.DataFrame) -> List[float]:
+    # Python floats, summed in row order like the list path
+    return frame['denial_risk_score'].tolist()
+
+
+def summary_from_frame(frame: pd.DataFrame) -> Dict[str, Any]:
+    """Same dictionary as NewClaimAnalyzer._generate_summary"""
+    if frame.empty:
+        return {}
+
+    counts = issue_counts(frame)
+    decision = summary_decision(counts)
+    scores = _scores(frame)
+    first = frame.iloc[0]
+    return {
+        'CLM_ID': first['CLM_ID'],
+        'DESYNPUF_ID': first['DESYNPUF_ID'],
+        'clm_from_dt': first['clm_from_dt'],
+        'clm_thru_dt': first['clm_thru_dt'],
+        'PRVDR_NUM': first['PRVDR_NUM'],
+        'total_combinations': len(frame),
+        'unique_procedures': int(frame['hcpcs_code'].nunique(dropna=False)),
+        'unique_diagnoses': int(frame['icd9_dgns_code'].nunique(dropna=False)),
+        'max_risk_score': max(scores),
+        'avg_risk_score': round(sum(scores) / len(scores), 1),
+        'decision': decision['decision'],
+        'priority': decision['priority'],
+        'critical_issues': counts['critical_issues'],
+        'high_issues': counts['high_issues'],
+        'medium_issues': counts['medium_issues'],
+        'low_issues': counts['low_issues'],
+        'ok_combinations': int((frame['denial_risk_level'] == 'OK').sum()),
+        'action_required': decision['action_required'],
+        'business_impact': decision['business_impact'],
+        'submission_recommendation': decision['submission_recommendation']
+    }
+
+
+def actionable_fixes_from_frame(frame: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Same list as NewClaimAnalyzer._generate_actionable_fixes"""
+    if frame.empty:
+        return []
+    problems = frame[frame['denial_risk_level'] != 'OK']
+    if problems.empty:
+        return []
+
+    levels = problems['denial_risk_level']
+    template_index = np.select(
+        [_contains(levels, marker) for marker, _ in FIX_TEMPLATES],
+        np.arange(len(FIX_TEMPLATES)),
+        default=-1
+    )
+
+    fixes = []
+    columns = ['icd9_dgns_code', 'diagnosis_name', 'hcpcs_code', 'procedure_name', 'denial_risk_level',
+               'denial_risk_score', 'business_impact', 'risk_category', 'action_required']
+    rows = zip(*(problems[column].tolist() for column in columns))
+    for fix_id, (template, row) in enumerate(zip(template_index, rows), start=1):
+        dx_code, diagnosis_name, hcpcs_code, procedure_name, level, score, impact, category, action = row
+        fix = FIX_TEMPLATES[template][1].format(hcpcs_code=hcpcs_code, dx_code=dx_code) if template >= 0 else action
+        fixes.append({
+            'fix_id': fix_id,
+            'dx_code': dx_code,
+            'diagnosis_name': diagnosis_name,
+            'hcpcs_code': hcpcs_code,
+            'procedure_name': procedure_name,
+            'issue': level,
+            'risk_score': score,
+            'fix': fix,
+            'impact': impact,
+            'priority': category
+        })
+    return fixes
+
+
+def risk_metadata_from_frame(frame: pd.DataFrame) -> Dict[str, Any]:
+    """Same dictionary as NewClaimAnalyzer._extract_risk_metadata"""
+    if frame.empty:
+        return {}
+
+    levels = frame['denial_risk_level']
+    scores = _scores(frame)
+    metadata = {
+        "risk_levels": list(set(levels.unique())),
+        "max_risk_score": max(scores),
+        "min_risk_score": min(scores),
+        "avg_risk_score": sum(scores) / len(scores),
+        "high_risk_issues": int(_contains(levels, 'HIGH').sum()),
+        "critical_issues": int((frame['risk_category'] == 'CRITICAL').sum()),
+    }
+    for key, marker in RISK_METADATA_COUNT_RULES:
+        metadata[key] = int(_contains(levels, marker).sum())
+    return metadata
+
+
+def issue_categories_from_frame(frame: pd.DataFrame) -> Dict[str, List[str]]:
+    """Same dictionary as NewClaimAnalyzer._extract_issue_categories (group-by on the first matching category)"""
+    categories = {category: [] for _, category in ISSUE_CATEGORY_RULES}
+    if frame.empty:
+        return categories
+
+    levels = frame['denial_risk_level']
+    category_names = np.array([category for _, category in ISSUE_CATEGORY_RULES] + [''], dtype=object)
+    assigned = np.select(
+        [_contains(levels, marker) for marker, _ in ISSUE_CATEGORY_RULES],
+        np.arange(len(ISSUE_CATEGORY_RULES)),
+        default=len(ISSUE_CATEGORY_RULES)
+    )
+    grouped = frame['hcpcs_code'].groupby(category_names[assigned], sort=False).unique()
+    for category, codes in grouped.items():
+        if category:
+            categories[category] = list(set(codes))
+    return categories
+
+
+def denial_indicators_from_frame(frame: pd.DataFrame) -> Dict[str, bool]:
+    """Same dictionary as NewClaimAnalyzer._extract_denial_indicators"""
+    levels = frame['denial_risk_level'] if not frame.empty else pd.Series([], dtype=object)
+    indicators = {}
+    for name, markers in DENIAL_INDICATOR_RULES:
+        if frame.empty:
+            indicators[name] = False
+        elif markers is None:
+            indicators[name] = bool((frame['risk_category'] == 'CRITICAL').any())
+        else:
+            indicators[name] = bool(np.logical_or.reduce([_contains(levels, marker) for marker in markers]).any())
+    return indicators
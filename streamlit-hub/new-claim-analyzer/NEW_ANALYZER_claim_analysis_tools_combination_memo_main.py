@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Per-Combination Result Memo
+Content hashes for the DX-PROC combinations of a claim and a process-wide
+memo of their analysis rows. When a claim is re-analyzed with only some lines
+changed, combinations whose hash is unchanged are served from the memo and
+their Qdrant points are kept instead of being recomputed and re-upserted.
+
+A combination's hash covers everything its row depends on: the claim header
+(ID, patient, dates, provider), both codes and positions, the modifiers and
+prior authorization that apply to the procedure, the two cross-line inputs
+of the risk rules (how often the procedure is billed, whether the claim has a
+major surgery) and the reference-data version. Prior authorization and major
+surgery only enter the hash of the procedures whose rules read them.
+"""
+
+import hashlib
+import os
+import threading
+from collections import Counter
+from typing import Any, Dict, List
+
+from reference_cache import ReferenceDataCache
+from risk_rules import (GLOBAL_PERIOD_BUNDLED_CODES, MAJOR_SURGERY_CODES, PRIOR_AUTH_REQUIRED_CODES,
+                        has_prior_authorization)
+
+MEMO_NAMESPACE = "combination_result"
+DEFAULT_MEMO_MAX_ENTRIES = 100000
+DEFAULT_MEMO_TTL_SECONDS = 24 * 60 * 60
+
+
+class ClaimHashContext:
+    """Claim-level inputs of the combination hashes, computed once per claim"""
+
+    def __init__(self, claim_data: Dict[str, Any], all_procedures: List[str], reference_version: str):
+        self.header = (
+            claim_data.get('CLM_ID'), claim_data.get('DESYNPUF_ID'), claim_data.get('CLM_FROM_DT'),
+            claim_data.get('CLM_THRU_DT'), claim_data.get('PRVDR_NUM')
+        )
+        self.prior_authorization = has_prior_authorization(claim_data)
+        self.modifiers = claim_data.get('modifiers', {})
+        self.procedure_counts = Counter(all_procedures)
+        self.has_major_surgery = any(code in MAJOR_SURGERY_CODES for code in all_procedures)
+        self.reference_version = reference_version
+
+    def combination_hash(self, dx_position: int, dx_code: str, hcpcs_position: int, hcpcs_code: str) -> str:
+        """Content hash of one DX-PROC combination"""
+        key = (
+            self.header,
+            dx_position, dx_code, hcpcs_position, hcpcs_code,
+            tuple(sorted(str(mod) for mod in self.modifiers.get(hcpcs_code, []))),
+            self.prior_authorization if hcpcs_code in PRIOR_AUTH_REQUIRED_CODES else None,
+            self.procedure_counts[hcpcs_code],
+            self.has_major_surgery if hcpcs_code in GLOBAL_PERIOD_BUNDLED_CODES else None,
+            self.reference_version
+        )
+        return hashlib.blake2b(repr(key).encode('utf-8'), digest_size=16).hexdigest()
+
+
+_shared_memo = None
+_shared_memo_lock = threading.Lock()
+
+
+def get_combination_memo() -> ReferenceDataCache:
+    """Get the process-wide combination memo (sized from COMBINATION_MEMO_MAX_ENTRIES / COMBINATION_MEMO_TTL_SECONDS)"""
+    global _shared_memo
+
+    if _shared_memo is None:
+        with _shared_memo_lock:
+            if _shared_memo is None:
+                _shared_memo = ReferenceDataCache(
+                    max_entries=int(os.environ.get("COMBINATION_MEMO_MAX_ENTRIES", DEFAULT_MEMO_MAX_ENTRIES)),
+                    ttl_seconds=float(os.environ.get("COMBINATION_MEMO_TTL_SECONDS", DEFAULT_MEMO_TTL_SECONDS))
+                )
+    return _shared_memo
@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+Persistent Query-Embedding Cache
+The correctors' Qdrant query texts are templated (archetype queries, the
+stage 1 policy query, ClaimCorrector._build_query_text), so the same strings
+recur across claims with the same CPT/ICD codes. CachedEmbedder wraps the
+shared SentenceTransformer and only runs encode() for texts it has not seen.
+
+Vectors are stored as float32 blobs in a SQLite file keyed by
+(model name, hash of the normalized text). The file is opened in WAL mode, so
+every Streamlit session and batch worker on the host shares it; a small
+in-process LRU sits in front of it. The least recently used entries are
+evicted once the file holds more than max_entries vectors. Hit and miss
+counts are kept per process and, cumulatively, in the file itself.
+
+Inspect: python embedding_cache.py stats [--path embedding_cache.sqlite]
+Clear:   python embedding_cache.py clear [--path embedding_cache.sqlite] [--model NAME]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from resource_registry import EMBEDDING_MODEL_NAME, get_embedder, get_resource
+
+DEFAULT_CACHE_PATH = os.environ.get(
+    "EMBEDDING_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "embedding_cache.sqlite")
+)
+EMBEDDING_CACHE_ENABLED = os.environ.get("EMBEDDING_CACHE", "on").lower() not in ("0", "off", "false", "no")
+DEFAULT_MAX_ENTRIES = int(os.environ.get("EMBEDDING_CACHE_MAX_ENTRIES", 200000))
+DEFAULT_MEMORY_ENTRIES = 4096
+SQL_CHUNK_SIZE = 500  # stays below SQLite's bound-parameter limit
+
+# encode() keyword arguments that do not change the returned vectors
+_CACHEABLE_KWARGS = {"batch_size", "show_progress_bar"}
+
+CREATE_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    model TEXT NOT NULL,
+    text_hash TEXT NOT NULL,
+    dim INTEGER NOT NULL,
+    vector BLOB NOT NULL,
+    last_used REAL NOT NULL,
+    UNIQUE (model, text_hash)
+);
+CREATE INDEX IF NOT EXISTS ix_embeddings_last_used ON embeddings (last_used);
+CREATE TABLE IF NOT EXISTS cache_stats (
+    model TEXT PRIMARY KEY,
+    hits INTEGER NOT NULL DEFAULT 0,
+    misses INTEGER NOT NULL DEFAULT 0,
+    evictions INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Cache form of a query text: NFC, whitespace runs collapsed, trimmed"""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", str(text))).strip()
+
+
+def text_hash(text: str) -> str:
+    """Key of an already normalized text"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _chunks(items: List[Any], size: int = SQL_CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+# -------------------------------------------------------------------------
+# SQLite store
+# -------------------------------------------------------------------------
+
+class EmbeddingCache:
+    """SQLite-backed (model, text hash) -> float32 vector store, shared across processes"""
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = DEFAULT_MAX_ENTRIES):
+        """
+        Args:
+            path: Cache file (created on first use)
+            max_entries: Vectors kept before least recently used ones are evicted
+        """
+        self.path = path or DEFAULT_CACHE_PATH
+        self.max_entries = max(1, max_entries)
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread and process (a forked worker opens its own)
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.executescript(CREATE_SCHEMA_SQL)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def get_many(self, model: str, hashes: List[str]) -> Dict[str, np.ndarray]:
+        """Stored vectors for the hashes that are cached; marks them as recently used"""
+        if not hashes:
+            return {}
+        conn = self._connect()
+        found = {}
+        for chunk in _chunks(list(dict.fromkeys(hashes))):
+            placeholders = ", ".join("?" for _ in chunk)
+            rows = conn.execute(
+                f"SELECT text_hash, dim, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                [model] + chunk
+            ).fetchall()
+            for key, dim, blob in rows:
+                vector = np.frombuffer(blob, dtype=np.float32)
+                if vector.shape[0] == dim:
+                    found[key] = vector
+
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for chunk in _chunks(list(found)):
+                placeholders = ", ".join("?" for _ in chunk)
+                conn.execute(
+                    f"UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash IN ({placeholders})",
+                    [now, model] + chunk
+                )
+            self._count(conn, model, hits=len(found), misses=len(set(hashes)) - len(found))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return found
+
+    def put_many(self, model: str, vectors: Dict[str, np.ndarray]) -> int:
+        """Store vectors by hash, then evict down to max_entries; returns the entries evicted"""
+        if not vectors:
+            return 0
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, dim, vector, last_used) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (model, key, int(vector.shape[0]), np.ascontiguousarray(vector, dtype=np.float32).tobytes(), now)
+                    for key, vector in vectors.items()
+                ]
+            )
+            evicted = 0
+            excess = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] - self.max_entries
+            if excess > 0:
+                # Evict an extra 10% so the next few misses do not each trigger a delete
+                evicted = excess + self.max_entries // 10
+                conn.execute(
+                    "DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (evicted,)
+                )
+                self._count(conn, model, evictions=evicted)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return evicted
+
+    def _count(self, conn: sqlite3.Connection, model: str, hits: int = 0, misses: int = 0, evictions: int = 0):
+        conn.execute("INSERT OR IGNORE INTO cache_stats (model) VALUES (?)", (model,))
+        conn.execute(
+            "UPDATE cache_stats SET hits = hits + ?, misses = misses + ?, evictions = evictions + ? WHERE model = ?",
+            (hits, misses, evictions, model)
+        )
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Per-model entry count and cumulative hit rate across all processes"""
+        conn = self._connect()
+        entries = dict(conn.execute("SELECT model, COUNT(*) FROM embeddings GROUP BY model").fetchall())
+        report = []
+        for model, hits, misses, evictions in conn.execute(
+                "SELECT model, hits, misses, evictions FROM cache_stats ORDER BY model").fetchall():
+            report.append({
+                "model": model,
+                "entries": entries.pop(model, 0),
+                "hits": hits,
+                "misses": misses,
+                "evictions": evictions,
+                "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0
+            })
+        for model, count in entries.items():
+            report.append({"model": model, "entries": count, "hits": 0, "misses": 0, "evictions": 0, "hit_rate": 0.0})
+        return report
+
+    def size_bytes(self) -> int:
+        return sum(os.path.getsize(self.path + suffix)
+                   for suffix in ("", "-wal") if os.path.exists(self.path + suffix))
+
+    def clear(self, model: Optional[str] = None) -> int:
+        """Drop cached vectors (of one model, or all); returns the entries removed"""
+        conn = self._connect()
+        if model:
+            removed = conn.execute("DELETE FROM embeddings WHERE model = ?", (model,)).rowcount
+            conn.execute("DELETE FROM cache_stats WHERE model = ?", (model,))
+        else:
+            removed = conn.execute("DELETE FROM embeddings").rowcount
+            conn.execute("DELETE FROM cache_stats")
+        conn.execute("VACUUM")
+        return removed
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            conn.close()
+        self._local = threading.local()
+
+# -------------------------------------------------------------------------
+# Caching embedder
+# -------------------------------------------------------------------------
+
+class CachedEmbedder:
+    """
+    Drop-in for SentenceTransformer.encode on query texts: cached vectors are
+    returned as-is and only the misses are encoded (in one batched call)
+    """
+
+    def __init__(self, embedder, model_name: str = EMBEDDING_MODEL_NAME,
+                 cache: Optional[EmbeddingCache] = None, memory_entries: int = DEFAULT_MEMORY_ENTRIES):
+        self.embedder = embedder
+        self.model_name = model_name
+        self.cache = cache or EmbeddingCache()
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()  # text hash -> vector, most recently used last
+        self._lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.encode_seconds = 0.0
+
+    def __getattr__(self, name):
+        # Everything besides encode (dimension, device, parameters...) is the model's
+        return getattr(self.__dict__["embedder"], name)
+
+    def encode(self, sentences, batch_size: int = 32, **kwargs):
+        """SentenceTransformer.encode for a text or a list of texts (numpy output)"""
+        if set(kwargs) - _CACHEABLE_KWARGS:
+            return self.embedder.encode(sentences, batch_size=batch_size, **kwargs)
+
+        single = isinstance(sentences, str)
+        texts = [normalize_text(text) for text in ([sentences] if single else sentences)]
+        keys = [text_hash(text) for text in texts]
+        vectors = self._lookup(keys)
+
+        missing = OrderedDict((key, text) for key, text in zip(keys, texts) if key not in vectors)
+        if missing:
+            start = time.perf_counter()
+            encoded = self.embedder.encode(list(missing.values()), batch_size=batch_size,
+                                           show_progress_bar=kwargs.get("show_progress_bar", False))
+            self.encode_seconds += time.perf_counter() - start
+            new_vectors = {key: np.asarray(vector, dtype=np.float32) for key, vector in zip(missing, encoded)}
+            self.misses += len(new_vectors)
+            vectors.update(new_vectors)
+            self._remember(new_vectors)
+            try:
+                self.cache.put_many(self.model_name, new_vectors)
+            except Exception as e:
+                print(f"Warning: Could not store query embeddings in cache: {e}")
+
+        if single:
+            return vectors[keys[0]]
+        if not keys:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.stack([vectors[key] for key in keys])
+
+    def _lookup(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        vectors = {}
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    vectors[key] = vector
+        self.memory_hits += sum(1 for key in keys if key in vectors)
+
+        pending = [key for key in dict.fromkeys(keys) if key not in vectors]
+        if pending:
+            try:
+                found = self.cache.get_many(self.model_name, pending)
+            except Exception as e:
+                print(f"Warning: Embedding cache lookup failed, encoding instead: {e}")
+                found = {}
+            self.disk_hits += len(found)
+            vectors.update(found)
+            self._remember(found)
+        return vectors
+
+    def _remember(self, vectors: Dict[str, np.ndarray]):
+        with self._lock:
+            for key, vector in vectors.items():
+                self._memory[key] = vector
+                self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        """This process's lookups (memory and disk hits, misses, hit rate)"""
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "model": self.model_name,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            "encode_seconds": round(self.encode_seconds, 3),
+            "memory_entries": len(self._memory)
+        }
+
+
+def get_embedding_cache(path: Optional[str] = None) -> EmbeddingCache:
+    """Shared EmbeddingCache per path"""
+    path = path or DEFAULT_CACHE_PATH
+    return get_resource(("embedding_cache", path), lambda: EmbeddingCache(path),
+                        teardown=lambda cache: cache.close())
+
+
+def get_cached_embedder(model_name: str = EMBEDDING_MODEL_NAME, device: Optional[str] = None,
+                        cache_path: Optional[str] = None):
+    """Shared embedder wrapped in the query-embedding cache (plain embedder when EMBEDDING_CACHE=off)"""
+    embedder = get_embedder(model_name, device)
+    if not EMBEDDING_CACHE_ENABLED:
+        return embedder
+    cached = get_resource(("cached_embedder", model_name, device, cache_path or DEFAULT_CACHE_PATH),
+                          lambda: CachedEmbedder(embedder, model_name, get_embedding_cache(cache_path)))
+    # The model may have been released and rebuilt since the wrapper was made
+    cached.embedder = embedder
+    return cached
+
+
+def embedding_cache_stats(cache_path: Optional[str] = None) -> Dict[str, Any]:
+    """Cumulative per-model stats of the cache file plus the size on disk"""
+    cache = get_embedding_cache(cache_path)
+    return {"path": cache.path, "size_bytes": cache.size_bytes(), "models": cache.stats()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or clear the query-embedding cache")
+    parser.add_argument("command", choices=["stats", "clear"])
+    parser.add_argument("--path", default=DEFAULT_CACHE_PATH, help="Cache file path")
+    parser.add_argument("--model", default=None, help="Only clear this model's vectors")
+    args = parser.parse_args()
+
+    if args.command == "stats":
+        print(json.dumps(embedding_cache_stats(args.path), indent=2))
+    else:
+        print(f"Removed {EmbeddingCache(args.path).clear(args.model)} cached embeddings")
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+LCD Coverage Index
+Built-once index behind NewClaimAnalyzer._determine_lcd_coverage: a prefix
+trie over the covered-diagnosis whitelist (HCPCS/DME codes). Numeric CPT
+codes are always covered (absence from the surgical LCD crosswalk doesn't
+mean not covered), so the crosswalk is not queried. Coverage for all pairs
+of a claim is answered in memory with coverage_many().
+"""
+
+import threading
+from typing import Any, Dict, Iterable, Tuple
+
+# Diagnosis prefixes covered for non-CPT (A-Z) HCPCS codes - typically DME/supplies
+LCD_COVERED_DIAGNOSIS_PREFIXES = [
+    # ICD-9 codes
+    'V', 'Z',  # Preventive codes
+    '25000', '25001', '25002', '25003', '25010', '25011', '25012', '25013',  # Diabetes
+    '4010', '4011', '4019',  # Hypertension
+    '2720', '2721', '2722', '2723', '2724',  # Lipid disorders
+    '4140', '4141', '4148', '4149',  # Coronary artery disease
+    '4280', '4281', '4282', '4283', '4284', '4289',  # Heart failure
+    '49300', '49301', '49302', '49310', '49311', '49312', '49320', '49321', '49322', '49381', '49382', '49390', '49391',  # Asthma
+    '496', '4910', '4911', '4912', '4918', '4919', '4920', '4928',  # COPD
+    '5851', '5852', '5853', '5854', '5855', '5856', '5859',  # Chronic kidney disease
+    '3310', '3311', '3312', '3313', '3314', '3315', '3316', '3317', '3318', '3319',  # Alzheimer's/dementia
+    '340', '3410', '3411', '3412', '3413', '3414', '3415', '3416', '3417', '3418', '3419',  # Multiple sclerosis
+
+    # ICD-10 codes
+    'I10', 'I11', 'I12', 'I13', 'I15',  # Hypertension
+    'E10', 'E11', 'E12', 'E13', 'E14',  # Diabetes
+    'E78', 'E79',  # Lipid disorders
+    'I25',  # Coronary artery disease
+    'I50',  # Heart failure
+    'J45', 'J46',  # Asthma
+    'J40', 'J41', 'J42', 'J43', 'J44',  # COPD
+    'N18',  # Chronic kidney disease
+    'F01', 'F02', 'F03', 'G30',  # Alzheimer's/dementia
+    'G35',  # Multiple sclerosis
+    'Z00', 'Z01', 'Z02', 'Z03', 'Z04', 'Z05', 'Z06', 'Z07', 'Z08', 'Z09',  # Preventive codes
+]
+
+_TERMINAL = None  # trie node key marking the end of a prefix
+
+
+def is_cpt_code(hcpcs_code: str) -> bool:
+    """Numeric CPT codes are always covered, A-Z HCPCS codes are checked against the whitelist"""
+    return bool(hcpcs_code) and hcpcs_code[0].isdigit()
+
+
+class PrefixTrie:
+    """Character trie answering "does any stored prefix start this code?" in O(len(code))"""
+
+    def __init__(self, prefixes: Iterable[str] = ()):
+        self._root = {}
+        self.size = 0
+        for prefix in prefixes:
+            self.add(prefix)
+
+    def add(self, prefix: str):
+        node = self._root
+        for ch in prefix:
+            node = node.setdefault(ch, {})
+        if _TERMINAL not in node:
+            node[_TERMINAL] = True
+            self.size += 1
+
+    def matches(self, code: str) -> bool:
+        """Same result as any(code.startswith(prefix) for prefix in prefixes)"""
+        node = self._root
+        if _TERMINAL in node:
+            return True
+        for ch in code:
+            node = node.get(ch)
+            if node is None:
+                return False
+            if _TERMINAL in node:
+                return True
+        return False
+
+    def __len__(self):
+        return self.size
+
+
+class LcdCoverageIndex:
+    """In-memory LCD coverage decisions for (HCPCS, diagnosis) pairs"""
+
+    def __init__(self, covered_prefixes: Iterable[str] = LCD_COVERED_DIAGNOSIS_PREFIXES):
+        self.diagnosis_trie = PrefixTrie(covered_prefixes)
+
+    # ------------------------------------------------------------------
+    # Coverage
+    # ------------------------------------------------------------------
+    def coverage(self, hcpcs_code: str, diagnosis_code: str) -> str:
+        """
+        LCD coverage for one pair
+
+        Returns:
+            'Y' if covered, 'N' if not covered
+        """
+        if not diagnosis_code or not hcpcs_code:
+            return 'N'
+
+        try:
+            # Surgical CPT codes: absence from the LCD crosswalk doesn't mean not
+            # covered, just not specified, so both outcomes are covered
+            if is_cpt_code(hcpcs_code):
+                return 'Y'
+
+            # HCPCS codes (A-Z prefix): diagnosis whitelist
+            return 'Y' if self.diagnosis_trie.matches(diagnosis_code) else 'N'
+
+        except Exception as e:
+            # If any error occurs, default to 'Y' to avoid false denials
+            print(f"Warning: LCD coverage check failed for {hcpcs_code} + {diagnosis_code}: {e}")
+            return 'Y'
+
+    def coverage_many(self, pairs: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], str]:
+        """Coverage for every distinct (hcpcs_code, diagnosis_code) pair, e.g. all pairs of a claim"""
+        results = {}
+        dx_matches = {}
+        for pair in pairs:
+            if pair in results:
+                continue
+            hcpcs_code, diagnosis_code = pair
+            if not isinstance(hcpcs_code, str) or not diagnosis_code or is_cpt_code(hcpcs_code):
+                results[pair] = self.coverage(hcpcs_code, diagnosis_code)
+                continue
+            # The whitelist depends only on the diagnosis
+            if diagnosis_code not in dx_matches:
+                dx_matches[diagnosis_code] = self.coverage(hcpcs_code, diagnosis_code)
+            results[pair] = dx_matches[diagnosis_code]
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        return {"diagnosis_prefixes": len(self.diagnosis_trie)}
+
+
+_shared_index = None
+_shared_index_lock = threading.Lock()
+
+
+def get_lcd_coverage_index() -> LcdCoverageIndex:
+    """Get the process-wide LCD coverage index"""
+    global _shared_index
+
+    if _shared_index is None:
+        with _shared_index_lock:
+            if _shared_index is None:
+                _shared_index = LcdCoverageIndex()
+    return _shared_index
@@ -4,21 +4,86 @@ New Claim Analysis Engine with Qdrant Integration
 Analyzes any new claim using the same logic as the view and stores metadata in Qdrant
 """
 
-import pyodbc
 import pandas as pd
 import json
+import os
 import warnings
 from datetime import datetime
 from typing import Dict, List, Any
 import uuid
-from qdrant_client import QdrantClient
 from qdrant_client.models import Distance, VectorParams, PointStruct
 import numpy as np
+from reference_cache import get_reference_cache, current_reference_version
+from reference_snapshot import get_reference_snapshot
+from qdrant_batch_writer import QdrantBatchWriter
+from claim_metadata_store import (combination_point_id, claim_summary_point_id, delete_stale_claim_points,
+                                  ensure_payload_indexes, query_similar_claims, COMBINATION_RECORD,
+                                  CLAIM_SUMMARY_RECORD)
+from sql_connection_pool import pooled_connect
+from resource_registry import get_qdrant_client, run_once
+from similar_claim_index import claim_index_payload, get_similar_claim_index
+from code_set_lsh import code_set_signature, get_code_set_index
+from columnar_results import (actionable_fixes_from_frame, combination_frame, denial_indicators_from_frame,
+                              fix_text, frame_to_records, issue_categories_from_frame, issue_counts,
+                              risk_metadata_from_frame, summary_decision, summary_from_frame,
+                              DENIAL_INDICATOR_RULES, ISSUE_CATEGORY_RULES, PAIR_COLUMNS, RISK_METADATA_COUNT_RULES)
+from lcd_coverage import get_lcd_coverage_index
+from combination_memo import ClaimHashContext, get_combination_memo, MEMO_NAMESPACE
+from risk_rules import (evaluate_claim_risk, RISK_OUTPUT_COLUMNS, MAJOR_SURGERY_CODES, GLOBAL_PERIOD_BUNDLED_CODES, PRIOR_AUTH_REQUIRED_CODES,
+                        MODIFIER_REQUIREMENTS, FREQUENCY_LIMITS)
 
 warnings.filterwarnings('ignore', category=UserWarning, module='pandas')
 
+# Preferred GEMS mapping order (shared by the per-code and bulk ICD-10 lookups)
+ICD10_MAPPING_ORDER = """
+                CASE 
+                    WHEN icd10_code LIKE 'I10%' THEN 1  -- Essential hypertension first
+                    WHEN icd10_code LIKE 'E11%' THEN 2  -- Type 2 diabetes second
+                    WHEN icd10_code LIKE 'I25%' THEN 3  -- Coronary artery disease third
+                    ELSE 4  -- Other codes last
+                END,
+                icd10_code"""
+
+# Embedding feature layout (see NewClaimAnalyzer._create_feature_matrix)
+EMBEDDING_SIZE = 768
+PROVIDER_TYPES = ["Hospital", "Facility", "Physician", "Group", "Laboratory", "Radiology", "Ambulance", "DME"]
+DENIAL_INDICATOR_KEYS = [
+    "high_denial_risk", "critical_issues_present", "duplicate_billing_risk", "bundling_risk", "pa_required",
+    "ncci_conflicts", "credentialing_issues", "modifier_issues", "frequency_issues", "coverage_issues"
+]
+PROCEDURE_CATEGORY_KEYS = ["surgery", "radiology", "laboratory", "evaluation_management",
+                           "anesthesia", "pathology", "medicine", "other"]
+DIAGNOSIS_CATEGORY_KEYS = ["musculoskeletal", "cardiovascular", "endocrine", "respiratory",
+                           "gastrointestinal", "neurological", "mental_health", "infectious_disease",
+                           "neoplasms", "other"]
+BILLING_PATTERN_KEYS = ["duplicate_procedures", "high_cost_procedures", "bundled_procedures",
+                        "frequent_procedures", "unusual_combinations"]
+RISK_METADATA_KEYS = ["duplicate_issues", "bundling_issues", "pa_issues", "credentialing_issues", "modifier_issues",
+                      "frequency_issues", "ncci_conflicts", "coverage_issues", "mue_risks", "ncd_issues"]
+
+# Normalization divisor per feature column (binary and one-hot columns use 1.0)
+FEATURE_SCALES = np.array(
+    [150.0, 150.0]                                  # max / avg risk score
+    + [20.0, 10.0, 10.0, 15.0, 20.0]                # total / critical / high / medium / low issues
+    + [20.0, 10.0]                                  # CPT / ICD code counts
+    + [1.0] * len(DENIAL_INDICATOR_KEYS)
+    + [1.0] * len(PROVIDER_TYPES)
+    + [10.0] * len(PROCEDURE_CATEGORY_KEYS)
+    + [5.0] * len(DIAGNOSIS_CATEGORY_KEYS)
+    + [5.0, 3.0, 5.0, 5.0, 3.0]                     # billing patterns
+    + [5.0, 5.0, 3.0, 2.0, 5.0, 5.0, 3.0, 5.0, 5.0, 3.0]  # risk metadata
+    + [50.0, 20.0, 5.0]                             # total units / unique procedures / avg units
+    + [10.0]                                        # modifiers
+)
+
 class NewClaimAnalyzer:
-    def __init__(self):
+    def __init__(self, bulk_lookups: bool = True, reference_version: str = None,
+                 reference_backend: str = None, snapshot_path: str = None,
+                 qdrant_batch_size: int = 256, qdrant_batch_mode: bool = False,
+                 persistent_connection: bool = False, vectorized_rules: bool = True,
+                 incremental: bool = True, defer_similar_search: bool = False,
+                 compact_similar_search: bool = False, code_set_search: bool = False,
+                 columnar_results: bool = False):
         self.server = "localhost,1433"
         self.database = "_reporting"
         self.username = "SA"
@@ -31,13 +96,60 @@ class NewClaimAnalyzer:
             "Encrypt=yes;TrustServerCertificate=yes;Connection Timeout=30;"
         )
         
-        # Initialize Qdrant client
-        self.qdrant_client = QdrantClient(host="localhost", port=6333)
+        # Keep one connection open across claims (batch workers) instead of one per claim
+        self.persistent_connection = persistent_connection
+        self._connection = None
+        
+        # Shared Qdrant client (resource_registry); the collection is checked once per process
+        self.qdrant_client = get_qdrant_client(host="localhost", port=6333)
         self.collection_name = "claim_analysis_metadata"
-        self._ensure_qdrant_collection()
+        run_once(("qdrant_collection", "localhost:6333", self.collection_name), self._ensure_qdrant_collection)
+        
+        # Batched, non-blocking upserts. In batch mode points accumulate across
+        # claims and are only made durable by flush_qdrant_writes().
+        self.qdrant_writer = QdrantBatchWriter(self.qdrant_client, self.collection_name,
+                                               batch_size=qdrant_batch_size, wait=False)
+        self.qdrant_batch_mode = qdrant_batch_mode
+        
+        # Resolve reference tables with one set-based query per table instead of per DX-PROC pair
+        self.bulk_lookups = bulk_lookups
+        
+        # Shared process-wide cache in front of the HCPCS/ICD reference lookups
+        self.reference_cache = get_reference_cache()
+        self.reference_version = reference_version
+        
+        # Reference lookups from SQL Server ("sql") or the local SQLite snapshot ("snapshot")
+        self.reference_backend = (reference_backend or os.environ.get('REFERENCE_BACKEND', 'sql')).lower()
+        self.snapshot_path = snapshot_path
+        
+        # Process-wide LCD coverage index (diagnosis whitelist trie)
+        self.lcd_index = get_lcd_coverage_index()
+        
+        # Evaluate the denial risk rules for all combinations at once (risk_rules) instead of per pair
+        self.vectorized_rules = vectorized_rules
+        
+        # Re-analysis only recomputes (and re-upserts) combinations whose content hash changed
+        self.incremental = incremental
+        self.combination_memo = get_combination_memo()
+        
+        # Batch runs search similar claims for many claims in one request: analyze_new_claim
+        # then returns the query under 'similar_claims_query' instead of searching itself
+        self.defer_similar_search = defer_similar_search
+        
+        # Exact search over the 68 claim features in memory instead of the padded 768-d Qdrant vectors
+        self.similar_index = (get_similar_claim_index(self.qdrant_client, self.collection_name)
+                              if compact_similar_search else None)
+        
+        # MinHash/LSH index of claims' (CPT, ICD, modifier) sets: adds 'similar_code_claims' to results
+        self.code_set_index = (get_code_set_index(self.qdrant_client, self.collection_name)
+                               if code_set_search else None)
+        
+        # Keep the combinations as one DataFrame and summarize it with column operations;
+        # dict rows are only built for the returned detailed_issues (and the Qdrant payloads)
+        self.columnar_results = columnar_results
     
-    def _ensure_qdrant_collection(self):
-        """Ensure Qdrant collection exists with 768 dimensions"""
+    def _ensure_qdrant_collection(self) -> bool:
+        """Ensure Qdrant collection exists with 768 dimensions (False if Qdrant could not be reached)"""
         try:
             collections = self.qdrant_client.get_collections()
             collection_names = [col.name for col in collections.collections]
@@ -61,8 +173,13 @@ class NewClaimAnalyzer:
                     )
                 else:
                     print(f"Qdrant collection {self.collection_name} already exists with 768 dimensions")
+            
+            # Keyword indexes for claim_id / code / risk filters (issue retrieval, similar-claim search)
+            ensure_payload_indexes(self.qdrant_client, self.collection_name)
+            return True
         except Exception as e:
             print(f"Warning: Could not ensure Qdrant collection: {e}")
+            return False
 
     def check_qdrant_status(self):
         """Check if collection exists and has points"""
@@ -106,11 +223,31 @@ class NewClaimAnalyzer:
 
     def get_connection(self):
         """Get database connection"""
+        if self.persistent_connection and self._connection is not None:
+            return self._connection
+        
         try:
-            return pyodbc.connect(self.conn_str)
+            if self.reference_backend == 'snapshot':
+                conn = get_reference_snapshot(self.snapshot_path).connect()
+            else:
+                # Checked out from the shared pool; close() returns it
+                conn = pooled_connect(self.conn_str)
         except Exception as e:
             print(f"Database connection failed: {e}")
             return None
+        
+        if self.persistent_connection:
+            self._connection = conn
+        return conn
+
+    def close(self):
+        """Close the persistent connection (if any)"""
+        if self._connection is not None:
+            try:
+                self._connection.close()
+            except Exception:
+                pass
+            self._connection = None
 
     def analyze_new_claim(self, claim_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -126,6 +263,10 @@ class NewClaimAnalyzer:
         if not conn:
             return {"error": "Database connection failed"}
         
+        # Invalidate cached reference data when the reference version (NCCI quarter) changes
+        reference_version = self.reference_version or current_reference_version()
+        self.reference_cache.set_version(reference_version)
+        
         try:
             # Extract claim information
             clm_id = claim_data.get('CLM_ID')
@@ -167,97 +308,269 @@ class NewClaimAnalyzer:
                 except:
                     pass
             
-            # Analyze each diagnosis-procedure combination
-            results = []
-            
-            for dx_pos, dx_code in dx_codes:
-                for hcpcs_pos, hcpcs_code in hcpcs_codes:
-                    # Get ICD-10 mapping (check if already ICD-10)
-                    if dx_code and dx_code[0].isalpha():
-                        # Already ICD-10 format (starts with letter)
-                        mapped_icd10 = dx_code
-                    else:
-                        # ICD-9 format, need mapping
-                        mapped_icd10 = self._get_icd10_mapping(conn, dx_code)
-                    
-                    # Get NCCI data
-                    ncci_data = self._get_ncci_data(conn, hcpcs_code)
-                    
-                    # Get NCD data
-                    ncd_data = self._get_ncd_data(conn, hcpcs_code, clm_from_date)
-                    
-                    # Determine LCD coverage (use mapped ICD-10 code if available)
-                    lcd_covered = self._determine_lcd_coverage(conn, hcpcs_code, mapped_icd10 if mapped_icd10 else dx_code)
-                    
-                    # Calculate risk analysis
-                    risk_analysis = self._calculate_risk_analysis(
-                        dx_pos, dx_code, mapped_icd10,
-                        hcpcs_pos, hcpcs_code,
-                        ncci_data, ncd_data, lcd_covered,
-                        claim_data, all_procedures
-                    )
-                    
-                    # Get human-readable names
-                    diagnosis_name = self._get_diagnosis_name(conn, mapped_icd10) if mapped_icd10 else None
-                    procedure_name = self._get_procedure_name(conn, hcpcs_code)
-                    
-                    results.append({
-                        'CLM_ID': clm_id,
-                        'DESYNPUF_ID': desynpuf_id,
-                        'clm_from_dt': clm_from_date,
-                        'clm_thru_dt': clm_thru_date,
-                        'PRVDR_NUM': prvdr_num,
-                        'dx_position': dx_pos,
-                        'icd9_dgns_code': dx_code,
-                        'mapped_icd10_code': mapped_icd10,
-                        'diagnosis_name': diagnosis_name,
-                        'hcpcs_position': hcpcs_pos,
-                        'hcpcs_code': hcpcs_code,
-                        'procedure_name': procedure_name,
-                        'ncd_id': ncd_data.get('ncd_id'),
-                        'ncd_title': ncd_data.get('ncd_title'),
-                        'ncd_status': ncd_data.get('ncd_status'),
-                        'lcd_icd10_covered_group': lcd_covered,
-                        'ptp_denial_reason': ncci_data.get('ptp_denial_reason'),
-                        'mue_threshold': ncci_data.get('mue_threshold'),
-                        'mue_denial_type': ncci_data.get('mue_denial_type'),
-                        **risk_analysis,
-                        'analysis_timestamp': datetime.now()
-                    })
-            
-            # Generate summary
-            summary = self._generate_summary(results)
+            # Content hash per DX-PROC combination; unchanged combinations come from the memo
+            hash_context = ClaimHashContext(claim_data, all_procedures, reference_version)
+            combo_hashes = {
+                (dx_pos, hcpcs_pos): hash_context.combination_hash(dx_pos, dx_code, hcpcs_pos, hcpcs_code)
+                for dx_pos, dx_code in dx_codes
+                for hcpcs_pos, hcpcs_code in hcpcs_codes
+            }
+            reused_rows = {}
+            if self.incremental:
+                for position, content_hash in combo_hashes.items():
+                    hit, row = self.combination_memo.lookup(MEMO_NAMESPACE, content_hash)
+                    if hit:
+                        reused_rows[position] = row
+            
+            pending = [
+                (dx_pos, dx_code, hcpcs_pos, hcpcs_code)
+                for dx_pos, dx_code in dx_codes
+                for hcpcs_pos, hcpcs_code in hcpcs_codes
+                if (dx_pos, hcpcs_pos) not in reused_rows
+            ]
+            
+            # Phase 0: deduplicate codes - reference data depends only on the code, not its position
+            unique_dx_codes = list(dict.fromkeys(dx_code for _, dx_code, _, _ in pending))
+            unique_hcpcs_codes = list(dict.fromkeys(hcpcs_code for _, _, _, hcpcs_code in pending))
+            
+            # Bulk mode: resolve every distinct code on the claim up front (one query per table)
+            reference = None
+            if self.bulk_lookups and pending:
+                reference = self._bulk_reference_lookup(conn, unique_dx_codes, unique_hcpcs_codes)
+            
+            # Phase 1: per-DX lookups (ICD-10 mapping, diagnosis name)
+            dx_info = self._resolve_diagnoses(conn, unique_dx_codes, reference)
+            
+            # Phase 2: per-HCPCS lookups (NCCI, NCD, procedure name)
+            hcpcs_info = self._resolve_procedures(conn, unique_hcpcs_codes, clm_from_date, reference)
+            
+            # Phase 3: LCD coverage for every distinct (HCPCS, diagnosis) pair, from the in-memory index
+            # (use mapped ICD-10 code if available)
+            lcd_coverage = self.lcd_index.coverage_many(
+                (hcpcs_code, dx_info[dx_code][0] or dx_code) for _, dx_code, _, hcpcs_code in pending
+            )
+            
+            frame = None
+            if self.columnar_results:
+                header = {'CLM_ID': clm_id, 'DESYNPUF_ID': desynpuf_id, 'clm_from_dt': clm_from_date,
+                          'clm_thru_dt': clm_thru_date, 'PRVDR_NUM': prvdr_num}
+                claim_order = [(dx_pos, hcpcs_pos) for dx_pos, _ in dx_codes for hcpcs_pos, _ in hcpcs_codes]
+                frame, recomputed = self._combination_frame(
+                    pending, header, dx_info, hcpcs_info, lcd_coverage, claim_data, all_procedures,
+                    claim_order, reused_rows, combo_hashes
+                )
+                # API boundary: the only place dict rows are built
+                results = frame_to_records(frame)
+                computed_rows = range(recomputed)
+            else:
+                results, computed_rows = self._combination_rows(
+                    pending, clm_id, desynpuf_id, clm_from_date, clm_thru_date, prvdr_num,
+                    dx_info, hcpcs_info, lcd_coverage, claim_data, all_procedures,
+                    dx_codes, hcpcs_codes, reused_rows, combo_hashes
+                )
+            
+            incremental_status = {
+                'reused_combinations': len(reused_rows),
+                'recomputed_combinations': len(computed_rows),
+                'reused': [
+                    {
+                        'dx_position': row['dx_position'],
+                        'icd9_dgns_code': row['icd9_dgns_code'],
+                        'hcpcs_position': row['hcpcs_position'],
+                        'hcpcs_code': row['hcpcs_code']
+                    }
+                    for row in reused_rows.values()
+                ]
+            }
+            
+            # Generate summary (columnar group-bys when the frame is kept)
+            summary = self._generate_summary(frame if frame is not None else results)
             
             # Extract comprehensive metadata for RAG models
-            metadata = self._extract_metadata(claim_data, results, clm_from_date, hcpcs_codes, dx_codes)
+            metadata = self._extract_metadata(claim_data, frame if frame is not None else results,
+                                              clm_from_date, hcpcs_codes, dx_codes)
+            
+            # Embedding features are claim-level: compute them once for storage and search
+            claim_features = self._create_feature_matrix([metadata])
             
             # Store individual DX-PROC combinations in Qdrant
-            qdrant_status = self.store_metadata_in_qdrant(metadata, results)
+            qdrant_status = self.store_metadata_in_qdrant(
+                metadata, results, claim_features=claim_features,
+                reused_hashes={combo_hashes[position] for position in reused_rows}
+            )
             
             # Search for similar historical claims
-            similar_claims = self.search_similar_claims(metadata)
+            query_vector = self._pad_embedding_matrix(claim_features)[0].tolist()
+            if self.defer_similar_search:
+                similar_claims = []
+            else:
+                similar_claims = self.search_similar_claims(metadata, query_vector=query_vector)
             
-            return {
+            result = {
                 'claim_summary': summary,
                 'detailed_issues': results,
-                'actionable_fixes': self._generate_actionable_fixes(results),
+                'actionable_fixes': self._generate_actionable_fixes(frame if frame is not None else results),
                 'metadata': metadata,
                 'similar_claims': similar_claims,
-                'qdrant_storage': qdrant_status  # Add storage status to results
+                'qdrant_storage': qdrant_status,  # Add storage status to results
+                'incremental': incremental_status
             }
+            if frame is not None:
+                result['detailed_issues_frame'] = frame
+            if self.defer_similar_search:
+                result['similar_claims_query'] = {'claim_id': metadata.get('claim_id'), 'vector': query_vector}
+            if self.code_set_index is not None:
+                result['similar_code_claims'] = self.find_claims_with_similar_codes(metadata)
+            return result
             
         except Exception as e:
+            # Don't keep reusing a connection that may be broken
+            if self.persistent_connection:
+                self.close()
             return {"error": f"Analysis failed: {e}"}
         finally:
-            conn.close()
+            if not self.persistent_connection:
+                conn.close()
+
+    def _combination_rows(self, pending, clm_id, desynpuf_id, clm_from_date, clm_thru_date, prvdr_num,
+                          dx_info, hcpcs_info, lcd_coverage, claim_data, all_procedures,
+                          dx_codes, hcpcs_codes, reused_rows, combo_hashes):
+        """
+        Phases 4-5 as dict rows: one row per recomputed pair, risk analysis, and
+        the memoized rows merged back in claim order
+        
+        Returns:
+            (result rows, recomputed rows keyed by (dx_position, hcpcs_position))
+        """
+        # Phase 4: per-pair rows
+        pairs = []
+        
+        for dx_pos, dx_code, hcpcs_pos, hcpcs_code in pending:
+            mapped_icd10, diagnosis_name = dx_info[dx_code]
+            ncci_data, ncd_data, procedure_name = hcpcs_info[hcpcs_code]
+            lcd_covered = lcd_coverage[(hcpcs_code, mapped_icd10 if mapped_icd10 else dx_code)]
+            
+            pairs.append({
+                'CLM_ID': clm_id,
+                'DESYNPUF_ID': desynpuf_id,
+                'clm_from_dt': clm_from_date,
+                'clm_thru_dt': clm_thru_date,
+                'PRVDR_NUM': prvdr_num,
+                'dx_position': dx_pos,
+                'icd9_dgns_code': dx_code,
+                'mapped_icd10_code': mapped_icd10,
+                'diagnosis_name': diagnosis_name,
+                'hcpcs_position': hcpcs_pos,
+                'hcpcs_code': hcpcs_code,
+                'procedure_name': procedure_name,
+                'ncd_id': ncd_data.get('ncd_id'),
+                'ncd_title': ncd_data.get('ncd_title'),
+                'ncd_status': ncd_data.get('ncd_status'),
+                'lcd_icd10_covered_group': lcd_covered,
+                'ptp_denial_reason': ncci_data.get('ptp_denial_reason'),
+                'mue_threshold': ncci_data.get('mue_threshold'),
+                'mue_denial_type': ncci_data.get('mue_denial_type')
+            })
+        
+        # Phase 5: risk analysis for every recomputed combination
+        risk_analyses = self._risk_analyses(pairs, claim_data, all_procedures)
+        computed_rows = {}
+        for pair, risk_analysis in zip(pairs, risk_analyses):
+            row = {**pair, **risk_analysis}
+            position = (pair['dx_position'], pair['hcpcs_position'])
+            computed_rows[position] = row
+            if self.incremental:
+                self.combination_memo.store(MEMO_NAMESPACE, combo_hashes[position], row)
+        
+        # Rows in claim order: memoized and recomputed combinations together
+        results = []
+        for dx_pos, _ in dx_codes:
+            for hcpcs_pos, _ in hcpcs_codes:
+                position = (dx_pos, hcpcs_pos)
+                row = reused_rows[position] if position in reused_rows else computed_rows[position]
+                results.append({**row, 'analysis_timestamp': datetime.now(), 'content_hash': combo_hashes[position]})
+        return results, computed_rows
+
+    def _combination_frame(self, pending, header, dx_info, hcpcs_info, lcd_coverage, claim_data,
+                           all_procedures, claim_order, reused_rows, combo_hashes):
+        """
+        Phases 4-5 as columns: the claim's combinations in one object-dtype DataFrame
+        
+        Returns:
+            (frame in claim order with the detailed_issues columns, number of recomputed combinations)
+        """
+        count = len(pending)
+        dx_list = [dx_code for _, dx_code, _, _ in pending]
+        hcpcs_list = [hcpcs_code for _, _, _, hcpcs_code in pending]
+        mapped = [dx_info[dx_code][0] for dx_code in dx_list]
+        ncci = [hcpcs_info[hcpcs_code][0] for hcpcs_code in hcpcs_list]
+        ncd = [hcpcs_info[hcpcs_code][1] for hcpcs_code in hcpcs_list]
+        
+        # Phase 4: per-pair columns
+        frame = combination_frame({
+            **{column: [value] * count for column, value in header.items()},
+            'dx_position': [dx_pos for dx_pos, _, _, _ in pending],
+            'icd9_dgns_code': dx_list,
+            'mapped_icd10_code': mapped,
+            'diagnosis_name': [dx_info[dx_code][1] for dx_code in dx_list],
+            'hcpcs_position': [hcpcs_pos for _, _, hcpcs_pos, _ in pending],
+            'hcpcs_code': hcpcs_list,
+            'procedure_name': [hcpcs_info[hcpcs_code][2] for hcpcs_code in hcpcs_list],
+            'ncd_id': [data.get('ncd_id') for data in ncd],
+            'ncd_title': [data.get('ncd_title') for data in ncd],
+            'ncd_status': [data.get('ncd_status') for data in ncd],
+            'lcd_icd10_covered_group': [
+                lcd_coverage[(hcpcs_code, mapped_icd10 if mapped_icd10 else dx_code)]
+                for hcpcs_code, mapped_icd10, dx_code in zip(hcpcs_list, mapped, dx_list)
+            ],
+            'ptp_denial_reason': [data.get('ptp_denial_reason') for data in ncci],
+            'mue_threshold': [data.get('mue_threshold') for data in ncci],
+            'mue_denial_type': [data.get('mue_denial_type') for data in ncci]
+        })[PAIR_COLUMNS]
+        
+        # Phase 5: risk columns for every recomputed combination
+        if self.vectorized_rules:
+            risk = evaluate_claim_risk(claim_data, frame, all_procedures)
+        else:
+            risk = pd.DataFrame(self._risk_analyses(frame_to_records(frame), claim_data, all_procedures),
+                                columns=RISK_OUTPUT_COLUMNS)
+        frame = pd.concat([frame, risk], axis=1)
+        
+        positions = [(dx_pos, hcpcs_pos) for dx_pos, _, hcpcs_pos, _ in pending]
+        if self.incremental and count:
+            for position, row in zip(positions, frame_to_records(frame)):
+                self.combination_memo.store(MEMO_NAMESPACE, combo_hashes[position], row)
+        
+        # Memoized and recomputed combinations together, in claim order
+        if reused_rows:
+            reused = pd.DataFrame(list(reused_rows.values()), columns=frame.columns, dtype=object)
+            frame = pd.concat([frame, reused], ignore_index=True)
+            positions += list(reused_rows)
+            claim_rank = {position: rank for rank, position in enumerate(claim_order)}
+            order = np.argsort([claim_rank[position] for position in positions], kind='stable')
+            frame = frame.iloc[order].reset_index(drop=True)
+            positions = [positions[i] for i in order]
+        
+        frame['denial_risk_score'] = frame['denial_risk_score'].astype(float)
+        frame['analysis_timestamp'] = pd.Series([datetime.now()] * len(frame), dtype=object)
+        frame['content_hash'] = pd.Series([combo_hashes[position] for position in positions], dtype=object)
+        return frame, count
 
-    def store_metadata_in_qdrant(self, metadata: Dict[str, Any], detailed_issues: List[Dict[str, Any]] = None) -> Dict[str, Any]:
+    def store_metadata_in_qdrant(self, metadata: Dict[str, Any], detailed_issues: List[Dict[str, Any]] = None,
+                                 claim_features: np.ndarray = None, reused_hashes: set = None) -> Dict[str, Any]:
         """
         Store claim analysis metadata in Qdrant - store individual DX-PROC combinations
         
+        Claim-level fields (patient, provider, service date, claim totals) are
+        written once to the claim's summary point; combination points carry
+        only their own fields plus claim_id and provider_type for filtering.
+        
         Args:
             metadata: Analysis metadata dictionary
             detailed_issues: List of detailed issue results from analysis
+            claim_features: Optional precomputed (1 x 68) feature row for this claim
+            reused_hashes: Content hashes of combinations unchanged since the last analysis;
+                their points are kept and only their analysis tags are refreshed
             
         Returns:
             Dictionary with storage status
@@ -273,28 +586,76 @@ class NewClaimAnalyzer:
             print("=== Storing Individual DX-PROC Combinations in Qdrant ===")
             points_added = 0
             vector_ids = []
+            failed_before = self.qdrant_writer.points_failed
+            batches_before = self.qdrant_writer.batches_sent
+            
+            # Tags every point of this analysis so superseded runs can be told apart
+            analysis_id = uuid.uuid4().hex
+            
+            claim_totals = {
+                "total_issues": int(metadata.get("total_issues", 0)),
+                "critical_issues": int(metadata.get("critical_issues", 0)),
+                "high_issues": int(metadata.get("high_issues", 0)),
+                "max_risk_score": float(metadata.get("max_risk_score", 0)),
+                "avg_risk_score": float(metadata.get("avg_risk_score", 0))
+            }
+            
+            # Unchanged combinations keep their point: refresh the analysis tags instead of re-upserting
+            reused_hashes = reused_hashes or set()
+            reused_issues = [issue for issue in detailed_issues if issue.get('content_hash') in reused_hashes]
+            to_write = [issue for issue in detailed_issues if issue.get('content_hash') not in reused_hashes]
+            reused_ids = [
+                combination_point_id(issue['CLM_ID'], issue['dx_position'], issue['hcpcs_position'],
+                                     issue.get('icd9_dgns_code'), issue.get('hcpcs_code'))
+                for issue in reused_issues
+            ]
+            if reused_ids:
+                try:
+                    # wait=True so a point missing from the collection is reported here
+                    self.qdrant_client.set_payload(
+                        collection_name=self.collection_name,
+                        payload={
+                            "analysis_timestamp": datetime.now().isoformat(),
+                            "analysis_id": analysis_id,
+                            "provider_type": str(metadata.get('provider_type', 'Unknown')),
+                            "record_type": COMBINATION_RECORD
+                        },
+                        points=reused_ids,
+                        wait=True
+                    )
+                    print(f"  Reused {len(reused_ids)} unchanged combinations")
+                except Exception as e:
+                    print(f"  Warning: Could not refresh reused points, re-upserting them: {e}")
+                    to_write = detailed_issues
+                    reused_ids = []
+            
+            # The combination fields are not embedding features, so every combination
+            # shares the claim's feature row (each still gets its own random padding)
+            if claim_features is None:
+                claim_features = self._create_feature_matrix([metadata])
+            embeddings = self._pad_embedding_matrix(np.repeat(claim_features, len(to_write), axis=0))
             
-            for issue in detailed_issues:
+            for row, issue in enumerate(to_write):
                 try:
-                    # Generate unique ID for this DX-PROC combination
+                    # Deterministic ID for this DX-PROC combination (re-analysis overwrites it)
                     combo_id = f"{issue['CLM_ID']}_{issue['dx_position']}_{issue['hcpcs_position']}"
-                    vector_id = str(uuid.uuid5(uuid.NAMESPACE_DNS, combo_id))
-                    
-                    # Create embedding from this specific combination
-                    combo_metadata = self._create_combo_metadata(metadata, issue)
-                    embedding = self._create_embedding_from_metadata(combo_metadata)
+                    vector_id = combination_point_id(
+                        issue['CLM_ID'], issue['dx_position'], issue['hcpcs_position'],
+                        issue.get('icd9_dgns_code'), issue.get('hcpcs_code')
+                    )
                     
-                    # Convert embedding to native Python types
-                    embedding = [float(x) for x in embedding]
+                    # Embedding for this combination as native Python floats
+                    embedding = embeddings[row].tolist()
                     
                     # Prepare payload for individual DX-PROC combination
                     payload = {
-                        # Basic claim info
+                        # Join and filter keys (claim-level fields live on the summary point)
+                        "record_type": COMBINATION_RECORD,
                         "claim_id": str(issue.get('CLM_ID', 'unknown')),
-                        "patient_id": str(issue.get('DESYNPUF_ID', 'unknown')),
-                        "provider_id": str(issue.get('PRVDR_NUM', 'unknown')),
-                        "service_date": str(issue.get('clm_from_dt', '')),
+                        "provider_type": str(metadata.get('provider_type', 'Unknown')),
                         "analysis_timestamp": datetime.now().isoformat(),
+                        "analysis_id": analysis_id,
+                        "content_hash": issue.get('content_hash'),
                         
                         # Diagnosis information
                         "icd9_code": str(issue.get('icd9_dgns_code', '')),
@@ -324,14 +685,7 @@ class NewClaimAnalyzer:
                         "business_impact": str(issue.get('business_impact', '')),
                         
                         # Additional metadata for search
-                        "combo_id": combo_id,
-                        "claim_metadata": {
-                            "total_issues": int(metadata.get("total_issues", 0)),
-                            "critical_issues": int(metadata.get("critical_issues", 0)),
-                            "high_issues": int(metadata.get("high_issues", 0)),
-                            "max_risk_score": float(metadata.get("max_risk_score", 0)),
-                            "avg_risk_score": float(metadata.get("avg_risk_score", 0))
-                        }
+                        "combo_id": combo_id
                     }
                     
                     # Clean up empty values and ensure all values are JSON serializable
@@ -344,17 +698,13 @@ class NewClaimAnalyzer:
                         payload=payload
                     )
                     
-                    # Upsert to Qdrant
-                    self.qdrant_client.upsert(
-                        collection_name=self.collection_name,
-                        wait=True,
-                        points=[point]
-                    )
+                    # Queue for the batched upsert
+                    self.qdrant_writer.add(point)
                     
                     points_added += 1
                     vector_ids.append(vector_id)
                     
-                    print(f"  Stored: DX{issue['dx_position']} {issue.get('icd9_dgns_code', '')}  PROC{issue['hcpcs_position']} {issue.get('hcpcs_code', '')}")
+                    print(f"  Queued: DX{issue['dx_position']} {issue.get('icd9_dgns_code', '')}  PROC{issue['hcpcs_position']} {issue.get('hcpcs_code', '')}")
                     print(f"     Risk: {issue.get('denial_risk_level', 'OK')} (Score: {issue.get('denial_risk_score', 0)})")
                     
                 except Exception as e:
@@ -362,17 +712,76 @@ class NewClaimAnalyzer:
                     import traceback
                     traceback.print_exc()
                     continue
+            
+            # One summary point per claim with the claim-level metadata
+            first_issue = detailed_issues[0]
+            claim_id = str(first_issue.get('CLM_ID', 'unknown'))
+            summary_point_id = claim_summary_point_id(claim_id)
+            try:
+                summary_payload = self._clean_payload({
+                    "record_type": CLAIM_SUMMARY_RECORD,
+                    "patient_id": str(first_issue.get('DESYNPUF_ID', 'unknown')),
+                    "provider_id": str(first_issue.get('PRVDR_NUM', 'unknown')),
+                    "analysis_timestamp": datetime.now().isoformat(),
+                    "analysis_id": analysis_id,
+                    "combination_count": len(detailed_issues),
+                    "claim_metadata": claim_totals,
+                    "code_signature": metadata.get('code_signature'),
+                    "all_cpt_codes": metadata.get('all_cpt_codes', []),
+                    "icd_codes": metadata.get('icd_codes', []),
+                    "modifiers": metadata.get('modifiers', []),
+                    **claim_index_payload(claim_id, metadata, detailed_issues)
+                })
+                self.qdrant_writer.add(PointStruct(
+                    id=summary_point_id,
+                    vector=self._pad_embedding_matrix(claim_features)[0].tolist(),
+                    payload=summary_payload
+                ))
+                if self.similar_index is not None:
+                    self.similar_index.add(claim_id, claim_features, summary_payload)
+                if self.code_set_index is not None and metadata.get('code_signature'):
+                    # Same payload load_from_qdrant reads back, so a rebuilt index matches this one
+                    self.code_set_index.insert(claim_id, metadata['code_signature'], summary_payload)
+            except Exception as e:
+                print(f"  ERROR: Failed to store claim summary for {claim_id}: {e}")
+                summary_point_id = None
                 
+            # Drop points from earlier analyses of this claim that were not overwritten
+            stale_points_removed = False
+            if points_added == len(to_write) and summary_point_id:
+                try:
+                    delete_stale_claim_points(self.qdrant_client, claim_id,
+                                              vector_ids + reused_ids + [summary_point_id], self.collection_name)
+                    stale_points_removed = True
+                except Exception as e:
+                    print(f"  Warning: Could not remove stale points for claim: {e}")
+            
+            # Outside batch mode, wait until this claim's points are applied
+            if not self.qdrant_batch_mode:
+                self.qdrant_writer.barrier()
+            
+            points_failed = self.qdrant_writer.points_failed - failed_before
+            write_stats = self.qdrant_writer.stats()
+            batches = self.qdrant_writer.batches_sent - batches_before
+            
             # Final verification
             final_count = self.check_qdrant_status()
             
             return {
-                "success": True,
-                "points_added": points_added,
+                "success": points_failed == 0,
+                "points_added": points_added - points_failed,
+                "points_failed": points_failed,
+                "points_pending": write_stats["points_pending"],
                 "vector_ids": vector_ids,
+                "points_reused": len(reused_ids),
+                "reused_vector_ids": reused_ids,
+                "summary_point_id": summary_point_id,
+                "analysis_id": analysis_id,
+                "stale_points_removed": stale_points_removed,
                 "collection": self.collection_name,
                 "timestamp": datetime.now().isoformat(),
-                "final_point_count": final_count
+                "final_point_count": final_count,
+                "write_batches": write_stats["recent_batches"][-batches:] if batches else []
             }
             
         except Exception as e:
@@ -385,6 +794,21 @@ class NewClaimAnalyzer:
                 "timestamp": datetime.now().isoformat()
             }
 
+    def flush_qdrant_writes(self) -> Dict[str, Any]:
+        """
+        Send all queued points and wait until Qdrant has applied them
+        
+        Call once at the end of a batch run (qdrant_batch_mode=True).
+        
+        Returns:
+            Writer statistics including per-batch latency
+        """
+        self.qdrant_writer.barrier()
+        stats = self.qdrant_writer.stats()
+        print(f"Qdrant writes: {stats['points_written']} points in {stats['batches_sent']} batches "
+              f"(avg {stats['avg_batch_seconds']}s, max {stats['max_batch_seconds']}s per batch)")
+        return stats
+
     def _convert_to_native(self, value):
         """Convert numpy/pandas types to native Python types"""
         if value is None:
@@ -459,214 +883,239 @@ class NewClaimAnalyzer:
         Returns:
             Vector embedding as list of floats (768 dimensions)
         """
-        # Create feature vector from metadata
-        features = []
-        
-        # Risk scores (normalized)
-        max_risk = min(metadata.get("max_risk_score", 0) / 150.0, 1.0)  # Normalize to 0-1
-        avg_risk = min(metadata.get("avg_risk_score", 0) / 150.0, 1.0)
-        features.extend([max_risk, avg_risk])
-        
-        # Issue counts (normalized)
-        total_issues = metadata.get("total_issues", 0)
-        critical_issues = metadata.get("critical_issues", 0)
-        high_issues = metadata.get("high_issues", 0)
-        medium_issues = metadata.get("medium_issues", 0)
-        low_issues = metadata.get("low_issues", 0)
-        
-        # Normalize issue counts (assuming max 20 issues for normalization)
-        features.extend([
-            min(total_issues / 20.0, 1.0),
-            min(critical_issues / 10.0, 1.0),
-            min(high_issues / 10.0, 1.0),
-            min(medium_issues / 15.0, 1.0),
-            min(low_issues / 20.0, 1.0)
-        ])
-        
-        # Procedure and diagnosis counts
-        cpt_count = len(metadata.get("all_cpt_codes", []))
-        icd_count = len(metadata.get("icd_codes", []))
-        features.extend([
-            min(cpt_count / 20.0, 1.0),
-            min(icd_count / 10.0, 1.0)
-        ])
-        
-        # Denial indicators (binary features)
-        denial_indicators = metadata.get("denial_indicators", {})
-        features.extend([
-            1.0 if denial_indicators.get("high_denial_risk", False) else 0.0,
-            1.0 if denial_indicators.get("critical_issues_present", False) else 0.0,
-            1.0 if denial_indicators.get("duplicate_billing_risk", False) else 0.0,
-            1.0 if denial_indicators.get("bundling_risk", False) else 0.0,
-            1.0 if denial_indicators.get("pa_required", False) else 0.0,
-            1.0 if denial_indicators.get("ncci_conflicts", False) else 0.0,
-            1.0 if denial_indicators.get("credentialing_issues", False) else 0.0,
-            1.0 if denial_indicators.get("modifier_issues", False) else 0.0,
-            1.0 if denial_indicators.get("frequency_issues", False) else 0.0,
-            1.0 if denial_indicators.get("coverage_issues", False) else 0.0
-        ])
-        
-        # Provider type encoding (one-hot like)
-        provider_type = metadata.get("provider_type", "Unknown")
-        provider_features = [0.0] * 8  # 8 provider types
-        provider_types = ["Hospital", "Facility", "Physician", "Group", "Laboratory", "Radiology", "Ambulance", "DME"]
-        if provider_type in provider_types:
-            provider_features[provider_types.index(provider_type)] = 1.0
-        features.extend(provider_features)
-        
-        # Procedure categories (normalized counts)
-        procedure_categories = metadata.get("procedure_categories", {})
-        category_features = []
-        for category in ["surgery", "radiology", "laboratory", "evaluation_management", 
-                        "anesthesia", "pathology", "medicine", "other"]:
-            count = len(procedure_categories.get(category, []))
-            category_features.append(min(count / 10.0, 1.0))
-        features.extend(category_features)
-        
-        # Diagnosis categories (normalized counts)
-        diagnosis_categories = metadata.get("diagnosis_categories", {})
-        diag_features = []
-        for category in ["musculoskeletal", "cardiovascular", "endocrine", "respiratory", 
-                        "gastrointestinal", "neurological", "mental_health", "infectious_disease", 
-                        "neoplasms", "other"]:
-            count = len(diagnosis_categories.get(category, []))
-            diag_features.append(min(count / 5.0, 1.0))
-        features.extend(diag_features)
-        
-        # Billing patterns
-        billing_patterns = metadata.get("billing_patterns", {})
-        features.extend([
-            min(len(billing_patterns.get("duplicate_procedures", [])) / 5.0, 1.0),
-            min(len(billing_patterns.get("high_cost_procedures", [])) / 3.0, 1.0),
-            min(len(billing_patterns.get("bundled_procedures", [])) / 5.0, 1.0),
-            min(len(billing_patterns.get("frequent_procedures", [])) / 5.0, 1.0),
-            min(len(billing_patterns.get("unusual_combinations", [])) / 3.0, 1.0)
-        ])
-        
-        # Risk metadata features
-        risk_metadata = metadata.get("risk_metadata", {})
-        features.extend([
-            min(risk_metadata.get("duplicate_issues", 0) / 5.0, 1.0),
-            min(risk_metadata.get("bundling_issues", 0) / 5.0, 1.0),
-            min(risk_metadata.get("pa_issues", 0) / 3.0, 1.0),
-            min(risk_metadata.get("credentialing_issues", 0) / 2.0, 1.0),
-            min(risk_metadata.get("modifier_issues", 0) / 5.0, 1.0),
-            min(risk_metadata.get("frequency_issues", 0) / 5.0, 1.0),
-            min(risk_metadata.get("ncci_conflicts", 0) / 3.0, 1.0),
-            min(risk_metadata.get("coverage_issues", 0) / 5.0, 1.0),
-            min(risk_metadata.get("mue_risks", 0) / 5.0, 1.0),
-            min(risk_metadata.get("ncd_issues", 0) / 3.0, 1.0)
-        ])
-        
-        # Units information
-        units = metadata.get("units", {})
-        total_units = sum(units.values())
-        unique_procedures = len(units)
-        avg_units_per_procedure = total_units / unique_procedures if unique_procedures > 0 else 0
-        features.extend([
-            min(total_units / 50.0, 1.0),
-            min(unique_procedures / 20.0, 1.0),
-            min(avg_units_per_procedure / 5.0, 1.0)
-        ])
-        
-        # Modifiers count
-        modifiers_count = len(metadata.get("modifiers", []))
-        features.append(min(modifiers_count / 10.0, 1.0))
-        
-        # Service date features (if available)
-        service_date = metadata.get("service_date")
-        if service_date:
-            # Extract month and day of week as cyclical features
-            month_sin = np.sin(2 * np.pi * service_date.month / 12)
-            month_cos = np.cos(2 * np.pi * service_date.month / 12)
-            day_of_week_sin = np.sin(2 * np.pi * service_date.weekday() / 7)
-            day_of_week_cos = np.cos(2 * np.pi * service_date.weekday() / 7)
-            features.extend([month_sin, month_cos, day_of_week_sin, day_of_week_cos])
-        else:
-            features.extend([0.0, 0.0, 0.0, 0.0])
+        return self._create_embedding_matrix([metadata])[0].tolist()
+
+    def _create_embedding_matrix(self, metadata_list: List[Dict[str, Any]]) -> np.ndarray:
+        """
+        Create 768-dimensional embeddings for a batch of metadata dicts in one pass
         
-        # Pad or truncate to exactly 768 dimensions
-        target_size = 768
-        if len(features) < target_size:
+        Returns:
+            (N x 768) float32 matrix
+        """
+        return self._pad_embedding_matrix(self._create_feature_matrix(metadata_list))
+
+    def _pad_embedding_matrix(self, features: np.ndarray) -> np.ndarray:
+        """Pad (or truncate) an (N x 68) feature matrix to (N x 768) float32"""
+        target_size = EMBEDDING_SIZE
+        rows, width = features.shape
+        if width < target_size:
             # Pad with small random values (better than zeros for some models)
-            remaining = target_size - len(features)
-            padding = np.random.normal(0, 0.01, remaining).tolist()  # Convert to list
-            features.extend(padding)
-        elif len(features) > target_size:
-            # Truncate
-            features = features[:target_size]
-        
-        # Ensure we have exactly 768 dimensions and convert to native Python floats
-        assert len(features) == 768, f"Expected 768 dimensions, got {len(features)}"
+            padding = np.random.normal(0, 0.01, (rows, target_size - width))
+            features = np.hstack([features, padding])
+        elif width > target_size:
+            features = features[:, :target_size]
         
-        # Convert all values to native Python floats
-        features = [float(x) for x in features]
+        return features.astype(np.float32)
+
+    def _create_feature_matrix(self, metadata_list: List[Dict[str, Any]]) -> np.ndarray:
+        """
+        Build the (N x 68) feature matrix for a batch of metadata dicts
+        
+        Column layout (unchanged from the per-claim version):
+            0-1   max/avg risk score          / 150
+            2-6   total/critical/high/medium/low issue counts
+            7-8   CPT / ICD code counts
+            9-18  denial indicators (binary)
+            19-26 provider type (one-hot)
+            27-34 procedure category counts   / 10
+            35-44 diagnosis category counts   / 5
+            45-49 billing pattern counts
+            50-59 risk metadata counts
+            60-62 total units, unique procedures, avg units per procedure
+            63    modifier count              / 10
+            64-67 service month / weekday as sin, cos
+        
+        Every column except the service date is min(raw / scale, 1.0).
+        """
+        rows = len(metadata_list)
+        raw = np.zeros((rows, len(FEATURE_SCALES)))
+        service_months = np.zeros(rows)
+        service_weekdays = np.zeros(rows)
+        has_service_date = np.zeros(rows, dtype=bool)
+        
+        for row, metadata in enumerate(metadata_list):
+            denial_indicators = metadata.get("denial_indicators", {})
+            procedure_categories = metadata.get("procedure_categories", {})
+            diagnosis_categories = metadata.get("diagnosis_categories", {})
+            billing_patterns = metadata.get("billing_patterns", {})
+            risk_metadata = metadata.get("risk_metadata", {})
+            units = metadata.get("units", {})
+            
+            total_units = sum(units.values())
+            unique_procedures = len(units)
+            
+            provider_type = metadata.get("provider_type", "Unknown")
+            provider_one_hot = [1.0 if provider_type == known else 0.0 for known in PROVIDER_TYPES]
+            
+            raw[row] = [
+                metadata.get("max_risk_score", 0),
+                metadata.get("avg_risk_score", 0),
+                metadata.get("total_issues", 0),
+                metadata.get("critical_issues", 0),
+                metadata.get("high_issues", 0),
+                metadata.get("medium_issues", 0),
+                metadata.get("low_issues", 0),
+                len(metadata.get("all_cpt_codes", [])),
+                len(metadata.get("icd_codes", [])),
+                *[1.0 if denial_indicators.get(key, False) else 0.0 for key in DENIAL_INDICATOR_KEYS],
+                *provider_one_hot,
+                *[len(procedure_categories.get(category, [])) for category in PROCEDURE_CATEGORY_KEYS],
+                *[len(diagnosis_categories.get(category, [])) for category in DIAGNOSIS_CATEGORY_KEYS],
+                *[len(billing_patterns.get(key, [])) for key in BILLING_PATTERN_KEYS],
+                *[risk_metadata.get(key, 0) for key in RISK_METADATA_KEYS],
+                total_units,
+                unique_procedures,
+                total_units / unique_procedures if unique_procedures > 0 else 0,
+                len(metadata.get("modifiers", []))
+            ]
+            
+            service_date = metadata.get("service_date")
+            if service_date:
+                has_service_date[row] = True
+                service_months[row] = service_date.month
+                service_weekdays[row] = service_date.weekday()
+        
+        features = np.zeros((rows, len(FEATURE_SCALES) + 4))
+        features[:, :len(FEATURE_SCALES)] = np.minimum(raw / FEATURE_SCALES, 1.0)
+        
+        # Service date features: month and day of week as cyclical features (zeros when missing)
+        date_features = np.column_stack([
+            np.sin(2 * np.pi * service_months / 12),
+            np.cos(2 * np.pi * service_months / 12),
+            np.sin(2 * np.pi * service_weekdays / 7),
+            np.cos(2 * np.pi * service_weekdays / 7)
+        ])
+        features[:, len(FEATURE_SCALES):] = np.where(has_service_date[:, None], date_features, 0.0)
         
         return features
 
-    def search_similar_claims(self, metadata: Dict[str, Any], limit: int = 5) -> List[Dict[str, Any]]:
+    def search_similar_claims(self, metadata: Dict[str, Any], limit: int = 5,
+                              query_vector: List[float] = None, provider_type=None, risk_category=None,
+                              payload_fields: List[str] = None) -> List[Dict[str, Any]]:
         """
         Search for similar claims in Qdrant
         
         Args:
             metadata: Current claim metadata
             limit: Maximum number of similar claims to return
+            query_vector: Precomputed embedding for this claim (built from metadata if omitted)
+            provider_type: Optional provider type (or list) the results must match
+            risk_category: Optional risk category (or list) the results must match
+            payload_fields: Payload keys to return (None = full payload)
+            
+        Returns:
+            List of similar claims with scores (the claim's own points are excluded)
+        """
+        return self.search_similar_claims_batch(
+            [metadata], limit=limit,
+            query_vectors=[query_vector] if query_vector is not None else None,
+            provider_type=provider_type, risk_category=risk_category, payload_fields=payload_fields
+        )[0]
+
+    def search_similar_claims_batch(self, metadata_list: List[Dict[str, Any]], limit: int = 5,
+                                    query_vectors: List[List[float]] = None, provider_type=None,
+                                    risk_category=None, payload_fields: List[str] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Search for similar claims for many claims in a single Qdrant request
+        
+        With compact_similar_search the claims are ranked by exact search over
+        the in-memory feature index instead (one result per similar claim).
+        
+        Args:
+            metadata_list: Metadata of each query claim
+            limit: Maximum number of similar claims per query claim
+            query_vectors: Precomputed embeddings or feature rows, aligned with metadata_list (built if omitted)
+            provider_type: Optional provider type (or list) the results must match
+            risk_category: Optional risk category (or list) the results must match
+            payload_fields: Payload keys to return, e.g. SIMILAR_CLAIM_SUMMARY_FIELDS (None = full payload)
             
         Returns:
-            List of similar claims with scores
+            One list of similar claims with scores per query claim
         """
+        if not metadata_list:
+            return []
+        
         try:
-            # Create query embedding
-            query_embedding = self._create_embedding_from_metadata(metadata)
+            if query_vectors is None:
+                if self.similar_index is not None:
+                    query_vectors = self._create_feature_matrix(metadata_list)
+                else:
+                    query_vectors = self._create_embedding_matrix(metadata_list).tolist()
             
-            # Search in Qdrant
-            search_result = self.qdrant_client.search(
-                collection_name=self.collection_name,
-                query_vector=query_embedding,
-                limit=limit
+            queries = [
+                {"claim_id": metadata.get("claim_id"), "vector": vector}
+                for metadata, vector in zip(metadata_list, query_vectors)
+            ]
+            if self.similar_index is not None:
+                return self.similar_index.search(queries, limit=limit, provider_type=provider_type,
+                                                 risk_category=risk_category, payload_fields=payload_fields)
+            return query_similar_claims(
+                self.qdrant_client, queries, limit=limit,
+                provider_type=provider_type, risk_category=risk_category,
+                payload_fields=payload_fields, collection_name=self.collection_name
             )
             
-            similar_claims = []
-            for result in search_result:
-                similar_claims.append({
-                    "score": result.score,
-                    "vector_id": result.id,
-                    "payload": result.payload
-                })
-            
-            return similar_claims
-            
         except Exception as e:
             print(f"Qdrant search failed: {e}")
+            return [[] for _ in metadata_list]
+
+    def find_claims_with_similar_codes(self, metadata: Dict[str, Any], limit: int = 10,
+                                       min_similarity: float = 0.5) -> List[Dict[str, Any]]:
+        """
+        Claims billed with nearly the same (CPT, ICD, modifier) set, from the code-set LSH index
+        
+        Args:
+            metadata: Current claim metadata (with code_signature)
+            limit: Maximum number of claims to return
+            min_similarity: Minimum estimated Jaccard similarity of the code sets
+            
+        Returns:
+            List of {"claim_id", "similarity", "payload"}, most similar first
+        """
+        if self.code_set_index is None or not metadata.get('code_signature'):
+            return []
+        try:
+            return self.code_set_index.query(metadata['code_signature'], limit=limit, min_similarity=min_similarity,
+                                             exclude_claim_id=metadata.get('claim_id'))
+        except Exception as e:
+            print(f"Code-set search failed: {e}")
             return []
 
     # Add all the missing helper methods that are called by analyze_new_claim
     def _get_icd10_mapping(self, conn, icd9_code):
         """Get ICD-10 mapping for ICD-9 code"""
+        hit, mapped = self.reference_cache.lookup('icd10_mapping', self._sql_key(icd9_code))
+        if hit:
+            return mapped
+        
         try:
             # Use the view that includes descriptions to get the best mapping
-            query = """
+            query = f"""
             SELECT icd10_code, icd10_description
             FROM [_gems].[dbo].[vw_icd9_to_icd10_cm_mapping]
             WHERE icd9_code = ?
-            ORDER BY 
-                CASE 
-                    WHEN icd10_code LIKE 'I10%' THEN 1  -- Essential hypertension first
-                    WHEN icd10_code LIKE 'E11%' THEN 2  -- Type 2 diabetes second
-                    WHEN icd10_code LIKE 'I25%' THEN 3  -- Coronary artery disease third
-                    ELSE 4  -- Other codes last
-                END,
-                icd10_code
+            ORDER BY {ICD10_MAPPING_ORDER}
             """
             df = pd.read_sql(query, conn, params=[icd9_code])
-            if not df.empty:
-                return df.iloc[0]['icd10_code']
+            mapped = self._icd10_mapping_from_frame(df)
+            self.reference_cache.store('icd10_mapping', self._sql_key(icd9_code), mapped)
+            return mapped
         except:
             pass
         return None
 
+    def _icd10_mapping_from_frame(self, df):
+        """Pick the preferred ICD-10 code from a GEMS mapping result"""
+        if not df.empty:
+            return df.iloc[0]['icd10_code']
+        return None
+
     def _get_ncci_data(self, conn, hcpcs_code):
         """Get NCCI data for HCPCS code"""
+        hit, ncci_data = self.reference_cache.lookup('ncci_data', self._sql_key(hcpcs_code))
+        if hit:
+            return ncci_data
+        
         try:
             query = """
             SELECT TOP 1 ptp_denial_reason, mue_threshold, mue_denial_type
@@ -674,36 +1123,55 @@ class NewClaimAnalyzer:
             WHERE procedure_code = ?
             """
             df = pd.read_sql(query, conn, params=[hcpcs_code])
-            if not df.empty:
-                return {
-                    'ptp_denial_reason': df.iloc[0]['ptp_denial_reason'],
-                    'mue_threshold': df.iloc[0]['mue_threshold'],
-                    'mue_denial_type': df.iloc[0]['mue_denial_type']
-                }
+            ncci_data = self._ncci_data_from_frame(df)
+            self.reference_cache.store('ncci_data', self._sql_key(hcpcs_code), ncci_data)
+            return ncci_data
         except:
             pass
         return {}
 
+    def _ncci_data_from_frame(self, df):
+        """Convert an NCCI alert result into the ncci_data dictionary"""
+        if not df.empty:
+            return {
+                'ptp_denial_reason': df.iloc[0]['ptp_denial_reason'],
+                'mue_threshold': df.iloc[0]['mue_threshold'],
+                'mue_denial_type': df.iloc[0]['mue_denial_type']
+            }
+        return {}
+
     def _get_diagnosis_name(self, conn, icd10_code):
         """Get human-readable diagnosis name for ICD-10 code"""
+        # Remove decimal points from ICD-10 code for database lookup
+        clean_code = icd10_code.replace('.', '') if icd10_code else ''
+        
+        hit, description = self.reference_cache.lookup('diagnosis_name', self._sql_key(clean_code))
+        if hit:
+            return description
+        
         try:
-            # Remove decimal points from ICD-10 code for database lookup
-            clean_code = icd10_code.replace('.', '') if icd10_code else ''
-            
             query = """
             SELECT TOP 1 description
             FROM [_gems].[dbo].[icd10cm_codes_2018_fixed]
             WHERE icd10_code = ?
             """
             df = pd.read_sql(query, conn, params=[clean_code])
-            if not df.empty:
-                return df.iloc[0]['description']
+            description = df.iloc[0]['description'] if not df.empty else None
+            self.reference_cache.store('diagnosis_name', self._sql_key(clean_code), description)
+            return description
         except:
             pass
         return None
 
     def _get_procedure_name(self, conn, hcpcs_code):
         """Get human-readable procedure name for HCPCS code"""
+        hit, name = self.reference_cache.lookup('procedure_name', hcpcs_code)
+        if hit:
+            return name
+        
+        # Only cache names that were resolved without a database error
+        lookup_failed = False
+        
         try:
             # Try to get procedure name from HCPCS master table first
             query = """
@@ -713,6 +1181,39 @@ class NewClaimAnalyzer:
             ORDER BY seqnum
             """
             df = pd.read_sql(query, conn, params=[hcpcs_code])
+            name = self._procedure_name_from_master(df)
+            if name is not None:
+                self.reference_cache.store('procedure_name', hcpcs_code, name)
+                return name
+        except:
+            lookup_failed = True
+        
+        try:
+            # Fallback: Try NCD HCPCS matches
+            query = """
+            SELECT TOP 1 thm.long_description
+            FROM [_ncd].[dbo].[toc_hcpcs_matches] thm
+            INNER JOIN [_ncd].[dbo].[ncd_trkg] nt
+                ON TRY_CONVERT(FLOAT, nt.NCD_mnl_sect) = thm.section
+            WHERE thm.hcpcs_code = ?
+            """
+            df = pd.read_sql(query, conn, params=[hcpcs_code])
+            name = self._procedure_name_from_ncd(df)
+            if name is not None:
+                if not lookup_failed:
+                    self.reference_cache.store('procedure_name', hcpcs_code, name)
+                return name
+        except:
+            lookup_failed = True
+        
+        name = self._generic_procedure_name(hcpcs_code)
+        if not lookup_failed:
+            self.reference_cache.store('procedure_name', hcpcs_code, name)
+        return name
+
+    def _procedure_name_from_master(self, df):
+        """Procedure name from an hcpcs_master result, or None to fall back to NCD matches"""
+        try:
             if not df.empty:
                 long_desc = df.iloc[0]['long_description']
                 short_desc = df.iloc[0]['short_description']
@@ -727,17 +1228,11 @@ class NewClaimAnalyzer:
                     return long_desc.strip()
         except:
             pass
-        
+        return None
+
+    def _procedure_name_from_ncd(self, df):
+        """Procedure name from an NCD HCPCS match result, or None to fall back to the generic name"""
         try:
-            # Fallback: Try NCD HCPCS matches
-            query = """
-            SELECT TOP 1 thm.long_description
-            FROM [_ncd].[dbo].[toc_hcpcs_matches] thm
-            INNER JOIN [_ncd].[dbo].[ncd_trkg] nt
-                ON TRY_CONVERT(FLOAT, nt.NCD_mnl_sect) = thm.section
-            WHERE thm.hcpcs_code = ?
-            """
-            df = pd.read_sql(query, conn, params=[hcpcs_code])
             if not df.empty:
                 description = df.iloc[0]['long_description']
                 # Clean up the description (remove prefixes like "003", "004")
@@ -746,8 +1241,10 @@ class NewClaimAnalyzer:
                 return description.strip()
         except:
             pass
-        
-        # Final fallback: Return a generic description based on HCPCS code patterns
+        return None
+
+    def _generic_procedure_name(self, hcpcs_code):
+        """Final fallback: Return a generic description based on HCPCS code patterns"""
         if hcpcs_code:
             if hcpcs_code.startswith('2'):
                 return f"Surgical procedure {hcpcs_code}"
@@ -764,6 +1261,10 @@ class NewClaimAnalyzer:
 
     def _get_ncd_data(self, conn, hcpcs_code, service_date):
         """Get NCD data for HCPCS code"""
+        hit, ncd_data = self.reference_cache.lookup('ncd_data', self._sql_key(hcpcs_code))
+        if hit:
+            return ncd_data
+        
         try:
             query = """
             SELECT TOP 1 
@@ -777,6 +1278,16 @@ class NewClaimAnalyzer:
             WHERE thm.hcpcs_code = ?
             """
             df = pd.read_sql(query, conn, params=[hcpcs_code])
+            ncd_data = self._ncd_data_from_frame(df)
+            self.reference_cache.store('ncd_data', self._sql_key(hcpcs_code), ncd_data)
+            return ncd_data
+        except:
+            pass
+        return {}
+
+    def _ncd_data_from_frame(self, df):
+        """Convert an NCD tracking result into the ncd_data dictionary"""
+        try:
             if not df.empty:
                 row = df.iloc[0]
                 ncd_status = 'Unknown'
@@ -794,90 +1305,365 @@ class NewClaimAnalyzer:
             pass
         return {}
 
-    def _determine_lcd_coverage(self, conn, hcpcs_code, diagnosis_code):
+    def _resolve_diagnoses(self, conn, dx_codes, reference=None):
         """
-        Determine LCD coverage for diagnosis + procedure combination
+        Per-DX phase: ICD-10 mapping and diagnosis name for each distinct diagnosis code
         
-        UPDATED: Now queries _article_ database for surgical LCD coverage
-        Backup saved as: new_claim_analyzer1.py.backup_before_article_db_YYYYMMDD_HHMMSS
+        Args:
+            conn: Database connection
+            dx_codes: Distinct diagnosis codes on the claim
+            reference: Optional preloaded tables from _bulk_reference_lookup
+            
+        Returns:
+            Dictionary of dx_code -> (mapped_icd10, diagnosis_name)
+        """
+        dx_info = {}
+        for dx_code in dx_codes:
+            # Get ICD-10 mapping (check if already ICD-10)
+            if dx_code and dx_code[0].isalpha():
+                # Already ICD-10 format (starts with letter)
+                mapped_icd10 = dx_code
+            elif reference is not None:
+                mapped_icd10 = reference['icd10_mappings'].get(self._sql_key(dx_code))
+            else:
+                # ICD-9 format, need mapping
+                mapped_icd10 = self._get_icd10_mapping(conn, dx_code)
+            
+            if not mapped_icd10:
+                diagnosis_name = None
+            elif reference is not None:
+                diagnosis_name = reference['diagnosis_names'].get(self._sql_key(mapped_icd10.replace('.', '')))
+            else:
+                diagnosis_name = self._get_diagnosis_name(conn, mapped_icd10)
+            
+            dx_info[dx_code] = (mapped_icd10, diagnosis_name)
+        return dx_info
+
+    def _resolve_procedures(self, conn, hcpcs_codes, service_date, reference=None):
+        """
+        Per-HCPCS phase: NCCI data, NCD data and procedure name for each distinct procedure code
         
         Args:
             conn: Database connection
-            hcpcs_code: CPT/HCPCS procedure code
-            diagnosis_code: ICD-9 or ICD-10 diagnosis code
+            hcpcs_codes: Distinct procedure codes on the claim
+            service_date: Claim from date (passed to the NCD lookup)
+            reference: Optional preloaded tables from _bulk_reference_lookup
             
         Returns:
-            'Y' if covered, 'N' if not covered
+            Dictionary of hcpcs_code -> (ncci_data, ncd_data, procedure_name)
+        """
+        hcpcs_info = {}
+        for hcpcs_code in hcpcs_codes:
+            if reference is not None:
+                ncci_data = reference['ncci_data'].get(self._sql_key(hcpcs_code), {})
+                ncd_data = reference['ncd_data'].get(self._sql_key(hcpcs_code), {})
+                procedure_name = reference['procedure_names'][hcpcs_code]
+            else:
+                ncci_data = self._get_ncci_data(conn, hcpcs_code)
+                ncd_data = self._get_ncd_data(conn, hcpcs_code, service_date)
+                procedure_name = self._get_procedure_name(conn, hcpcs_code)
+            
+            hcpcs_info[hcpcs_code] = (ncci_data, ncd_data, procedure_name)
+        return hcpcs_info
+
+    # ------------------------------------------------------------------
+    # Bulk (set-based) reference lookups
+    # ------------------------------------------------------------------
+    def _sql_key(self, code):
+        """Normalize a code the way SQL Server compares it (case-insensitive, trailing blanks ignored)"""
+        return str(code).rstrip().upper()
+
+    def _read_sql_grouped(self, conn, query, params, key_column):
         """
-        if not diagnosis_code or not hcpcs_code:
-            return 'N'
+        Run a set-based query and split the rows into per-code result frames
+        
+        Each frame holds only the non-key columns and is built the same way
+        pd.read_sql builds its frame, so the per-code *_from_frame helpers
+        see exactly what a single-code query would have returned.
         
+        Returns:
+            Dictionary of SQL-normalized code -> DataFrame
+        """
+        cursor = conn.cursor()
         try:
-            # Strategy 1: Check surgical LCD crosswalk in _article_ database for CPT codes
-            if hcpcs_code and hcpcs_code[0].isdigit():  # Numeric CPT codes
-                try:
-                    query = """
-                        SELECT TOP 1 coverage_status
-                        FROM [_article_].[dbo].[vw_Surgical_LCD_Crosswalk]
-                        WHERE cpt_hcpcs_code = ?
-                          AND icd10_code = ?
-                          AND coverage_status = 'COVERED'
-                    """
-                    df = pd.read_sql(query, conn, params=[hcpcs_code, diagnosis_code])
-                    
-                    if not df.empty and df['coverage_status'].iloc[0] == 'COVERED':
-                        return 'Y'
-                    
-                    # If no exact match, assume covered for surgical procedures
-                    # (absence from LCD doesn't mean not covered, just not specified)
-                    return 'Y'
-                    
-                except Exception as e:
-                    # If article database query fails, fall back to conservative approach
-                    # Assume surgical CPT codes are covered unless explicitly excluded
-                    return 'Y'
-            
-            # Strategy 2: For HCPCS codes (A-Z prefix), use enhanced whitelist
-            # These are typically DME/supplies covered by _lcd database
-            covered_codes = [
-                # ICD-9 codes
-                'V', 'Z',  # Preventive codes
-                '25000', '25001', '25002', '25003', '25010', '25011', '25012', '25013',  # Diabetes
-                '4010', '4011', '4019',  # Hypertension
-                '2720', '2721', '2722', '2723', '2724',  # Lipid disorders
-                '4140', '4141', '4148', '4149',  # Coronary artery disease
-                '4280', '4281', '4282', '4283', '4284', '4289',  # Heart failure
-                '49300', '49301', '49302', '49310', '49311', '49312', '49320', '49321', '49322', '49381', '49382', '49390', '49391',  # Asthma
-                '496', '4910', '4911', '4912', '4918', '4919', '4920', '4928',  # COPD
-                '5851', '5852', '5853', '5854', '5855', '5856', '5859',  # Chronic kidney disease
-                '3310', '3311', '3312', '3313', '3314', '3315', '3316', '3317', '3318', '3319',  # Alzheimer's/dementia
-                '340', '3410', '3411', '3412', '3413', '3414', '3415', '3416', '3417', '3418', '3419',  # Multiple sclerosis
-                
-                # ICD-10 codes
-                'I10', 'I11', 'I12', 'I13', 'I15',  # Hypertension
-                'E10', 'E11', 'E12', 'E13', 'E14',  # Diabetes
-                'E78', 'E79',  # Lipid disorders
-                'I25',  # Coronary artery disease
-                'I50',  # Heart failure
-                'J45', 'J46',  # Asthma
-                'J40', 'J41', 'J42', 'J43', 'J44',  # COPD
-                'N18',  # Chronic kidney disease
-                'F01', 'F02', 'F03', 'G30',  # Alzheimer's/dementia
-                'G35',  # Multiple sclerosis
-                'Z00', 'Z01', 'Z02', 'Z03', 'Z04', 'Z05', 'Z06', 'Z07', 'Z08', 'Z09',  # Preventive codes
-            ]
-            
-            # Check if code starts with any covered prefix
-            for code in covered_codes:
-                if diagnosis_code.startswith(code):
-                    return 'Y'
+            cursor.execute(query, params)
+            columns = [col[0] for col in cursor.description]
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+        
+        key_index = columns.index(key_column)
+        value_columns = [col for i, col in enumerate(columns) if i != key_index]
+        
+        grouped = {}
+        for row in rows:
+            values = tuple(row)
+            grouped.setdefault(self._sql_key(values[key_index]), []).append(
+                tuple(v for i, v in enumerate(values) if i != key_index)
+            )
+        
+        return {
+            key: pd.DataFrame.from_records(group, columns=value_columns, coerce_float=True)
+            for key, group in grouped.items()
+        }
+
+    def _bulk_reference_lookup(self, conn, dx_codes, hcpcs_codes):
+        """
+        Resolve all reference tables for the distinct codes on a claim
+        
+        Args:
+            conn: Database connection
+            dx_codes: Distinct diagnosis codes on the claim
+            hcpcs_codes: Distinct procedure codes on the claim
             
-            return 'N'
+        Returns:
+            Dictionary of lookup tables keyed by SQL-normalized code
+            (procedure_names is keyed by the code as billed)
+        """
+        icd9_codes = sorted({code for code in dx_codes if code and not code[0].isalpha()})
+        distinct_hcpcs = sorted({code for code in hcpcs_codes if code})
+        
+        icd10_mappings = self._cached_bulk_lookup(
+            'icd10_mapping', icd9_codes,
+            lambda codes: self._bulk_icd10_mapping(conn, codes),
+            lambda code: self._get_icd10_mapping(conn, code)
+        )
+        
+        # Diagnosis names are looked up for the mapped (or already ICD-10) codes
+        lookup_dx = set()
+        for code in dx_codes:
+            if not code:
+                continue
+            mapped = code if code[0].isalpha() else icd10_mappings.get(self._sql_key(code))
+            if mapped:
+                lookup_dx.add(mapped)
+        
+        return {
+            'icd10_mappings': icd10_mappings,
+            'diagnosis_names': self._cached_bulk_lookup(
+                'diagnosis_name', sorted(lookup_dx),
+                lambda codes: self._bulk_diagnosis_names(conn, codes),
+                lambda code: self._get_diagnosis_name(conn, code),
+                key_func=lambda code: self._sql_key(code.replace('.', ''))
+            ),
+            'ncci_data': self._cached_bulk_lookup(
+                'ncci_data', distinct_hcpcs,
+                lambda codes: self._bulk_ncci_data(conn, codes),
+                lambda code: self._get_ncci_data(conn, code)
+            ),
+            'ncd_data': self._cached_bulk_lookup(
+                'ncd_data', distinct_hcpcs,
+                lambda codes: self._bulk_ncd_data(conn, codes),
+                lambda code: self._get_ncd_data(conn, code, None)
+            ),
+            'procedure_names': self._cached_bulk_lookup(
+                'procedure_name', distinct_hcpcs,
+                lambda codes: self._bulk_procedure_names(conn, codes),
+                lambda code: self._get_procedure_name(conn, code),
+                key_func=lambda code: code
+            )
+        }
+
+    def _cached_bulk_lookup(self, namespace, codes, bulk_loader, per_code_loader, key_func=None):
+        """
+        Serve codes from the reference cache and load the misses with one set-based query
+        
+        Args:
+            namespace: Reference cache namespace (shared with the per-code lookup)
+            codes: Distinct codes to resolve
+            bulk_loader: Callable(codes) -> {key: value}; raises on database errors
+            per_code_loader: Per-code lookup used if the bulk query fails
+            key_func: Maps a code to its cache/result key (defaults to _sql_key)
             
+        Returns:
+            Dictionary of key -> value covering every code
+        """
+        key_func = key_func or self._sql_key
+        resolved = {}
+        misses = []
+        
+        for code in codes:
+            key = key_func(code)
+            if key in resolved:
+                continue
+            hit, value = self.reference_cache.lookup(namespace, key)
+            if hit:
+                resolved[key] = value
+            else:
+                misses.append(code)
+        
+        if not misses:
+            return resolved
+        
+        try:
+            loaded = bulk_loader(misses)
         except Exception as e:
-            # If any error occurs, default to 'Y' to avoid false denials
-            print(f"Warning: LCD coverage check failed for {hcpcs_code} + {diagnosis_code}: {e}")
-            return 'Y'
+            print(f"Warning: Bulk {namespace} lookup failed, falling back to per-code queries: {e}")
+            for code in misses:
+                resolved[key_func(code)] = per_code_loader(code)
+            return resolved
+        
+        # Codes missing from the bulk result have no reference row; cache that too
+        default = {} if namespace in ('ncci_data', 'ncd_data') else None
+        for code in misses:
+            key = key_func(code)
+            value = loaded.get(key, default)
+            self.reference_cache.store(namespace, key, value)
+            resolved[key] = value
+        
+        return resolved
+
+    def _bulk_icd10_mapping(self, conn, icd9_codes):
+        """Preferred ICD-10 mapping for each ICD-9 code (one GEMS query)"""
+        if not icd9_codes:
+            return {}
+        placeholders = ', '.join('?' * len(icd9_codes))
+        query = f"""
+        SELECT icd9_code, icd10_code, icd10_description
+        FROM (
+            SELECT icd9_code, icd10_code, icd10_description,
+                ROW_NUMBER() OVER (PARTITION BY icd9_code ORDER BY {ICD10_MAPPING_ORDER}) AS rn
+            FROM [_gems].[dbo].[vw_icd9_to_icd10_cm_mapping]
+            WHERE icd9_code IN ({placeholders})
+        ) ranked
+        WHERE rn = 1
+        """
+        frames = self._read_sql_grouped(conn, query, list(icd9_codes), 'icd9_code')
+        return {key: self._icd10_mapping_from_frame(df) for key, df in frames.items()}
+
+    def _bulk_diagnosis_names(self, conn, icd10_codes):
+        """Diagnosis description for each ICD-10 code (one icd10cm_codes_2018_fixed query)"""
+        clean_codes = sorted({code.replace('.', '') for code in icd10_codes if code})
+        if not clean_codes:
+            return {}
+        placeholders = ', '.join('?' * len(clean_codes))
+        query = f"""
+        SELECT icd10_code, description
+        FROM (
+            SELECT icd10_code, description,
+                ROW_NUMBER() OVER (PARTITION BY icd10_code ORDER BY (SELECT NULL)) AS rn
+            FROM [_gems].[dbo].[icd10cm_codes_2018_fixed]
+            WHERE icd10_code IN ({placeholders})
+        ) ranked
+        WHERE rn = 1
+        """
+        frames = self._read_sql_grouped(conn, query, clean_codes, 'icd10_code')
+        return {key: df.iloc[0]['description'] for key, df in frames.items() if not df.empty}
+
+    def _bulk_ncci_data(self, conn, hcpcs_codes):
+        """NCCI alert data for each HCPCS code (one vw_NCCI_Daily_Denial_Alerts query)"""
+        if not hcpcs_codes:
+            return {}
+        placeholders = ', '.join('?' * len(hcpcs_codes))
+        query = f"""
+        SELECT procedure_code, ptp_denial_reason, mue_threshold, mue_denial_type
+        FROM (
+            SELECT procedure_code, ptp_denial_reason, mue_threshold, mue_denial_type,
+                ROW_NUMBER() OVER (PARTITION BY procedure_code ORDER BY (SELECT NULL)) AS rn
+            FROM [_ncci_].[dbo].[vw_NCCI_Daily_Denial_Alerts]
+            WHERE procedure_code IN ({placeholders})
+        ) ranked
+        WHERE rn = 1
+        """
+        frames = self._read_sql_grouped(conn, query, list(hcpcs_codes), 'procedure_code')
+        return {key: self._ncci_data_from_frame(df) for key, df in frames.items()}
+
+    def _bulk_ncd_data(self, conn, hcpcs_codes):
+        """NCD tracking data for each HCPCS code (one ncd_trkg/toc_hcpcs_matches query)"""
+        if not hcpcs_codes:
+            return {}
+        placeholders = ', '.join('?' * len(hcpcs_codes))
+        query = f"""
+        SELECT hcpcs_code, NCD_id, NCD_mnl_sect_title, NCD_efctv_dt, NCD_trmntn_dt
+        FROM (
+            SELECT
+                thm.hcpcs_code,
+                nt.NCD_id,
+                nt.NCD_mnl_sect_title,
+                nt.NCD_efctv_dt,
+                nt.NCD_trmntn_dt,
+                ROW_NUMBER() OVER (PARTITION BY thm.hcpcs_code ORDER BY (SELECT NULL)) AS rn
+            FROM [_ncd].[dbo].[ncd_trkg] nt
+            INNER JOIN [_ncd].[dbo].[toc_hcpcs_matches] thm
+                ON TRY_CONVERT(FLOAT, nt.NCD_mnl_sect) = thm.section
+            WHERE thm.hcpcs_code IN ({placeholders})
+        ) ranked
+        WHERE rn = 1
+        """
+        frames = self._read_sql_grouped(conn, query, list(hcpcs_codes), 'hcpcs_code')
+        return {key: self._ncd_data_from_frame(df) for key, df in frames.items()}
+
+    def _bulk_procedure_names(self, conn, hcpcs_codes):
+        """
+        Procedure name for each HCPCS code
+        
+        One hcpcs_master query, one NCD match query for the codes that still
+        need a name, then the generic pattern-based fallback.
+        """
+        names = {}
+        if not hcpcs_codes:
+            return names
+        
+        placeholders = ', '.join('?' * len(hcpcs_codes))
+        query = f"""
+        SELECT hcpcs_code, long_description, short_description
+        FROM (
+            SELECT hcpcs_code, long_description, short_description,
+                ROW_NUMBER() OVER (PARTITION BY hcpcs_code ORDER BY seqnum) AS rn
+            FROM [_ref].[dbo].[hcpcs_master]
+            WHERE hcpcs_code IN ({placeholders})
+        ) ranked
+        WHERE rn = 1
+        """
+        master_frames = self._read_sql_grouped(conn, query, list(hcpcs_codes), 'hcpcs_code')
+        
+        for code in hcpcs_codes:
+            df = master_frames.get(self._sql_key(code))
+            name = self._procedure_name_from_master(df) if df is not None else None
+            if name is not None:
+                names[code] = name
+        
+        remaining = [code for code in hcpcs_codes if code not in names]
+        if remaining:
+            placeholders = ', '.join('?' * len(remaining))
+            query = f"""
+            SELECT hcpcs_code, long_description
+            FROM (
+                SELECT thm.hcpcs_code, thm.long_description,
+                    ROW_NUMBER() OVER (PARTITION BY thm.hcpcs_code ORDER BY (SELECT NULL)) AS rn
+                FROM [_ncd].[dbo].[toc_hcpcs_matches] thm
+                INNER JOIN [_ncd].[dbo].[ncd_trkg] nt
+                    ON TRY_CONVERT(FLOAT, nt.NCD_mnl_sect) = thm.section
+                WHERE thm.hcpcs_code IN ({placeholders})
+            ) ranked
+            WHERE rn = 1
+            """
+            ncd_frames = self._read_sql_grouped(conn, query, remaining, 'hcpcs_code')
+            
+            for code in remaining:
+                df = ncd_frames.get(self._sql_key(code))
+                name = self._procedure_name_from_ncd(df) if df is not None else None
+                names[code] = name if name is not None else self._generic_procedure_name(code)
+        
+        return names
+
+    def _determine_lcd_coverage(self, conn, hcpcs_code, diagnosis_code):
+        """
+        Determine LCD coverage for diagnosis + procedure combination
+        
+        Numeric CPT codes are covered (absence from the surgical LCD crosswalk
+        doesn't mean not covered); HCPCS codes (A-Z prefix) are checked against
+        the diagnosis whitelist. Both are answered by the LCD coverage index.
+        
+        Args:
+            conn: Database connection (unused, coverage is answered in memory)
+            hcpcs_code: CPT/HCPCS procedure code
+            diagnosis_code: ICD-9 or ICD-10 diagnosis code
+            
+        Returns:
+            'Y' if covered, 'N' if not covered
+        """
+        return self.lcd_index.coverage(hcpcs_code, diagnosis_code)
 
     def _check_duplicate_procedures(self, hcpcs_code, all_procedures):
         """Check for duplicate procedure billing"""
@@ -890,19 +1676,13 @@ class NewClaimAnalyzer:
 
     def _check_global_period_bundling(self, hcpcs_code, all_procedures, claim_data):
         """Check for global period bundling issues"""
-        # Major surgical procedures that create global periods
-        major_surgery_codes = ['27130', '27447', '27132', '27446', '27134', '27445']  # Hip/knee replacements
-        
-        # Procedures typically bundled under global period
-        bundled_procedures = ['93000', '80053', '36415', '99284', '85018']  # ECG, labs, venipuncture, ED visit, CBC
-        
         is_bundled = False
         bundling_reason = None
         
         # Check if this is a bundled procedure and there's a major surgery
-        if hcpcs_code in bundled_procedures:
+        if hcpcs_code in GLOBAL_PERIOD_BUNDLED_CODES:
             for proc in all_procedures:
-                if proc in major_surgery_codes:
+                if proc in MAJOR_SURGERY_CODES:
                     is_bundled = True
                     bundling_reason = f"Procedure {hcpcs_code} may be bundled under global period of {proc}"
                     break
@@ -914,16 +1694,13 @@ class NewClaimAnalyzer:
 
     def _check_prior_authorization(self, hcpcs_code, claim_data):
         """Check for prior authorization requirements"""
-        # High-cost procedures requiring PA
-        pa_required_codes = ['27130', '27447', '27132', '27446', '27134', '27445', 'G0299']  # Major surgeries and expensive procedures
-        
         # Check if PA is present in claim data (this would need to be added to claim schema)
         pa_present = claim_data.get('prior_authorization', {}).get('approved', False)
         
         return {
-            'pa_required': hcpcs_code in pa_required_codes,
+            'pa_required': hcpcs_code in PRIOR_AUTH_REQUIRED_CODES,
             'pa_present': pa_present,
-            'message': f"Prior authorization required for {hcpcs_code}" if hcpcs_code in pa_required_codes and not pa_present else None
+            'message': f"Prior authorization required for {hcpcs_code}" if hcpcs_code in PRIOR_AUTH_REQUIRED_CODES and not pa_present else None
         }
 
     def _check_provider_credentialing(self, claim_data):
@@ -950,17 +1727,9 @@ class NewClaimAnalyzer:
 
     def _check_modifier_requirements(self, hcpcs_code, claim_data):
         """Check for required modifiers"""
-        # Procedures that typically require specific modifiers
-        modifier_requirements = {
-            '27130': ['50', '51'],  # Bilateral, multiple procedures
-            '27447': ['50', '51'],  # Bilateral, multiple procedures
-            '93000': ['26'],        # Professional component
-            '80053': ['26']         # Professional component
-        }
-        
         # Check if modifiers are present (this would need to be added to claim schema)
         modifiers = claim_data.get('modifiers', {}).get(hcpcs_code, [])
-        required_modifiers = modifier_requirements.get(hcpcs_code, [])
+        required_modifiers = MODIFIER_REQUIREMENTS.get(hcpcs_code, [])
         
         missing_modifiers = []
         for req_mod in required_modifiers:
@@ -976,15 +1745,7 @@ class NewClaimAnalyzer:
 
     def _check_frequency_limits(self, hcpcs_code, all_procedures, claim_data):
         """Check for frequency limits"""
-        # Frequency limits for common procedures
-        frequency_limits = {
-            '93000': 1,  # ECG - once per day
-            '80053': 1,  # Comprehensive metabolic panel - once per day
-            '36415': 4,  # Venipuncture - max 4 per day
-            '99284': 1   # ED visit - once per day
-        }
-        
-        limit = frequency_limits.get(hcpcs_code, None)
+        limit = FREQUENCY_LIMITS.get(hcpcs_code, None)
         if limit:
             count = all_procedures.count(hcpcs_code)
             frequency_exceeded = count > limit
@@ -1002,6 +1763,30 @@ class NewClaimAnalyzer:
             'message': None
         }
 
+    def _risk_analyses(self, pairs: List[Dict[str, Any]], claim_data: Dict[str, Any],
+                       all_procedures: List[str]) -> List[Dict[str, Any]]:
+        """Risk analysis for each DX-PROC pair, vectorized over the claim or one pair at a time"""
+        if not pairs:
+            return []
+        
+        if self.vectorized_rules:
+            # object columns keep None distinct from NaN (the two differ in Python truthiness)
+            risk = evaluate_claim_risk(claim_data, pd.DataFrame(pairs, dtype=object), all_procedures)
+            columns = {column: risk[column].tolist() for column in risk.columns}
+            return [dict(zip(columns, values)) for values in zip(*columns.values())]
+        
+        return [
+            self._calculate_risk_analysis(
+                pair['dx_position'], pair['icd9_dgns_code'], pair['mapped_icd10_code'],
+                pair['hcpcs_position'], pair['hcpcs_code'],
+                {'ptp_denial_reason': pair['ptp_denial_reason'], 'mue_threshold': pair['mue_threshold']},
+                {'ncd_status': pair['ncd_status']},
+                pair['lcd_icd10_covered_group'],
+                claim_data, all_procedures
+            )
+            for pair in pairs
+        ]
+
     def _calculate_risk_analysis(self, dx_pos, dx_code, mapped_icd10, hcpcs_pos, hcpcs_code, ncci_data, ncd_data, lcd_covered, claim_data, all_procedures):
         """Calculate risk analysis for diagnosis-procedure combination"""
         
@@ -1134,6 +1919,8 @@ class NewClaimAnalyzer:
 
     def _generate_summary(self, results):
         """Generate claim summary"""
+        if isinstance(results, pd.DataFrame):
+            return summary_from_frame(results)
         if not results:
             return {}
         
@@ -1146,49 +1933,16 @@ class NewClaimAnalyzer:
         avg_risk_score = sum(r['denial_risk_score'] for r in results) / len(results)
         
         # Count issues by category
-        critical_issues = sum(1 for r in results if r['risk_category'] == 'CRITICAL')
-        high_issues = sum(1 for r in results if r['risk_category'] == 'HIGH')
-        medium_issues = sum(1 for r in results if r['risk_category'] == 'MEDIUM')
-        low_issues = sum(1 for r in results if r['risk_category'] == 'LOW')
+        counts = {
+            'critical_issues': sum(1 for r in results if r['risk_category'] == 'CRITICAL'),
+            'high_issues': sum(1 for r in results if r['risk_category'] == 'HIGH'),
+            'medium_issues': sum(1 for r in results if r['risk_category'] == 'MEDIUM'),
+            'low_issues': sum(1 for r in results if r['risk_category'] == 'LOW')
+        }
         ok_combinations = sum(1 for r in results if r['denial_risk_level'] == 'OK')
         
-        # Determine decision and priority
-        if critical_issues > 0:
-            decision = 'DENY'
-            priority = 'CRITICAL'
-        elif high_issues > 0:
-            decision = 'REVIEW'
-            priority = 'HIGH'
-        elif medium_issues > 0:
-            decision = 'MONITOR'
-            priority = 'MEDIUM'
-        else:
-            decision = 'APPROVE'
-            priority = 'LOW'
-        
-        # Determine action required
-        if critical_issues > 0:
-            action_required = 'IMMEDIATE: Fix critical issues or claim will be denied'
-            business_impact = 'HIGH: Full denial risk due to critical issues'
-        elif high_issues > 0:
-            action_required = 'REVIEW: Address high-risk issues before submission'
-            business_impact = 'MEDIUM: Partial denial risk'
-        elif medium_issues > 0:
-            action_required = 'MONITOR: Review medium-risk issues'
-            business_impact = 'LOW: Minor issues to monitor'
-        else:
-            action_required = 'NO ACTION: Claim appears compliant'
-            business_impact = 'NO IMPACT: Claim should process normally'
-        
-        # Determine submission recommendation
-        if critical_issues > 0:
-            submission_recommendation = 'DO NOT SUBMIT - Fix critical issues first'
-        elif high_issues > 0:
-            submission_recommendation = 'REVIEW BEFORE SUBMISSION - Address high-risk issues'
-        elif medium_issues > 0:
-            submission_recommendation = 'SUBMIT WITH CAUTION - Monitor medium-risk issues'
-        else:
-            submission_recommendation = 'SUBMIT - Claim appears compliant'
+        # Decision, priority, action and submission recommendation
+        decision = summary_decision(counts)
         
         return {
             'CLM_ID': results[0]['CLM_ID'],
@@ -1201,20 +1955,20 @@ class NewClaimAnalyzer:
             'unique_diagnoses': unique_diagnoses,
             'max_risk_score': max_risk_score,
             'avg_risk_score': round(avg_risk_score, 1),
-            'decision': decision,
-            'priority': priority,
-            'critical_issues': critical_issues,
-            'high_issues': high_issues,
-            'medium_issues': medium_issues,
-            'low_issues': low_issues,
+            'decision': decision['decision'],
+            'priority': decision['priority'],
+            **counts,
             'ok_combinations': ok_combinations,
-            'action_required': action_required,
-            'business_impact': business_impact,
-            'submission_recommendation': submission_recommendation
+            'action_required': decision['action_required'],
+            'business_impact': decision['business_impact'],
+            'submission_recommendation': decision['submission_recommendation']
         }
 
     def _generate_actionable_fixes(self, results):
         """Generate actionable fixes"""
+        if isinstance(results, pd.DataFrame):
+            return actionable_fixes_from_frame(results)
+        
         fixes = []
         fix_id = 1
         
@@ -1223,30 +1977,8 @@ class NewClaimAnalyzer:
         
         for result in problematic_results:
             # Generate specific fix based on issue type
-            if 'Duplicate Procedure Billing' in result['denial_risk_level']:
-                fix = f"Remove duplicate procedure {result['hcpcs_code']} or verify multiple units are justified"
-            elif 'Global Period Bundling' in result['denial_risk_level']:
-                fix = f"Verify procedure {result['hcpcs_code']} is not bundled under surgical global period"
-            elif 'Prior Authorization Missing' in result['denial_risk_level']:
-                fix = f"Obtain prior authorization for procedure {result['hcpcs_code']} before billing"
-            elif 'Provider Credentialing Issue' in result['denial_risk_level']:
-                fix = f"Verify provider credentials and NPI/TIN are valid and active"
-            elif 'Required Modifier Missing' in result['denial_risk_level']:
-                fix = f"Add required modifiers for procedure {result['hcpcs_code']}"
-            elif 'Frequency Limit Exceeded' in result['denial_risk_level']:
-                fix = f"Reduce frequency of procedure {result['hcpcs_code']} to within allowed limits"
-            elif 'NCCI PTP Conflict' in result['denial_risk_level']:
-                fix = f"Remove conflicting procedure or verify they can be billed together"
-            elif 'Primary DX Not Covered' in result['denial_risk_level']:
-                fix = f"Replace primary diagnosis {result['icd9_dgns_code']} with a diagnosis that justifies procedure {result['hcpcs_code']}"
-            elif 'MUE Risk' in result['denial_risk_level']:
-                fix = f"Verify documentation supports units billed for procedure {result['hcpcs_code']}"
-            elif 'NCD Terminated' in result['denial_risk_level']:
-                fix = f"Check if NCD termination affects coverage for procedure {result['hcpcs_code']}"
-            elif 'Secondary DX Not Covered' in result['denial_risk_level']:
-                fix = f"Review secondary diagnosis {result['icd9_dgns_code']} for procedure {result['hcpcs_code']}"
-            else:
-                fix = result['action_required']
+            fix = fix_text(result['denial_risk_level'], result['hcpcs_code'], result['icd9_dgns_code'],
+                           result['action_required'])
             
             fixes.append({
                 'fix_id': fix_id,
@@ -1290,6 +2022,9 @@ class NewClaimAnalyzer:
                     modifiers.append(proc_modifiers)
         modifiers = list(set(modifiers))  # Remove duplicates
         
+        # MinHash signature of the claim's code set (code-set LSH search)
+        code_signature = code_set_signature(all_cpt_codes, all_icd_codes, modifiers)
+        
         # Calculate units for each procedure
         units = {}
         for _, code in hcpcs_codes:
@@ -1347,6 +2082,7 @@ class NewClaimAnalyzer:
             
             # Modifiers and billing
             "modifiers": modifiers,
+            "code_signature": code_signature,
             "provider_type": provider_type,
             "place_of_service": place_of_service,
             
@@ -1370,6 +2106,19 @@ class NewClaimAnalyzer:
             
             # Analysis metadata
             "analysis_timestamp": datetime.now().isoformat(),
+            **self._issue_totals(results)
+        }
+
+    def _issue_totals(self, results):
+        """Issue counts and max/avg risk score of a claim's combinations (rows or frame)"""
+        if isinstance(results, pd.DataFrame):
+            scores = results['denial_risk_score'].tolist()
+            return {
+                **issue_counts(results),
+                "max_risk_score": max(scores) if scores else 0,
+                "avg_risk_score": sum(scores) / len(scores) if scores else 0
+            }
+        return {
             "total_issues": len([r for r in results if r['denial_risk_level'] != 'OK']),
             "critical_issues": len([r for r in results if r['risk_category'] == 'CRITICAL']),
             "high_issues": len([r for r in results if r['risk_category'] == 'HIGH']),
@@ -1406,6 +2155,8 @@ class NewClaimAnalyzer:
 
     def _extract_risk_metadata(self, results):
         """Extract risk analysis metadata"""
+        if isinstance(results, pd.DataFrame):
+            return risk_metadata_from_frame(results)
         if not results:
             return {}
         
@@ -1419,51 +2170,23 @@ class NewClaimAnalyzer:
             "avg_risk_score": sum(risk_scores) / len(risk_scores),
             "high_risk_issues": len([r for r in results if 'HIGH' in r['denial_risk_level']]),
             "critical_issues": len([r for r in results if r['risk_category'] == 'CRITICAL']),
-            "duplicate_issues": len([r for r in results if 'Duplicate' in r['denial_risk_level']]),
-            "bundling_issues": len([r for r in results if 'Bundling' in r['denial_risk_level']]),
-            "pa_issues": len([r for r in results if 'Prior Authorization' in r['denial_risk_level']]),
-            "credentialing_issues": len([r for r in results if 'Credentialing' in r['denial_risk_level']]),
-            "modifier_issues": len([r for r in results if 'Modifier' in r['denial_risk_level']]),
-            "frequency_issues": len([r for r in results if 'Frequency' in r['denial_risk_level']])
+            **{key: len([level for level in risk_levels if marker in level]) for key, marker in RISK_METADATA_COUNT_RULES}
         }
 
     def _extract_issue_categories(self, results):
         """Extract issue categories from results"""
-        categories = {
-            "duplicate_billing": [],
-            "global_period_bundling": [],
-            "prior_authorization": [],
-            "provider_credentialing": [],
-            "modifier_requirements": [],
-            "frequency_limits": [],
-            "ncci_conflicts": [],
-            "coverage_issues": [],
-            "mue_risks": [],
-            "ncd_issues": []
-        }
+        if isinstance(results, pd.DataFrame):
+            return issue_categories_from_frame(results)
+        
+        categories = {category: [] for _, category in ISSUE_CATEGORY_RULES}
         
         for result in results:
             risk_level = result['denial_risk_level']
-            if 'Duplicate' in risk_level:
-                categories["duplicate_billing"].append(result['hcpcs_code'])
-            elif 'Bundling' in risk_level:
-                categories["global_period_bundling"].append(result['hcpcs_code'])
-            elif 'Prior Authorization' in risk_level:
-                categories["prior_authorization"].append(result['hcpcs_code'])
-            elif 'Credentialing' in risk_level:
-                categories["provider_credentialing"].append(result['hcpcs_code'])
-            elif 'Modifier' in risk_level:
-                categories["modifier_requirements"].append(result['hcpcs_code'])
-            elif 'Frequency' in risk_level:
-                categories["frequency_limits"].append(result['hcpcs_code'])
-            elif 'NCCI' in risk_level:
-                categories["ncci_conflicts"].append(result['hcpcs_code'])
-            elif 'Not Covered' in risk_level:
-                categories["coverage_issues"].append(result['hcpcs_code'])
-            elif 'MUE' in risk_level:
-                categories["mue_risks"].append(result['hcpcs_code'])
-            elif 'NCD' in risk_level:
-                categories["ncd_issues"].append(result['hcpcs_code'])
+            # First matching category only
+            for marker, category in ISSUE_CATEGORY_RULES:
+                if marker in risk_level:
+                    categories[category].append(result['hcpcs_code'])
+                    break
         
         # Remove duplicates
         for category in categories:
@@ -1573,41 +2296,20 @@ class NewClaimAnalyzer:
 
     def _extract_denial_indicators(self, results):
         """Extract denial risk indicators"""
-        indicators = {
-            "high_denial_risk": False,
-            "critical_issues_present": False,
-            "duplicate_billing_risk": False,
-            "bundling_risk": False,
-            "pa_required": False,
-            "credentialing_issues": False,
-            "modifier_issues": False,
-            "frequency_issues": False,
-            "coverage_issues": False,
-            "ncci_conflicts": False
-        }
+        if isinstance(results, pd.DataFrame):
+            return denial_indicators_from_frame(results)
+        
+        indicators = {name: False for name, _ in DENIAL_INDICATOR_RULES}
         
         for result in results:
             risk_level = result['denial_risk_level']
-            if 'HIGH' in risk_level or 'CRITICAL' in risk_level:
-                indicators["high_denial_risk"] = True
-            if result['risk_category'] == 'CRITICAL':
-                indicators["critical_issues_present"] = True
-            if 'Duplicate' in risk_level:
-                indicators["duplicate_billing_risk"] = True
-            if 'Bundling' in risk_level:
-                indicators["bundling_risk"] = True
-            if 'Prior Authorization' in risk_level:
-                indicators["pa_required"] = True
-            if 'Credentialing' in risk_level:
-                indicators["credentialing_issues"] = True
-            if 'Modifier' in risk_level:
-                indicators["modifier_issues"] = True
-            if 'Frequency' in risk_level:
-                indicators["frequency_issues"] = True
-            if 'Not Covered' in risk_level:
-                indicators["coverage_issues"] = True
-            if 'NCCI' in risk_level:
-                indicators["ncci_conflicts"] = True
+            for name, markers in DENIAL_INDICATOR_RULES:
+                if markers is None:
+                    matched = result['risk_category'] == 'CRITICAL'
+                else:
+                    matched = any(marker in risk_level for marker in markers)
+                if matched:
+                    indicators[name] = True
         
         return indicators
 
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Parallel Multi-Collection Policy Search
+The correctors search every claims__* policy collection for each issue, and
+each search used to be a strict-filter query_points call followed, when it
+found nothing, by a semantic fallback call - all sequential HTTP round trips.
+
+search_collections() sends one query_batch_points request per collection
+(carrying the strict query and its semantic fallback together) and runs the
+collections concurrently on a shared thread pool. Results of all collections
+come back merged and sorted by score. A collection whose search fails is
+reported and skipped, like the single-collection searches did.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence
+
+from qdrant_client import QdrantClient, models
+
+from resource_registry import get_resource
+
+POLICY_SEARCH_WORKERS = int(os.environ.get("POLICY_SEARCH_WORKERS", 8))
+
+
+def get_search_pool(max_workers: int = POLICY_SEARCH_WORKERS) -> ThreadPoolExecutor:
+    """Shared thread pool for policy searches (one per process)"""
+    # No teardown: a search in another session may still be submitting to it;
+    # its idle workers exit once the released pool is collected
+    return get_resource(
+        ("policy_search_pool", max_workers),
+        lambda: ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="policy-search")
+    )
+
+
+def _search_collection(client: QdrantClient, collection: str, query_vector: List[float], limit: int,
+                       query_filter: Optional[models.Filter], semantic_fallback: bool) -> List[Dict[str, Any]]:
+    requests = [
+        models.QueryRequest(query=query_vector, filter=query_filter, limit=limit,
+                            with_payload=True, with_vector=False)
+    ]
+    if query_filter is not None and semantic_fallback:
+        requests.append(models.QueryRequest(query=query_vector, limit=limit, with_payload=True, with_vector=False))
+
+    responses = client.query_batch_points(collection_name=collection, requests=requests)
+
+    # Strict matches win; the unfiltered results are only used when there are none
+    strict = query_filter is not None
+    points = responses[0].points
+    if not points and len(responses) > 1:
+        strict = False
+        points = responses[1].points
+    return [
+        {"collection": collection, "score": point.score, "vector_id": point.id,
+         "payload": point.payload or {}, "strict": strict}
+        for point in points
+    ]
+
+
+def search_collections(client: QdrantClient, collections: Sequence[str], query_vector: List[float],
+                       limit: int = 3, query_filter: Optional[models.Filter] = None,
+                       semantic_fallback: bool = True,
+                       max_workers: int = POLICY_SEARCH_WORKERS) -> List[Dict[str, Any]]:
+    """
+    Search several collections with one query vector, concurrently
+
+    Args:
+        client: QdrantClient (shared by the worker threads)
+        collections: Collections to search
+        query_vector: Query embedding
+        limit: Results per collection
+        query_filter: Optional strict filter
+        semantic_fallback: Without strict matches in a collection, use its unfiltered results
+        max_workers: Size of the shared search pool
+
+    Returns:
+        {"collection", "score", "vector_id", "payload", "strict"} of every
+        collection, highest score first
+    """
+    collections = list(dict.fromkeys(collections))
+    if not collections:
+        return []
+
+    def search(collection):
+        try:
+            return _search_collection(client, collection, query_vector, limit, query_filter, semantic_fallback)
+        except Exception as e:
+            print(f" Search failed for {collection}: {e}")
+            return []
+
+    if len(collections) == 1:
+        hits = search(collections[0])
+    else:
+        hits = []
+        for collection_hits in get_search_pool(max_workers).map(search, collections):
+            hits.extend(collection_hits)
+
+    # Stable sort: equal scores keep collection order
+    hits.sort(key=lambda hit: hit["score"], reverse=True)
+    return hits
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Batched Qdrant Writer
+Accumulates points and upserts them in chunks instead of one synchronous
+request per point. Chunks are sent with wait=False; barrier() sends the last
+chunk with wait=True, which makes every queued write durable and visible
+before returning.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Any, Dict
+
+DEFAULT_BATCH_SIZE = 256
+
+
+class QdrantBatchWriter:
+    """Buffers PointStructs for one collection and flushes them in batches"""
+
+    def __init__(self, client, collection_name: str, batch_size: int = DEFAULT_BATCH_SIZE,
+                 wait: bool = False, history_size: int = 100):
+        """
+        Args:
+            client: QdrantClient
+            collection_name: Target collection
+            batch_size: Points per upsert request
+            wait: Wait for each batch to be applied (False = fire and forget until barrier())
+            history_size: Number of recent batches kept for latency reporting
+        """
+        self.client = client
+        self.collection_name = collection_name
+        self.batch_size = max(1, int(batch_size))
+        self.wait = wait
+
+        self._buffer = []
+        self._lock = threading.RLock()
+
+        self.points_written = 0
+        self.points_failed = 0
+        self.batches_sent = 0
+        self.total_seconds = 0.0
+        self._history = deque(maxlen=history_size)
+
+    def add(self, point):
+        """
+        Queue a point, sending a batch once batch_size points are buffered
+
+        Without wait, a batch is only sent once a further point is queued, so
+        the buffer is never empty after a write and barrier() always has a
+        final batch to send with wait=True.
+        """
+        with self._lock:
+            self._buffer.append(point)
+            if len(self._buffer) >= self.batch_size + (0 if self.wait else 1):
+                self._send(self.wait)
+
+    def add_many(self, points):
+        """Queue several points"""
+        for point in points:
+            self.add(point)
+
+    def pending(self) -> int:
+        """Number of buffered (not yet sent) points"""
+        with self._lock:
+            return len(self._buffer)
+
+    def barrier(self) -> bool:
+        """
+        Send everything buffered and wait until all earlier writes are applied
+
+        Qdrant applies the operations on a collection in order, so sending
+        the final buffered batch with wait=True acts as a barrier for the
+        wait=False batches before it. Nothing is written twice.
+
+        Returns:
+            True if the final request succeeded (or nothing was buffered)
+        """
+        with self._lock:
+            while len(self._buffer) > self.batch_size:
+                self._send(self.wait)
+
+            if self._buffer:
+                return self._send(True)
+            return True
+
+    def _send(self, wait: bool) -> bool:
+        """Upsert the next chunk from the buffer and record its latency"""
+        batch = self._buffer[:self.batch_size]
+        del self._buffer[:self.batch_size]
+
+        start = time.perf_counter()
+        try:
+            self.client.upsert(collection_name=self.collection_name, wait=wait, points=batch)
+            ok = True
+        except Exception as e:
+            print(f"  ERROR: Qdrant batch upsert of {len(batch)} points failed: {e}")
+            ok = False
+        elapsed = time.perf_counter() - start
+
+        self.batches_sent += 1
+        self.total_seconds += elapsed
+        self._history.append({
+            "points": len(batch),
+            "wait": wait,
+            "seconds": round(elapsed, 4),
+            "success": ok
+        })
+
+        if ok:
+            self.points_written += len(batch)
+        else:
+            self.points_failed += len(batch)
+        return ok
+
+    def stats(self) -> Dict[str, Any]:
+        """Write counters and per-batch latency for the recent batches"""
+        with self._lock:
+            latencies = sorted(entry["seconds"] for entry in self._history)
+            return {
+                "collection": self.collection_name,
+                "batch_size": self.batch_size,
+                "wait": self.wait,
+                "points_written": self.points_written,
+                "points_failed": self.points_failed,
+                "points_pending": len(self._buffer),
+                "batches_sent": self.batches_sent,
+                "total_seconds": round(self.total_seconds, 4),
+                "avg_batch_seconds": round(self.total_seconds / self.batches_sent, 4) if self.batches_sent else 0.0,
+                "p50_batch_seconds": latencies[len(latencies) // 2] if latencies else 0.0,
+                "max_batch_seconds": latencies[-1] if latencies else 0.0,
+                "recent_batches": list(self._history)
+            }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.barrier()
+        return False
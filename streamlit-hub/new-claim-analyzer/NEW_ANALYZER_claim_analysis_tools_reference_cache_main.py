@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Process-wide Reference Data Cache
+Size-bounded LRU cache with TTL expiry and versioned invalidation for the
+HCPCS/ICD reference lookups shared by NewClaimAnalyzer and SQLDatabaseConnector
+"""
+
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+DEFAULT_MAX_ENTRIES = 200000
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+
+
+def current_reference_version(today: Optional[date] = None) -> str:
+    """
+    Current reference-data version
+
+    Uses REFERENCE_DATA_VERSION when set, otherwise the NCCI quarter
+    (NCCI edits, MUEs and HCPCS updates are released quarterly).
+    """
+    override = os.environ.get("REFERENCE_DATA_VERSION")
+    if override:
+        return override
+
+    today = today or date.today()
+    return f"NCCI-{today.year}Q{(today.month - 1) // 3 + 1}"
+
+
+class ReferenceDataCache:
+    """Thread-safe LRU cache for reference lookups, keyed by (namespace, key)"""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 version: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.version = version
+
+        self._entries = OrderedDict()  # (namespace, key) -> (expires_at, value)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self._namespace_stats = {}
+
+    def lookup(self, namespace: str, key: Hashable) -> Tuple[bool, Any]:
+        """
+        Look up a cached value
+
+        Returns:
+            (hit, value) - value is a copy so callers can mutate it freely
+        """
+        entry_key = (namespace, key)
+        now = time.monotonic()
+
+        with self._lock:
+            counters = self._namespace_stats.setdefault(namespace, {"hits": 0, "misses": 0})
+            entry = self._entries.get(entry_key)
+
+            if entry is not None and entry[0] < now:
+                del self._entries[entry_key]
+                self.expirations += 1
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                counters["misses"] += 1
+                return False, None
+
+            self._entries.move_to_end(entry_key)
+            self.hits += 1
+            counters["hits"] += 1
+            value = entry[1]
+
+        if isinstance(value, (dict, list, set, tuple)):
+            value = copy.deepcopy(value)
+        return True, value
+
+    def store(self, namespace: str, key: Hashable, value: Any):
+        """Store a value, evicting the least recently used entries when full"""
+        if isinstance(value, (dict, list, set, tuple)):
+            value = copy.deepcopy(value)
+
+        with self._lock:
+            self._entries[(namespace, key)] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end((namespace, key))
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def set_version(self, version: str) -> bool:
+        """
+        Record the current reference-data version
+
+        Returns:
+            True if the version changed and the cache was invalidated
+        """
+        with self._lock:
+            if version == self.version:
+                return False
+
+            previous = self.version
+            self.version = version
+            if previous is None:
+                return False
+
+        print(f"Reference data version changed ({previous} -> {version}), invalidating cache")
+        self.invalidate()
+        return True
+
+    def invalidate(self, namespace: Optional[str] = None):
+        """Drop every entry, or only the entries of one namespace"""
+        with self._lock:
+            if namespace is None:
+                self._entries.clear()
+            else:
+                for entry_key in [k for k in self._entries if k[0] == namespace]:
+                    del self._entries[entry_key]
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and occupancy"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "version": self.version,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "namespaces": copy.deepcopy(self._namespace_stats)
+            }
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_reference_cache() -> ReferenceDataCache:
+    """Get the process-wide reference cache (sized from REFERENCE_CACHE_MAX_ENTRIES / REFERENCE_CACHE_TTL_SECONDS)"""
+    global _shared_cache
+
+    if _shared_cache is None:
+        with _shared_cache_lock:
+            if _shared_cache is None:
+                _shared_cache = ReferenceDataCache(
+                    max_entries=int(os.environ.get("REFERENCE_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+                    ttl_seconds=float(os.environ.get("REFERENCE_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS)),
+                    version=current_reference_version()
+                )
+    return _shared_cache
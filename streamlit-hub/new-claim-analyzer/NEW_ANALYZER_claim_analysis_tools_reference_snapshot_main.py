@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Local Reference Data Snapshot
+Exports the SQL Server reference views read by NewClaimAnalyzer and
+SQLDatabaseConnector into an indexed, read-only SQLite file, and serves the
+existing T-SQL lookups from it (no ODBC driver or SQL Server needed)
+
+Build:   python reference_snapshot.py build [--output reference_snapshot.sqlite]
+Inspect: python reference_snapshot.py info  [--output reference_snapshot.sqlite]
+"""
+
+import argparse
+import os
+import re
+import sqlite3
+from datetime import date, datetime, time as dt_time
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+DEFAULT_SNAPSHOT_PATH = os.environ.get(
+    "REFERENCE_SNAPSHOT_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "reference_snapshot.sqlite")
+)
+
+DEFAULT_CONNECTION_STRING = (
+    "Driver={ODBC Driver 18 for SQL Server};"
+    "Server=localhost,1433;"
+    "UID=SA;"
+    "PWD=Bbanwo@1980!;"
+    "Database=_reporting;"
+    "Encrypt=yes;"
+    "TrustServerCertificate=yes;"
+    "Connection Timeout=30;"
+)
+
+# (database, table/view, indexes) - every reference source the analyzers query
+SNAPSHOT_TABLES = [
+    ("_gems", "vw_icd9_to_icd10_master", [("icd10_code", "mapping_type"), ("icd9_code", "mapping_type")]),
+    ("_gems", "vw_icd9_to_icd10_cm_mapping", [("icd9_code",)]),
+    ("_gems", "icd10cm_codes_2018_fixed", [("icd10_code",)]),
+    ("_gems", "table_2018_I9gem_fixed", [("icd9_code",), ("icd10_code",)]),
+    ("_ncci_", "vw_NCCI_Daily_Denial_Alerts", [("procedure_code",)]),
+    ("_ref", "hcpcs_master", [("hcpcs_code", "seqnum")]),
+    ("_ncd", "ncd_trkg", [("NCD_lab",), ("NCD_mnl_sect",)]),
+    ("_ncd", "toc_hcpcs_matches", [("hcpcs_code",), ("section",)]),
+    ("_article_", "vw_Surgical_LCD_Crosswalk", [("cpt_hcpcs_code", "icd10_code", "coverage_status")]),
+]
+
+EXPORT_BATCH_SIZE = 10000
+
+
+def snapshot_table_name(database: str, table: str) -> str:
+    """Local table name for [database].[dbo].[table]"""
+    return f"{database}__{table}"
+
+
+# -------------------------------------------------------------------------
+# T-SQL -> SQLite translation (covers the constructs the reference queries use)
+# -------------------------------------------------------------------------
+
+_THREE_PART_NAME = re.compile(r"\[(\w+)\]\.\[dbo\]\.\[(\w+)\]", re.IGNORECASE)
+_TOP_CLAUSE = re.compile(r"\bSELECT\s+(DISTINCT\s+)?TOP\s+\(?(\d+)\)?\s+", re.IGNORECASE)
+_TRY_CONVERT_FLOAT = re.compile(r"\bTRY_CONVERT\s*\(\s*FLOAT\s*,", re.IGNORECASE)
+
+
+@lru_cache(maxsize=512)
+def translate_tsql(query: str) -> str:
+    """
+    Rewrite a reference-lookup T-SQL query for the SQLite snapshot
+
+    - [db].[dbo].[table] -> db__table
+    - SELECT TOP n ...   -> SELECT ... LIMIT n (outermost SELECT only)
+    - TRY_CONVERT(FLOAT, x) -> try_convert_float(x)
+    """
+    query = _THREE_PART_NAME.sub(lambda m: snapshot_table_name(m.group(1), m.group(2)), query)
+    query = _TRY_CONVERT_FLOAT.sub("try_convert_float(", query)
+
+    tops = _TOP_CLAUSE.findall(query)
+    if len(tops) == 1:
+        limit = tops[0][1]
+        query = _TOP_CLAUSE.sub(lambda m: "SELECT " + (m.group(1) or ""), query)
+        query = query.rstrip().rstrip(";") + f"\nLIMIT {limit}"
+    elif len(tops) > 1:
+        raise ValueError("Snapshot backend supports a single TOP clause per query")
+
+    return query
+
+
+def _try_convert_float(value):
+    """SQL Server TRY_CONVERT(FLOAT, x): NULL instead of an error for non-numeric input"""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class SnapshotCursor(sqlite3.Cursor):
+    """Cursor that accepts the analyzers' T-SQL"""
+
+    def execute(self, query, params=()):
+        return super().execute(translate_tsql(query), params)
+
+
+class SnapshotConnection(sqlite3.Connection):
+    """Read-only snapshot connection, drop-in for the pyodbc connection in pd.read_sql and cursor() calls"""
+
+    def cursor(self, factory=SnapshotCursor):
+        return super().cursor(factory)
+
+    def execute(self, query, params=()):
+        return self.cursor().execute(query, params)
+
+
+# -------------------------------------------------------------------------
+# Snapshot reader
+# -------------------------------------------------------------------------
+
+class ReferenceSnapshot:
+    """Opens read-only connections to a built reference snapshot"""
+
+    def __init__(self, path: Optional[str] = None, mmap_size: int = 256 * 1024 * 1024):
+        self.path = path or DEFAULT_SNAPSHOT_PATH
+        self.mmap_size = mmap_size
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def connect(self) -> SnapshotConnection:
+        """Open a read-only, memory-mapped connection to the snapshot"""
+        if not self.exists():
+            raise FileNotFoundError(
+                f"Reference snapshot not found: {self.path} (build it with: python reference_snapshot.py build)"
+            )
+
+        conn = sqlite3.connect(
+            f"file:{self.path}?mode=ro", uri=True,
+            factory=SnapshotConnection, check_same_thread=False
+        )
+        conn.create_function("try_convert_float", 1, _try_convert_float, deterministic=True)
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    def info(self) -> List[Dict[str, Any]]:
+        """Per-table row counts and build metadata"""
+        conn = self.connect()
+        try:
+            cursor = conn.execute(
+                "SELECT source_name, table_name, row_count, built_at, reference_version FROM snapshot_meta ORDER BY source_name"
+            )
+            columns = [col[0] for col in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        finally:
+            conn.close()
+
+
+_snapshots = {}
+
+
+def get_reference_snapshot(path: Optional[str] = None) -> ReferenceSnapshot:
+    """Shared ReferenceSnapshot per path"""
+    path = path or DEFAULT_SNAPSHOT_PATH
+    if path not in _snapshots:
+        _snapshots[path] = ReferenceSnapshot(path)
+    return _snapshots[path]
+
+
+# -------------------------------------------------------------------------
+# Snapshot builder
+# -------------------------------------------------------------------------
+
+def _sqlite_column_type(type_code) -> str:
+    """SQLite column declaration for a pyodbc cursor.description type"""
+    if type_code in (int, bool):
+        return "INTEGER"
+    if type_code in (float, Decimal):
+        return "REAL"
+    if type_code in (bytes, bytearray):
+        return "BLOB"
+    # Text compares case-insensitively, as under the SQL Server default collation
+    return "TEXT COLLATE NOCASE"
+
+
+def _sqlite_value(value):
+    """Convert a pyodbc value to a type SQLite stores natively"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date, dt_time)):
+        return value.isoformat()
+    return value
+
+
+def build_snapshot(output_path: Optional[str] = None, connection_string: Optional[str] = None,
+                   tables=None, reference_version: Optional[str] = None) -> Dict[str, int]:
+    """
+    Export the reference views from SQL Server into an indexed SQLite snapshot
+
+    The snapshot is written next to the target and moved into place only once
+    complete, so readers never see a partial file.
+
+    Returns:
+        Dictionary of source view -> exported row count
+    """
+    import pyodbc
+    from reference_cache import current_reference_version
+
+    output_path = output_path or DEFAULT_SNAPSHOT_PATH
+    tables = tables or SNAPSHOT_TABLES
+    reference_version = reference_version or current_reference_version()
+    tmp_path = output_path + ".building"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    source = pyodbc.connect(connection_string or DEFAULT_CONNECTION_STRING)
+    target = sqlite3.connect(tmp_path)
+    counts = {}
+
+    try:
+        target.execute("PRAGMA journal_mode = OFF")
+        target.execute("PRAGMA synchronous = OFF")
+        target.execute("""
+            CREATE TABLE snapshot_meta (
+                source_name TEXT PRIMARY KEY,
+                table_name TEXT,
+                row_count INTEGER,
+                built_at TEXT,
+                reference_version TEXT
+            )
+        """)
+
+        for database, table, indexes in tables:
+            source_name = f"[{database}].[dbo].[{table}]"
+            local_name = snapshot_table_name(database, table)
+            print(f"Exporting {source_name} -> {local_name}")
+
+            cursor = source.cursor()
+            cursor.execute(f"SELECT * FROM {source_name}")
+            columns = [(col[0], _sqlite_column_type(col[1])) for col in cursor.description]
+
+            column_sql = ", ".join(f'"{name}" {col_type}' for name, col_type in columns)
+            target.execute(f'CREATE TABLE "{local_name}" ({column_sql})')
+            insert_sql = f'INSERT INTO "{local_name}" VALUES ({", ".join("?" * len(columns))})'
+
+            row_count = 0
+            while True:
+                rows = cursor.fetchmany(EXPORT_BATCH_SIZE)
+                if not rows:
+                    break
+                target.executemany(insert_sql, [tuple(_sqlite_value(v) for v in row) for row in rows])
+                row_count += len(rows)
+            cursor.close()
+
+            column_names = {name for name, _ in columns}
+            for index_columns in indexes:
+                if not set(index_columns) <= column_names:
+                    print(f"Warning: Skipping index {index_columns} on {local_name} (column missing)")
+                    continue
+                index_name = f"ix_{local_name}_{'_'.join(index_columns)}"
+                target.execute(
+                    f'CREATE INDEX "{index_name}" ON "{local_name}" ({", ".join(chr(34) + c + chr(34) for c in index_columns)})'
+                )
+
+            target.execute(
+                "INSERT INTO snapshot_meta VALUES (?, ?, ?, ?, ?)",
+                (source_name, local_name, row_count, datetime.now().isoformat(), reference_version)
+            )
+            target.commit()
+            counts[source_name] = row_count
+            print(f"   {row_count} rows")
+
+        target.execute("ANALYZE")
+        target.commit()
+    except Exception:
+        target.close()
+        os.remove(tmp_path)
+        raise
+    finally:
+        source.close()
+
+    target.close()
+    os.replace(tmp_path, output_path)
+    print(f"Reference snapshot written to {output_path}")
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or inspect the local reference data snapshot")
+    parser.add_argument("command", choices=["build", "info"])
+    parser.add_argument("--output", default=DEFAULT_SNAPSHOT_PATH, help="Snapshot file path")
+    parser.add_argument("--connection-string", default=None, help="SQL Server ODBC connection string")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        build_snapshot(args.output, args.connection_string)
+    else:
+        for entry in ReferenceSnapshot(args.output).info():
+            print(f"{entry['source_name']:<50} {entry['row_count']:>10} rows  "
+                  f"(built {entry['built_at']}, {entry['reference_version']})")
@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+Bulk Write-Back to _reporting
+Loads NewClaimAnalyzer per-combination results (detailed_issues rows) into
+[_reporting].[dbo].[claim_combination_risk_results] so the SQL dashboards see
+Python-side analyses. Rows are buffered per claim and written in large
+batches: each batch is bulk-inserted into a session temp table with
+fast_executemany (array parameter binding, not one round trip per row) and
+then merged into the results table in a single transaction. A batch either
+lands completely or not at all.
+
+A claim's rows are replaced as a whole: combinations that no longer exist in
+a re-analysis are deleted, and a re-analysis that succeeds without combinations
+deletes all of the claim's rows, so the table always holds the latest
+analysis of each claim. The written claim IDs are staged in their own temp
+table, so claims without rows are covered too. Failed analyses are skipped
+and leave the claim's last good rows in place. ClaimAnalysisApp reads this
+table when CLAIM_RESULTS_SOURCE points at it.
+
+Run:  python reporting_writer.py results.jsonl [--batch-rows N]   (batch_analyzer.py --output file)
+"""
+
+import argparse
+import json
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+import pyodbc
+
+from sql_connection_pool import pooled_connect
+
+REPORTING_CONNECTION_STRING = (
+    "Driver={ODBC Driver 18 for SQL Server};"
+    "Server=localhost,1433;Database=_reporting;"
+    "UID=SA;PWD=Bbanwo@1980!;"
+    "Encrypt=yes;TrustServerCertificate=yes;Connection Timeout=30;"
+)
+RESULTS_TABLE = "[dbo].[claim_combination_risk_results]"
+STAGING_TABLE = "#claim_combination_risk_stage"
+CLAIMS_STAGING_TABLE = "#claim_combination_risk_claims"
+KEY_COLUMNS = ["CLM_ID", "dx_position", "hcpcs_position"]
+DEFAULT_BATCH_ROWS = 20000
+DEFAULT_INSERT_CHUNK_ROWS = 5000
+
+# (column, SQL type, pyodbc type, size, scale) in detailed_issues order;
+# bounded NVARCHAR lengths keep fast_executemany's parameter arrays small, and
+# DATETIME2 binds at its full precision (27, 7) so microseconds fit
+RESULT_COLUMN_SPECS = [
+    ("CLM_ID", "NVARCHAR(50) NOT NULL", pyodbc.SQL_WVARCHAR, 50, 0),
+    ("DESYNPUF_ID", "NVARCHAR(50)", pyodbc.SQL_WVARCHAR, 50, 0),
+    ("clm_from_dt", "DATE", pyodbc.SQL_TYPE_DATE, 0, 0),
+    ("clm_thru_dt", "DATE", pyodbc.SQL_TYPE_DATE, 0, 0),
+    ("PRVDR_NUM", "NVARCHAR(50)", pyodbc.SQL_WVARCHAR, 50, 0),
+    ("dx_position", "INT NOT NULL", pyodbc.SQL_INTEGER, 0, 0),
+    ("icd9_dgns_code", "NVARCHAR(20)", pyodbc.SQL_WVARCHAR, 20, 0),
+    ("mapped_icd10_code", "NVARCHAR(20)", pyodbc.SQL_WVARCHAR, 20, 0),
+    ("diagnosis_name", "NVARCHAR(500)", pyodbc.SQL_WVARCHAR, 500, 0),
+    ("hcpcs_position", "INT NOT NULL", pyodbc.SQL_INTEGER, 0, 0),
+    ("hcpcs_code", "NVARCHAR(20)", pyodbc.SQL_WVARCHAR, 20, 0),
+    ("procedure_name", "NVARCHAR(500)", pyodbc.SQL_WVARCHAR, 500, 0),
+    ("ncd_id", "NVARCHAR(50)", pyodbc.SQL_WVARCHAR, 50, 0),
+    ("ncd_title", "NVARCHAR(500)", pyodbc.SQL_WVARCHAR, 500, 0),
+    ("ncd_status", "NVARCHAR(50)", pyodbc.SQL_WVARCHAR, 50, 0),
+    ("lcd_icd10_covered_group", "NVARCHAR(50)", pyodbc.SQL_WVARCHAR, 50, 0),
+    ("ptp_denial_reason", "NVARCHAR(500)", pyodbc.SQL_WVARCHAR, 500, 0),
+    ("mue_threshold", "NVARCHAR(50)", pyodbc.SQL_WVARCHAR, 50, 0),
+    ("mue_denial_type", "NVARCHAR(200)", pyodbc.SQL_WVARCHAR, 200, 0),
+    ("denial_risk_level", "NVARCHAR(200)", pyodbc.SQL_WVARCHAR, 200, 0),
+    ("denial_risk_score", "FLOAT", pyodbc.SQL_DOUBLE, 0, 0),
+    ("risk_category", "NVARCHAR(20)", pyodbc.SQL_WVARCHAR, 20, 0),
+    ("action_required", "NVARCHAR(500)", pyodbc.SQL_WVARCHAR, 500, 0),
+    ("business_impact", "NVARCHAR(500)", pyodbc.SQL_WVARCHAR, 500, 0),
+    ("analysis_timestamp", "DATETIME2", pyodbc.SQL_TYPE_TIMESTAMP, 27, 7),
+    ("content_hash", "NVARCHAR(64)", pyodbc.SQL_WVARCHAR, 64, 0),
+]
+RESULT_COLUMNS = [spec[0] for spec in RESULT_COLUMN_SPECS]
+CLAIM_ID_SIZE = RESULT_COLUMN_SPECS[0][3]
+
+
+def _column_ddl(nullable_keys: bool = False) -> str:
+    definitions = []
+    for name, sql_type, _, _, _ in RESULT_COLUMN_SPECS:
+        if nullable_keys:
+            sql_type = sql_type.replace(" NOT NULL", "")
+        definitions.append(f"[{name}] {sql_type}")
+    return ",\n    ".join(definitions)
+
+
+CREATE_RESULTS_TABLE_SQL = f"""
+IF OBJECT_ID('{RESULTS_TABLE}', 'U') IS NULL
+BEGIN
+    CREATE TABLE {RESULTS_TABLE} (
+    {_column_ddl()},
+    [loaded_at] DATETIME2 NOT NULL CONSTRAINT [DF_claim_combination_risk_results_loaded_at] DEFAULT SYSUTCDATETIME(),
+    CONSTRAINT [PK_claim_combination_risk_results] PRIMARY KEY CLUSTERED ([CLM_ID], [dx_position], [hcpcs_position])
+    );
+END
+"""
+
+CREATE_STAGING_TABLE_SQL = f"""
+IF OBJECT_ID('tempdb..{STAGING_TABLE}') IS NOT NULL DROP TABLE {STAGING_TABLE};
+CREATE TABLE {STAGING_TABLE} (
+    {_column_ddl(nullable_keys=True)}
+);
+"""
+
+CREATE_CLAIMS_STAGING_TABLE_SQL = f"""
+IF OBJECT_ID('tempdb..{CLAIMS_STAGING_TABLE}') IS NOT NULL DROP TABLE {CLAIMS_STAGING_TABLE};
+CREATE TABLE {CLAIMS_STAGING_TABLE} (
+    [CLM_ID] NVARCHAR({CLAIM_ID_SIZE}) NOT NULL PRIMARY KEY
+);
+"""
+
+INSERT_CLAIMS_STAGING_SQL = f"INSERT INTO {CLAIMS_STAGING_TABLE} ([CLM_ID]) VALUES (?)"
+
+INSERT_STAGING_SQL = (
+    f"INSERT INTO {STAGING_TABLE} ({', '.join(f'[{c}]' for c in RESULT_COLUMNS)}) "
+    f"VALUES ({', '.join('?' for _ in RESULT_COLUMNS)})"
+)
+
+_KEY_MATCH = " AND ".join(f"t.[{c}] = s.[{c}]" for c in KEY_COLUMNS)
+
+# Combinations of the written claims that are not in the new analysis (all of
+# them for a claim whose new analysis has no rows)
+DELETE_STALE_SQL = f"""
+DELETE t FROM {RESULTS_TABLE} AS t
+WHERE EXISTS (SELECT 1 FROM {CLAIMS_STAGING_TABLE} AS c WHERE c.[CLM_ID] = t.[CLM_ID])
+  AND NOT EXISTS (SELECT 1 FROM {STAGING_TABLE} AS s WHERE {_KEY_MATCH});
+"""
+
+MERGE_SQL = f"""
+MERGE {RESULTS_TABLE} WITH (HOLDLOCK) AS t
+USING {STAGING_TABLE} AS s
+    ON {_KEY_MATCH}
+WHEN MATCHED THEN UPDATE SET
+    {', '.join(f't.[{c}] = s.[{c}]' for c in RESULT_COLUMNS if c not in KEY_COLUMNS)},
+    t.[loaded_at] = SYSUTCDATETIME()
+WHEN NOT MATCHED BY TARGET THEN
+    INSERT ({', '.join(f'[{c}]' for c in RESULT_COLUMNS)})
+    VALUES ({', '.join(f's.[{c}]' for c in RESULT_COLUMNS)});
+"""
+
+# -------------------------------------------------------------------------
+# Row conversion
+# -------------------------------------------------------------------------
+
+def _to_date(value):
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = str(value).strip()
+    for fmt in ("%Y%m%d", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(text[:10] if "-" in text else text[:8], fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _to_timestamp(value):
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+
+def _sql_value(value, sql_type: int, size: int):
+    """Value in the Python type fast_executemany binds for the column (one type per column)"""
+    if hasattr(value, "item") and not isinstance(value, (str, bytes)):
+        value = value.item()  # numpy scalar
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    if sql_type == pyodbc.SQL_WVARCHAR:
+        return str(value)[:size]
+    if sql_type == pyodbc.SQL_INTEGER:
+        return int(value)
+    if sql_type == pyodbc.SQL_DOUBLE:
+        return float(value)
+    if sql_type == pyodbc.SQL_TYPE_DATE:
+        return _to_date(value)
+    return _to_timestamp(value)
+
+
+def result_row_params(row: Dict[str, Any]) -> tuple:
+    """Parameter tuple of one detailed_issues row in RESULT_COLUMNS order"""
+    return tuple(_sql_value(row.get(name), sql_type, size) for name, _, sql_type, size, _ in RESULT_COLUMN_SPECS)
+
+
+def _buffered_rows(rows: List[Dict[str, Any]]) -> int:
+    # A claim without rows still counts, so cleared claims are flushed too
+    return max(1, len(rows))
+
+# -------------------------------------------------------------------------
+# Writer
+# -------------------------------------------------------------------------
+
+class ReportingWriter:
+    """Buffers analyzed claims and bulk-merges them into the _reporting results table"""
+
+    def __init__(self, connection_string: str = REPORTING_CONNECTION_STRING,
+                 batch_rows: int = DEFAULT_BATCH_ROWS, insert_chunk_rows: int = DEFAULT_INSERT_CHUNK_ROWS):
+        """
+        Args:
+            connection_string: ODBC connection string of the _reporting database
+            batch_rows: Buffered rows that trigger a staged merge
+            insert_chunk_rows: Rows per fast_executemany call into the staging table
+        """
+        self.connection_string = connection_string
+        self.batch_rows = max(1, batch_rows)
+        self.insert_chunk_rows = max(1, insert_chunk_rows)
+        self._claims = OrderedDict()  # CLM_ID -> rows of its latest analysis (empty: delete its rows)
+        self._buffered = 0
+        self._table_ready = False
+
+        self.claims_written = 0
+        self.claims_cleared = 0
+        self.claims_rejected = 0
+        self.errors_skipped = 0
+        self.rows_written = 0
+        self.batches_written = 0
+        self.seconds = 0.0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+
+    def add_result(self, result: Dict[str, Any], claim_id: Optional[str] = None):
+        """
+        Queue one analyze_new_claim result
+
+        A successful result without detailed_issues queues the claim with no
+        rows, so its earlier rows are deleted; claim_id identifies the claim
+        when the result does not. Error results are skipped, so a transient
+        failure never erases the claim's last good rows.
+        """
+        if not result:
+            return
+        if "error" in result:
+            self.errors_skipped += 1
+            print(f"  Reporting write-back: skipped failed analysis of claim {claim_id}: {result['error']}")
+            return
+        rows = result.get("detailed_issues") or []
+        if rows:
+            self.add_rows(rows)
+            return
+        claim_id = (claim_id
+                    or (result.get("claim_summary") or {}).get("CLM_ID")
+                    or (result.get("metadata") or {}).get("claim_id"))
+        if claim_id is not None:
+            self._queue(str(claim_id), [])
+
+    def add_rows(self, rows: Iterable[Dict[str, Any]]):
+        """Queue detailed_issues rows; a claim queued again replaces its earlier rows"""
+        by_claim = OrderedDict()
+        for row in rows:
+            by_claim.setdefault(str(row.get("CLM_ID")), []).append(row)
+        for claim_id, claim_rows in by_claim.items():
+            self._queue(claim_id, claim_rows)
+
+    def _queue(self, claim_id: str, rows: List[Dict[str, Any]]):
+        if len(claim_id) > CLAIM_ID_SIZE:
+            # Truncating would merge (and clear) the rows of a different claim
+            self.claims_rejected += 1
+            print(f"  Reporting write-back: skipped claim {claim_id!r}, "
+                  f"ID longer than {CLAIM_ID_SIZE} characters")
+            return
+        previous = self._claims.pop(claim_id, None)
+        if previous is not None:
+            self._buffered -= _buffered_rows(previous)
+        self._claims[claim_id] = rows
+        self._buffered += _buffered_rows(rows)
+        if self._buffered >= self.batch_rows:
+            self.flush()
+
+    def flush(self) -> int:
+        """Stage and merge all queued rows in one transaction; returns the rows written"""
+        if not self._claims:
+            return 0
+        claims, self._claims, self._buffered = self._claims, OrderedDict(), 0
+        params = [result_row_params(row) for rows in claims.values() for row in rows]
+
+        start = time.perf_counter()
+        conn = pooled_connect(self.connection_string)
+        try:
+            cursor = conn.cursor()
+            if not self._table_ready:
+                cursor.execute(CREATE_RESULTS_TABLE_SQL)
+                conn.commit()
+                self._table_ready = True
+
+            cursor.execute(CREATE_STAGING_TABLE_SQL)
+            cursor.execute(CREATE_CLAIMS_STAGING_TABLE_SQL)
+            cursor.fast_executemany = True
+            claim_params = [(claim_id,) for claim_id in claims]
+            cursor.setinputsizes([(pyodbc.SQL_WVARCHAR, CLAIM_ID_SIZE, 0)])
+            for chunk_start in range(0, len(claim_params), self.insert_chunk_rows):
+                cursor.executemany(INSERT_CLAIMS_STAGING_SQL,
+                                   claim_params[chunk_start:chunk_start + self.insert_chunk_rows])
+            cursor.setinputsizes([(sql_type, size, scale) for _, _, sql_type, size, scale in RESULT_COLUMN_SPECS])
+            for chunk_start in range(0, len(params), self.insert_chunk_rows):
+                cursor.executemany(INSERT_STAGING_SQL, params[chunk_start:chunk_start + self.insert_chunk_rows])
+
+            cursor.execute(DELETE_STALE_SQL)
+            cursor.execute(MERGE_SQL)
+            cursor.execute(f"DROP TABLE {STAGING_TABLE}")
+            cursor.execute(f"DROP TABLE {CLAIMS_STAGING_TABLE}")
+            conn.commit()
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            # Re-queue so a retried flush (or close) does not lose the batch
+            for claim_id, rows in claims.items():
+                if claim_id not in self._claims:
+                    self._claims[claim_id] = rows
+                    self._buffered += _buffered_rows(rows)
+            raise
+        finally:
+            conn.close()
+
+        self.seconds += time.perf_counter() - start
+        self.claims_written += len(claims)
+        self.rows_written += len(params)
+        self.batches_written += 1
+        cleared = sum(1 for rows in claims.values() if not rows)
+        self.claims_cleared += cleared
+        print(f"  Reporting write-back: merged {len(params)} rows for {len(claims)} claims "
+              f"({cleared} without rows) in {time.perf_counter() - start:.2f}s")
+        return len(params)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "claims_written": self.claims_written,
+            "claims_cleared": self.claims_cleared,
+            "claims_rejected": self.claims_rejected,
+            "errors_skipped": self.errors_skipped,
+            "rows_written": self.rows_written,
+            "batches_written": self.batches_written,
+            "rows_buffered": self._buffered,
+            "rows_per_second": round(self.rows_written / self.seconds, 1) if self.seconds else 0.0
+        }
+
+
+def write_results(results: Iterable[Dict[str, Any]], batch_rows: int = DEFAULT_BATCH_ROWS,
+                  connection_string: str = REPORTING_CONNECTION_STRING) -> Dict[str, Any]:
+    """Write many analyze_new_claim results (or batch_analyzer {"claim_id", "result"} items) back to _reporting"""
+    writer = ReportingWriter(connection_string, batch_rows=batch_rows)
+    for result in results:
+        if "result" in result:
+            writer.add_result(result["result"], result.get("claim_id"))
+        else:
+            writer.add_result(result)
+    writer.flush()
+    return writer.stats()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load batch_analyzer --output results into _reporting")
+    parser.add_argument("results", help="JSONL file written by batch_analyzer.py --output")
+    parser.add_argument("--batch-rows", type=int, default=DEFAULT_BATCH_ROWS)
+    args = parser.parse_args()
+
+    def iter_results(path: str):
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    print(json.dumps(write_results(iter_results(args.results), args.batch_rows), indent=2))
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Process-Wide Resource Registry
+Heavy resources (the nomic-embed SentenceTransformer, QdrantClients and their
+collection listings, the correctors' SQL connectors) are created lazily, once
+per process, and shared by NewClaimAnalyzer, every claim corrector and the
+Streamlit apps instead of being rebuilt on every construction / button press.
+
+Each resource is built under its own lock, so concurrent Streamlit sessions
+asking for the same resource wait for one build and a slow model load does
+not block a Qdrant client lookup. warm_up() builds the defaults up front,
+teardown() drops everything from the registry and memory_report() lists
+what is loaded and how much memory it takes.
+
+Released resources may still be held by other Streamlit sessions' correctors
+and analyzers, so a teardown callback only releases what those holders can
+do without (SQL connectors close their pool's connections, which reopen on
+the next checkout; result sinks publish their rows). Qdrant clients and models are not closed: they are freed when their
+last holder drops them, and the CUDA cache is emptied.
+
+Resources are per process: a forked batch worker builds its own.
+"""
+
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+from qdrant_client import QdrantClient
+
+EMBEDDING_MODEL_NAME = "nomic-ai/nomic-embed-text-v1.5"
+DEFAULT_QDRANT_URL = os.environ.get("QDRANT_URL", "http://localhost:6333")
+COLLECTIONS_TTL_SECONDS = float(os.environ.get("QDRANT_COLLECTIONS_TTL_SECONDS", 300))
+
+
+class _Entry:
+    __slots__ = ("value", "teardown", "created_at", "build_seconds", "hits")
+
+    def __init__(self, value, teardown, build_seconds):
+        self.value = value
+        self.teardown = teardown
+        self.created_at = time.time()
+        self.build_seconds = build_seconds
+        self.hits = 0
+
+
+class ResourceRegistry:
+    """Lazily built, shared resources keyed by a hashable key"""
+
+    def __init__(self):
+        self._entries = {}  # key -> _Entry, in creation order
+        self._build_locks = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def _check_fork(self):
+        # A forked child must not use its parent's sockets / CUDA context
+        if os.getpid() != self._pid:
+            with self._lock:
+                if os.getpid() != self._pid:
+                    self._entries = {}
+                    self._build_locks = {}
+                    self._pid = os.getpid()
+
+    def get(self, key: Hashable, factory: Callable[[], Any],
+            teardown: Optional[Callable[[Any], None]] = None) -> Any:
+        """
+        The resource for key, built by factory() on first use
+
+        Args:
+            key: Resource identity (e.g. ("embedder", model_name, device))
+            factory: Builds the resource; called at most once per key until released
+            teardown: Called on release() / teardown(); must leave the resource
+                usable by holders that still reference it
+        """
+        self._check_fork()
+        entry = self._entries.get(key)
+        if entry is None:
+            with self._lock:
+                build_lock = self._build_locks.setdefault(key, threading.Lock())
+            with build_lock:
+                entry = self._entries.get(key)
+                if entry is None:
+                    start = time.perf_counter()
+                    value = factory()
+                    entry = _Entry(value, teardown, time.perf_counter() - start)
+                    with self._lock:
+                        self._entries[key] = entry
+        entry.hits += 1
+        return entry.value
+
+    def peek(self, key: Hashable) -> Any:
+        """The resource for key if it is already built (never builds)"""
+        entry = self._entries.get(key)
+        return entry.value if entry is not None else None
+
+    def release(self, key: Hashable) -> bool:
+        """Tear down one resource; the next get() builds it again"""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        if entry.teardown is not None:
+            try:
+                entry.teardown(entry.value)
+            except Exception as e:
+                print(f"Warning: Could not release resource {key}: {e}")
+        return True
+
+    def teardown(self) -> int:
+        """Release every resource, newest first; returns how many were released"""
+        with self._lock:
+            keys = list(self._entries)
+        for key in reversed(keys):
+            self.release(key)
+        _empty_cuda_cache()
+        return len(keys)
+
+    def keys(self) -> List[Hashable]:
+        return list(self._entries)
+
+    def memory_report(self) -> Dict[str, Any]:
+        """Loaded resources with build time, use count and (for models) parameter memory"""
+        resources = []
+        for key, entry in list(self._entries.items()):
+            resources.append({
+                "key": _format_key(key),
+                "type": type(entry.value).__name__,
+                "build_seconds": round(entry.build_seconds, 3),
+                "uses": entry.hits,
+                "age_seconds": round(time.time() - entry.created_at, 1),
+                "model_bytes": _model_bytes(entry.value)
+            })
+        return {
+            "pid": os.getpid(),
+            "process_rss_bytes": _process_rss_bytes(),
+            "cuda_allocated_bytes": _cuda_allocated_bytes(),
+            "resources": resources
+        }
+
+# -------------------------------------------------------------------------
+# Memory helpers
+# -------------------------------------------------------------------------
+
+def _format_key(key) -> str:
+    return ":".join(str(part) for part in key) if isinstance(key, tuple) else str(key)
+
+
+def _model_bytes(value) -> Optional[int]:
+    """Parameter + buffer bytes of a torch module (None for anything else)"""
+    parameters = getattr(value, "parameters", None)
+    buffers = getattr(value, "buffers", None)
+    if not callable(parameters) or not callable(buffers):
+        return None
+    try:
+        return sum(t.numel() * t.element_size() for t in list(parameters()) + list(buffers()))
+    except Exception:
+        return None
+
+
+def _process_rss_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # peak RSS (KiB on Linux)
+    except Exception:
+        return None
+
+
+def _cuda_allocated_bytes() -> Optional[int]:
+    try:
+        import torch
+        return torch.cuda.memory_allocated() if torch.cuda.is_available() else None
+    except Exception:
+        return None
+
+
+def _empty_cuda_cache():
+    try:
+        import torch
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+    except Exception:
+        pass
+
+# -------------------------------------------------------------------------
+# Shared registry and typed accessors
+# -------------------------------------------------------------------------
+
+_registry = ResourceRegistry()
+
+
+def get_registry() -> ResourceRegistry:
+    return _registry
+
+
+def get_resource(key: Hashable, factory: Callable[[], Any],
+                 teardown: Optional[Callable[[Any], None]] = None) -> Any:
+    """Any shared resource (see ResourceRegistry.get)"""
+    return _registry.get(key, factory, teardown)
+
+
+def get_embedder(model_name: str = EMBEDDING_MODEL_NAME, device: Optional[str] = None):
+    """Shared SentenceTransformer (CUDA when available)"""
+    if device is None:
+        import torch
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+
+    def build():
+        from sentence_transformers import SentenceTransformer
+        print(f"Loading embedding model {model_name} on {device}")
+        return SentenceTransformer(model_name, device=device, trust_remote_code=True)
+
+    return _registry.get(("embedder", model_name, device), build)
+
+
+def _qdrant_url(url: Optional[str] = None, host: Optional[str] = None, port: Optional[int] = None) -> str:
+    if url:
+        return url.rstrip("/")
+    if host:
+        return f"http://{host}:{port or 6333}"
+    return DEFAULT_QDRANT_URL.rstrip("/")
+
+
+def get_qdrant_client(url: Optional[str] = None, host: Optional[str] = None,
+                      port: Optional[int] = None) -> QdrantClient:
+    """Shared QdrantClient for a server (by url, or host/port)"""
+    url = _qdrant_url(url, host, port)
+    # No teardown: other sessions may still hold the client, it closes when collected
+    return _registry.get(("qdrant", url), lambda: QdrantClient(url=url))
+
+
+def get_collection_names(url: Optional[str] = None, host: Optional[str] = None, port: Optional[int] = None,
+                         refresh: bool = False) -> List[str]:
+    """Collection names of a Qdrant server, listed at most every COLLECTIONS_TTL_SECONDS"""
+    url = _qdrant_url(url, host, port)
+    key = ("qdrant_collections", url)
+    listing = _registry.peek(key)
+    if refresh or (listing is not None and time.time() - listing["listed_at"] > COLLECTIONS_TTL_SECONDS):
+        _registry.release(key)
+    listing = _registry.get(key, lambda: {
+        "listed_at": time.time(),
+        "names": [c.name for c in get_qdrant_client(url).get_collections().collections]
+    })
+    return list(listing["names"])
+
+
+def run_once(key: Hashable, action: Callable[[], Any]) -> Any:
+    """
+    Run a setup action (e.g. ensuring payload indexes) once per process; returns its result
+
+    An action that raises or returns False is not remembered, so it runs again next time.
+    """
+    key = ("once",) + (key if isinstance(key, tuple) else (key,))
+    result = _registry.get(key, action)
+    if result is False:
+        _registry.release(key)
+    return result
+
+
+def warm_up(embedder: bool = True, qdrant_url: Optional[str] = None) -> Dict[str, Any]:
+    """Build the default embedder, Qdrant client and collection listing now; returns memory_report()"""
+    start = time.perf_counter()
+    get_qdrant_client(qdrant_url)
+    try:
+        get_collection_names(qdrant_url)
+    except Exception as e:
+        print(f"Warning: Could not list Qdrant collections during warm-up: {e}")
+    if embedder:
+        get_embedder()
+    print(f"Resources warmed up in {time.perf_counter() - start:.1f}s")
+    return memory_report()
+
+
+def teardown() -> int:
+    """Release every shared resource"""
+    return _registry.teardown()
+
+
+def memory_report() -> Dict[str, Any]:
+    return _registry.memory_report()
+
+
+if __name__ == "__main__":
+    import json
+    print(json.dumps(warm_up(), indent=2))
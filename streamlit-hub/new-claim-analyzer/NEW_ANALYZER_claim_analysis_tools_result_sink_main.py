@@ -0,0 +1,558 @@
+#!/usr/bin/env python3
+"""
+Analysis Result Sink
+Streams analyzed claims to disk so downstream analysis and the dashboards
+read files instead of re-running the pipeline. Each claim's rows are appended
+to partitioned Parquet (when pyarrow is installed) or newline-delimited JSON:
+
+    <base_dir>/<table>/<partition_by>=<value>/part-<started>-<pid>-<sink>-<seq>.<parquet|jsonl>
+
+Tables: detailed_issues, actionable_fixes and claim_summary (from
+NewClaimAnalyzer.analyze_new_claim) and enriched_issues (from the claim
+correctors). Partitions are the service month (YYYY-MM) or the provider.
+
+Memory is bounded: rows are buffered up to max_buffered_rows in total, then
+written out, and at most max_open_files part files are open at once. A part
+file is written as "<name>.part" and only renamed to its final name (after
+fsync) when it is rotated at max_file_rows, committed or the sink is closed, so readers
+never see a half-written file. JSONL part files are fsynced on every flush;
+recover_partial_files() promotes their complete lines after a crash. An
+unfinished Parquet part has no footer and cannot be recovered.
+
+Run:  python result_sink.py read <base_dir> <table> [--partition VALUE] [--head N]
+      python result_sink.py recover <base_dir>
+"""
+
+import argparse
+import itertools
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:
+    pa = pq = None
+    PARQUET_AVAILABLE = False
+
+SINK_FORMATS = ("parquet", "jsonl")
+PARTITION_KEYS = ("service_month", "provider")
+DEFAULT_MAX_BUFFERED_ROWS = 5000
+DEFAULT_MAX_FILE_ROWS = 100000
+DEFAULT_MAX_OPEN_FILES = 32
+PART_SUFFIX = ".part"
+UNKNOWN_PARTITION = "unknown"
+_SINK_IDS = itertools.count(1)
+
+# Row fields holding the partition value, first present wins
+PARTITION_SOURCE_FIELDS = {
+    "service_month": ("clm_from_dt", "CLM_FROM_DT", "service_date"),
+    "provider": ("PRVDR_NUM", "provider_id"),
+}
+
+# -------------------------------------------------------------------------
+# Rows per table
+# -------------------------------------------------------------------------
+
+def analysis_tables(result: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+    """Sink rows of one analyze_new_claim result (actionable fixes get the claim header)"""
+    summary = result.get("claim_summary") or {}
+    header = {key: summary.get(key) for key in ("CLM_ID", "clm_from_dt", "PRVDR_NUM")}
+    return {
+        "detailed_issues": list(result.get("detailed_issues") or []),
+        "actionable_fixes": [{**header, **fix} for fix in result.get("actionable_fixes") or []],
+        "claim_summary": [summary] if summary else [],
+    }
+
+
+def correction_tables(result: Dict[str, Any],
+                      claim_fields: Optional[Dict[str, Any]] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Sink rows of one corrector result
+
+    Args:
+        result: {"claim_id", "enriched_issues", ...} from a claim corrector
+        claim_fields: Claim-level fields (e.g. the claim summary payload with
+            service_date / provider_id) added where an issue lacks them
+    """
+    claim_fields = claim_fields or {}
+    claim_id = result.get("claim_id")
+    return {
+        "enriched_issues": [
+            {**claim_fields, "claim_id": claim_id, **issue} for issue in result.get("enriched_issues") or []
+        ]
+    }
+
+# -------------------------------------------------------------------------
+# Value / partition normalization
+# -------------------------------------------------------------------------
+
+def _plain(value, nested_as_json: bool):
+    """Value as a JSON / Arrow scalar (dates as ISO strings, NaN as None)"""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if value is None or isinstance(value, (bool, int, str)):
+        return value
+    if isinstance(value, float):
+        return None if math.isnan(value) else value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (dict, list, tuple, set, np.ndarray)):
+        if isinstance(value, (set, np.ndarray)):
+            value = list(value)
+        if nested_as_json:
+            return json.dumps(value, default=str)
+        if isinstance(value, dict):
+            return {str(k): _plain(v, False) for k, v in value.items()}
+        return [_plain(v, False) for v in value]
+    return str(value)
+
+
+def service_month(value) -> str:
+    """YYYY-MM of a service date (date, YYYYMMDD or ISO string), or "unknown" """
+    if isinstance(value, (datetime, date)):
+        return f"{value.year:04d}-{value.month:02d}"
+    text = str(value or "").strip()
+    if re.match(r"^\d{8}", text):
+        return f"{text[:4]}-{text[4:6]}"
+    if re.match(r"^\d{4}-\d{2}", text):
+        return text[:7]
+    return UNKNOWN_PARTITION
+
+
+def partition_value(row: Dict[str, Any], partition_by: Optional[str]) -> Optional[str]:
+    """Directory-safe partition value of a row (None when not partitioning)"""
+    if partition_by is None:
+        return None
+    value = next((row[field] for field in PARTITION_SOURCE_FIELDS[partition_by]
+                  if row.get(field) not in (None, "")), None)
+    if partition_by == "service_month":
+        return service_month(value)
+    text = re.sub(r"[^A-Za-z0-9_.-]", "_", str(value).strip()) if value is not None else ""
+    return text or UNKNOWN_PARTITION
+
+# -------------------------------------------------------------------------
+# Part files
+# -------------------------------------------------------------------------
+
+def _fsync_dir(path: str):
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return  # Directories cannot be opened on some platforms
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class _PartFile:
+    """One output file, written as <final_path>.part until commit()"""
+
+    def __init__(self, final_path: str, fmt: str):
+        self.final_path = final_path
+        self.part_path = final_path + PART_SUFFIX
+        self.fmt = fmt
+        self.rows = 0
+        self._handle = None
+        self._writer = None
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+
+    def conform(self, table):
+        """The Arrow table in this Parquet file's schema, or None if it does not fit"""
+        if self._writer is None or table.schema.equals(self._writer.schema):
+            return table
+        schema = self._writer.schema
+        if set(table.schema.names) != set(schema.names):
+            return None
+        try:
+            return table.select(schema.names).cast(schema)
+        except Exception:
+            return None
+
+    def write(self, rows: List[Dict[str, Any]], table=None):
+        if self.fmt == "parquet":
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.part_path, table.schema)
+            self._writer.write_table(table)
+        else:
+            if self._handle is None:
+                self._handle = open(self.part_path, "w", encoding="utf-8")
+            self._handle.write("".join(json.dumps(row, default=str) + "\n" for row in rows))
+            self._handle.flush()
+            os.fsync(self._handle.fileno())
+        self.rows += len(rows)
+
+    def commit(self) -> Optional[str]:
+        """Close, fsync and atomically rename to the final name"""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+        if not os.path.exists(self.part_path):
+            return None
+        with open(self.part_path, "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(self.part_path, self.final_path)
+        _fsync_dir(os.path.dirname(self.final_path))
+        return self.final_path
+
+
+def _arrow_table(rows: List[Dict[str, Any]]):
+    """Arrow table over the union of the rows' keys; a column of mixed types is stored as strings"""
+    columns = {}
+    for row in rows:
+        for key in row:
+            columns.setdefault(key, None)
+    arrays = {}
+    for column in columns:
+        values = [row.get(column) for row in rows]
+        try:
+            arrays[column] = pa.array(values)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            arrays[column] = pa.array([None if v is None else str(v) for v in values], type=pa.string())
+    return pa.table(arrays)
+
+# -------------------------------------------------------------------------
+# Sink
+# -------------------------------------------------------------------------
+
+class ResultSink:
+    """Buffered, partitioned, crash-safe writer of analysis rows"""
+
+    def __init__(self, base_dir: str, fmt: str = "parquet", partition_by: Optional[str] = "service_month",
+                 max_buffered_rows: int = DEFAULT_MAX_BUFFERED_ROWS, max_file_rows: int = DEFAULT_MAX_FILE_ROWS,
+                 max_open_files: int = DEFAULT_MAX_OPEN_FILES):
+        """
+        Args:
+            base_dir: Output root (one subdirectory per table)
+            fmt: "parquet" (falls back to "jsonl" without pyarrow) or "jsonl"
+            partition_by: "service_month", "provider" or None
+            max_buffered_rows: Rows held in memory across all tables before they are written
+            max_file_rows: Rows per part file before it is rotated
+            max_open_files: Part files kept open at once (least recently written is committed first)
+        """
+        if fmt not in SINK_FORMATS:
+            raise ValueError(f"Unknown sink format: {fmt} (expected one of {SINK_FORMATS})")
+        if partition_by is not None and partition_by not in PARTITION_KEYS:
+            raise ValueError(f"Unknown partition key: {partition_by} (expected one of {PARTITION_KEYS} or None)")
+        if fmt == "parquet" and not PARQUET_AVAILABLE:
+            print("Warning: pyarrow is not installed, writing JSONL instead of Parquet")
+            fmt = "jsonl"
+
+        self.base_dir = base_dir
+        self.fmt = fmt
+        self.partition_by = partition_by
+        self.max_buffered_rows = max(1, max_buffered_rows)
+        self.max_file_rows = max(1, max_file_rows)
+        self.max_open_files = max(1, max_open_files)
+
+        self._buffers = {}  # (table, partition) -> rows
+        self._buffered = 0
+        self._files = OrderedDict()  # (table, partition) -> _PartFile, least recently written first
+        self._lock = threading.RLock()
+        # Unique per sink: a long-running process may open several in the same second
+        self._run_id = f"{datetime.now():%Y%m%dT%H%M%S}-{os.getpid()}-{next(_SINK_IDS)}"
+        self._sequence = 0
+        self._closed = False
+        self.committed_at = time.time()
+
+        self.rows_written = 0
+        self.claims_written = 0
+        self.files_committed = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __del__(self):
+        # A shared sink dropped without close() (e.g. released from the
+        # resource registry) still commits the rows written to it
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+    def write_analysis(self, result: Dict[str, Any]):
+        """Append one analyze_new_claim result (skipped when it is an error result)"""
+        if not result or "error" in result:
+            return
+        self.write_tables(analysis_tables(result))
+
+    def write_correction(self, result: Dict[str, Any], claim_fields: Optional[Dict[str, Any]] = None):
+        """Append one corrector result (run_archetype_driven_corrections / run_corrections)"""
+        if not result or "error" in result:
+            return
+        self.write_tables(correction_tables(result, claim_fields))
+
+    def write_tables(self, tables: Dict[str, List[Dict[str, Any]]]):
+        """Append the rows of one claim, by table"""
+        with self._lock:
+            for table, rows in tables.items():
+                self._append(table, rows)
+            self.claims_written += 1
+            if self._buffered >= self.max_buffered_rows:
+                self.flush()
+
+    def write_rows(self, table: str, rows: Sequence[Dict[str, Any]]):
+        """Append rows to one table"""
+        with self._lock:
+            self._append(table, rows)
+            if self._buffered >= self.max_buffered_rows:
+                self.flush()
+
+    def _append(self, table: str, rows: Sequence[Dict[str, Any]]):
+        if self._closed:
+            raise RuntimeError("ResultSink is closed")
+        for row in rows:
+            key = (table, partition_value(row, self.partition_by))
+            self._buffers.setdefault(key, []).append(row)
+            self._buffered += 1
+
+    def flush(self):
+        """Write all buffered rows to their part files"""
+        with self._lock:
+            buffers, self._buffers, self._buffered = self._buffers, {}, 0
+            for key, rows in buffers.items():
+                start = 0
+                while start < len(rows):
+                    part = self._part_file(key)
+                    chunk = rows[start:start + self.max_file_rows - part.rows]
+                    self._write_chunk(key, part, chunk)
+                    start += len(chunk)
+
+    def _write_chunk(self, key, part: _PartFile, rows: List[Dict[str, Any]]):
+        nested_as_json = self.fmt == "parquet"
+        rows = [{str(k): _plain(v, nested_as_json) for k, v in row.items()} for row in rows]
+        table = None
+        if self.fmt == "parquet":
+            table = _arrow_table(rows)
+            conformed = part.conform(table)
+            if conformed is None:
+                # Column set or types changed (e.g. a column that was all null): start a new file
+                self._commit(key)
+                part = self._part_file(key)
+            else:
+                table = conformed
+        part.write(rows, table)
+        self.rows_written += len(rows)
+        if part.rows >= self.max_file_rows:
+            self._commit(key)
+
+    def _part_file(self, key) -> _PartFile:
+        part = self._files.get(key)
+        if part is not None:
+            self._files.move_to_end(key)
+            return part
+        while len(self._files) >= self.max_open_files:
+            self._commit(next(iter(self._files)))
+
+        table, partition = key
+        directory = os.path.join(self.base_dir, table)
+        if partition is not None:
+            directory = os.path.join(directory, f"{self.partition_by}={partition}")
+        self._sequence += 1
+        name = f"part-{self._run_id}-{self._sequence:05d}.{self.fmt}"
+        part = _PartFile(os.path.join(directory, name), self.fmt)
+        self._files[key] = part
+        return part
+
+    def _commit(self, key):
+        part = self._files.pop(key, None)
+        if part is not None:
+            path = part.commit()
+            if path:
+                self.files_committed.append(path)
+
+    def commit(self):
+        """Flush and commit every open part file, so readers see all rows written so far"""
+        with self._lock:
+            if self._closed:
+                return
+            try:
+                self.flush()
+            finally:
+                for key in list(self._files):
+                    try:
+                        self._commit(key)
+                    except Exception as e:
+                        print(f"Warning: Could not commit result file for {key}: {e}")
+                self.committed_at = time.time()
+
+    def close(self):
+        """Flush and commit every open part file"""
+        with self._lock:
+            try:
+                self.commit()
+            finally:
+                self._closed = True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "base_dir": self.base_dir,
+                "format": self.fmt,
+                "partition_by": self.partition_by,
+                "claims_written": self.claims_written,
+                "rows_written": self.rows_written,
+                "rows_buffered": self._buffered,
+                "open_files": len(self._files),
+                "files_committed": len(self.files_committed)
+            }
+
+# -------------------------------------------------------------------------
+# Reading / recovery
+# -------------------------------------------------------------------------
+
+def list_result_files(base_dir: str, table: str, partitions: Optional[Sequence[str]] = None) -> List[str]:
+    """Committed part files of a table (".part" files are never listed), optionally only some partitions"""
+    root = os.path.join(base_dir, table)
+    wanted = set(str(p) for p in partitions) if partitions else None
+    files = []
+    for directory, _, names in os.walk(root):
+        partition = os.path.basename(directory).split("=", 1)[1] if "=" in os.path.basename(directory) else None
+        if wanted is not None and partition not in wanted:
+            continue
+        files.extend(os.path.join(directory, name) for name in names
+                     if name.endswith((".parquet", ".jsonl")))
+    return sorted(files)
+
+
+def _partition_column(path: str):
+    directory = os.path.basename(os.path.dirname(path))
+    return tuple(directory.split("=", 1)) if "=" in directory else None
+
+
+def _read_file(path: str, columns: Optional[List[str]] = None) -> Optional[pd.DataFrame]:
+    if path.endswith(".parquet"):
+        if not PARQUET_AVAILABLE:
+            print(f"Warning: pyarrow is not installed, skipping {path}")
+            return None
+        frame = pq.read_table(path).to_pandas()
+    else:
+        frame = pd.read_json(path, lines=True, dtype=False, convert_dates=False)
+    partition = _partition_column(path)
+    if partition is not None and partition[0] not in frame.columns:
+        frame[partition[0]] = partition[1]
+    if columns is not None:
+        frame = frame[[c for c in columns if c in frame.columns]]
+    return frame
+
+
+def read_results(base_dir: str, table: str, partitions: Optional[Sequence[str]] = None,
+                 columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    One table of exported results as a DataFrame
+
+    Args:
+        base_dir: Sink output root
+        table: detailed_issues, actionable_fixes, claim_summary or enriched_issues
+        partitions: Partition values to read (e.g. ["2008-01"]); all when None
+        columns: Columns to keep (the partition column is added from the directory name)
+    """
+    frames = [frame for frame in (_read_file(path, columns) for path in list_result_files(base_dir, table, partitions))
+              if frame is not None and not frame.empty]
+    if not frames:
+        return pd.DataFrame(columns=columns or [])
+    return pd.concat(frames, ignore_index=True)
+
+
+def iter_result_rows(base_dir: str, table: str, partitions: Optional[Sequence[str]] = None) -> Iterator[Dict[str, Any]]:
+    """Rows of a table one at a time (one file in memory at a time)"""
+    for path in list_result_files(base_dir, table, partitions):
+        if path.endswith(".jsonl"):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+        else:
+            frame = _read_file(path)
+            if frame is not None:
+                yield from frame.to_dict("records")
+
+
+def recover_partial_files(base_dir: str, min_age_seconds: float = 60.0) -> Dict[str, int]:
+    """
+    Finish the part files left behind by a crashed writer
+
+    JSONL parts keep their complete lines and are renamed to their final name;
+    Parquet parts (no footer) are renamed to "<name>.corrupt". Files modified
+    in the last min_age_seconds are skipped, as a live sink may still own them.
+    """
+    recovered = {"jsonl_recovered": 0, "rows_recovered": 0, "parquet_discarded": 0, "skipped_recent": 0}
+    now = time.time()
+    for directory, _, names in os.walk(base_dir):
+        for name in names:
+            if not name.endswith(PART_SUFFIX):
+                continue
+            path = os.path.join(directory, name)
+            if now - os.path.getmtime(path) < min_age_seconds:
+                recovered["skipped_recent"] += 1
+                continue
+            final_path = path[:-len(PART_SUFFIX)]
+            if final_path.endswith(".parquet"):
+                os.replace(path, final_path + ".corrupt")
+                recovered["parquet_discarded"] += 1
+                continue
+
+            with open(path, "rb") as f:
+                data = f.read()
+            complete = data[:data.rfind(b"\n") + 1]
+            if not complete:
+                os.remove(path)
+                continue
+            with open(path, "wb") as f:
+                f.write(complete)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(path, final_path)
+            _fsync_dir(directory)
+            recovered["jsonl_recovered"] += 1
+            recovered["rows_recovered"] += complete.count(b"\n")
+    return recovered
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Read or recover exported analysis results")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    read_parser = subparsers.add_parser("read", help="Print a table of exported results")
+    read_parser.add_argument("base_dir")
+    read_parser.add_argument("table")
+    read_parser.add_argument("--partition", action="append", default=None)
+    read_parser.add_argument("--head", type=int, default=20)
+
+    recover_parser = subparsers.add_parser("recover", help="Finish part files left by a crashed writer")
+    recover_parser.add_argument("base_dir")
+    recover_parser.add_argument("--min-age", type=float, default=60.0)
+
+    args = parser.parse_args()
+    if args.command == "read":
+        frame = read_results(args.base_dir, args.table, args.partition)
+        print(f"{len(frame)} rows, {len(frame.columns)} columns")
+        print(frame.head(args.head).to_string())
+    else:
+        print(json.dumps(recover_partial_files(args.base_dir, args.min_age), indent=2))
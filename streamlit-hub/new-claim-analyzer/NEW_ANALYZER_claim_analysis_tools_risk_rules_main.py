@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Vectorized Denial Risk Rules
+Table-driven version of NewClaimAnalyzer._calculate_risk_analysis. The rule
+checks (duplicates, global period bundling, prior authorization, provider
+credentialing, modifiers, frequency limits, NCCI/NCD/LCD flags) are computed
+once per claim or per distinct procedure and evaluated for every DX-PROC
+combination of one claim - or a whole batch of claims - as NumPy column
+operations. Rule priorities, scores and labels are declared as data below.
+"""
+
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# -------------------------------------------------------------------------
+# Reference code lists used by the checks
+# -------------------------------------------------------------------------
+
+# Major surgical procedures that create global periods (hip/knee replacements)
+MAJOR_SURGERY_CODES = ['27130', '27447', '27132', '27446', '27134', '27445']
+
+# Procedures typically bundled under a global period (ECG, labs, venipuncture, ED visit, CBC)
+GLOBAL_PERIOD_BUNDLED_CODES = ['93000', '80053', '36415', '99284', '85018']
+
+# High-cost procedures requiring prior authorization
+PRIOR_AUTH_REQUIRED_CODES = ['27130', '27447', '27132', '27446', '27134', '27445', 'G0299']
+
+# Procedures that require specific modifiers
+MODIFIER_REQUIREMENTS = {
+    '27130': ['50', '51'],  # Bilateral, multiple procedures
+    '27447': ['50', '51'],  # Bilateral, multiple procedures
+    '93000': ['26'],        # Professional component
+    '80053': ['26']         # Professional component
+}
+
+# Maximum units per claim (day)
+FREQUENCY_LIMITS = {
+    '93000': 1,  # ECG - once per day
+    '80053': 1,  # Comprehensive metabolic panel - once per day
+    '36415': 4,  # Venipuncture - max 4 per day
+    '99284': 1   # ED visit - once per day
+}
+
+# -------------------------------------------------------------------------
+# Rule tables
+#
+# Rules are checked in list order and the first match wins. "when" is a tuple
+# of feature columns that must all be true (see _combination_features).
+# -------------------------------------------------------------------------
+
+DENIAL_RISK_RULES = [
+    {"name": "duplicate_procedure", "level": "HIGH: Duplicate Procedure Billing", "score": 120,
+     "when": ("is_duplicate",)},
+    # A PTP conflict scores 100 on any line but is only the risk level on the first line
+    {"name": "ncci_ptp_conflict", "level": "HIGH: NCCI PTP Conflict", "score": 100,
+     "when": ("ptp_conflict", "primary_procedure"), "score_when": ("ptp_conflict",)},
+    {"name": "global_period_bundling", "level": "HIGH: Global Period Bundling", "score": 95,
+     "when": ("is_bundled",)},
+    {"name": "primary_dx_not_covered", "level": "HIGH: Primary DX Not Covered", "score": 90,
+     "when": ("lcd_not_covered", "primary_dx")},
+    {"name": "prior_authorization_missing", "level": "HIGH: Prior Authorization Missing", "score": 85,
+     "when": ("prior_auth_missing",)},
+    {"name": "provider_credentialing", "level": "HIGH: Provider Credentialing Issue", "score": 80,
+     "when": ("credentialing_issue",)},
+    {"name": "modifier_missing", "level": "MEDIUM: Required Modifier Missing", "score": 70,
+     "when": ("modifier_missing",)},
+    {"name": "mue_risk", "level": "MEDIUM: MUE Risk", "score": 60,
+     "when": ("mue_risk",)},
+    {"name": "frequency_exceeded", "level": "MEDIUM: Frequency Limit Exceeded", "score": 55,
+     "when": ("frequency_exceeded",)},
+    {"name": "ncd_terminated", "level": "MEDIUM: NCD Terminated", "score": 50,
+     "when": ("ncd_terminated",)},
+    {"name": "secondary_dx_not_covered", "level": "LOW: Secondary DX Not Covered", "score": 30,
+     "when": ("lcd_not_covered", "secondary_dx")},
+]
+DEFAULT_RISK_LEVEL = 'OK'
+DEFAULT_RISK_SCORE = 0
+
+# (highest hcpcs_position, multiplier) in ascending order
+POSITION_MULTIPLIERS = [(1, 1.5), (5, 1.2)]
+DEFAULT_POSITION_MULTIPLIER = 1.0
+
+# Remaining outputs: ordered (conditions, value) rules plus a default
+OUTCOME_RULES = {
+    "risk_category": (
+        [
+            (("ptp_conflict", "primary_procedure"), 'CRITICAL'),
+            (("lcd_not_covered", "primary_dx"), 'CRITICAL'),
+            (("mue_risk",), 'HIGH'),
+            (("ncd_terminated",), 'HIGH'),
+            (("lcd_not_covered", "secondary_dx"), 'MEDIUM'),
+        ],
+        'LOW'
+    ),
+    "action_required": (
+        [
+            (("ptp_conflict", "primary_procedure"), 'IMMEDIATE: Fix PTP conflict or claim will be denied'),
+            (("lcd_not_covered", "primary_dx"), 'IMMEDIATE: Add covered diagnosis or claim will be rejected'),
+            (("mue_risk",), 'REVIEW: Verify documentation supports units billed'),
+            (("ncd_terminated",), 'REVIEW: Check if NCD termination affects coverage'),
+            (("lcd_not_covered", "secondary_dx"), 'MONITOR: Secondary diagnosis not covered'),
+        ],
+        'NO ACTION: Claim appears compliant'
+    ),
+    "business_impact": (
+        [
+            (("ptp_conflict", "primary_procedure"), 'FULL DENIAL: Primary procedure will be denied'),
+            (("lcd_not_covered", "primary_dx"), 'FULL DENIAL: Entire claim will be rejected'),
+            (("mue_risk",), 'PARTIAL DENIAL: Units may be reduced'),
+            (("ncd_terminated",), 'COVERAGE RISK: May affect reimbursement'),
+            (("lcd_not_covered", "secondary_dx"), 'MINIMAL IMPACT: Secondary diagnosis issue'),
+        ],
+        'NO IMPACT: Claim should process normally'
+    ),
+}
+
+RISK_OUTPUT_COLUMNS = ['denial_risk_level', 'denial_risk_score', 'risk_category', 'action_required', 'business_impact']
+
+# -------------------------------------------------------------------------
+# Per-claim checks (run once per claim, not per combination)
+# -------------------------------------------------------------------------
+
+def claim_procedure_codes(claim_data: Dict[str, Any]) -> List[str]:
+    """Procedure codes of a claim in HCPCS_CD_1..45 order (the all_procedures list)"""
+    procedure_codes = claim_data.get('procedure_codes', {})
+    codes = []
+    for i in range(1, 46):
+        code = procedure_codes.get(f'HCPCS_CD_{i}')
+        if code:
+            codes.append(code)
+    return codes
+
+
+def has_credentialing_issue(claim_data: Dict[str, Any]) -> bool:
+    """Missing, short or test (999...) provider number"""
+    provider_num = claim_data.get('PRVDR_NUM', '')
+    if not provider_num or len(provider_num) < 6:
+        return True
+    return provider_num.startswith('999')
+
+
+def has_prior_authorization(claim_data: Dict[str, Any]) -> bool:
+    """Whether the claim carries an approved prior authorization"""
+    return bool(claim_data.get('prior_authorization', {}).get('approved', False))
+
+
+def missing_modifiers(hcpcs_code: str, claim_data: Dict[str, Any]) -> List[str]:
+    """Required modifiers for the procedure that are not on the claim"""
+    modifiers = claim_data.get('modifiers', {}).get(hcpcs_code, [])
+    return [mod for mod in MODIFIER_REQUIREMENTS.get(hcpcs_code, []) if mod not in modifiers]
+
+# -------------------------------------------------------------------------
+# Vectorized evaluation
+# -------------------------------------------------------------------------
+
+def _truthy(values) -> np.ndarray:
+    """
+    Element-wise Python truthiness, i.e. what `if value:` does
+
+    NaN counts as true and None, '' and 0 as false, so numeric columns read
+    back from SQL score exactly like the per-pair dict lookups.
+    """
+    array = np.asarray(values)
+    if array.dtype.kind in "biuf":
+        return array != 0
+    return np.fromiter(map(bool, array.astype(object)), dtype=bool, count=len(array))
+
+
+def _combination_features(combinations: pd.DataFrame, claims: Dict[Any, Dict[str, Any]],
+                          claim_keys: np.ndarray, procedures: Dict[Any, List[str]]) -> Dict[str, np.ndarray]:
+    """Boolean feature columns referenced by the rule tables, one entry per combination"""
+    hcpcs_codes = combinations['hcpcs_code'].to_numpy(dtype=object)
+    dx_positions = combinations['dx_position'].to_numpy()
+    hcpcs_positions = combinations['hcpcs_position'].to_numpy()
+    lcd_covered = combinations['lcd_icd10_covered_group'].to_numpy(dtype=object)
+
+    # Procedure occurrences of every claim, one row per billed line
+    proc_keys, proc_codes = [], []
+    for key in claims:
+        codes = procedures[key]
+        proc_keys.extend([key] * len(codes))
+        proc_codes.extend(codes)
+    procs = pd.DataFrame({"claim": proc_keys, "hcpcs_code": proc_codes}, dtype=object)
+
+    combo_index = pd.MultiIndex.from_arrays([claim_keys, hcpcs_codes])
+    code_counts = procs.groupby(["claim", "hcpcs_code"]).size()
+    counts = code_counts.reindex(combo_index, fill_value=0).to_numpy()
+
+    has_major_surgery = procs["hcpcs_code"].isin(MAJOR_SURGERY_CODES).groupby(procs["claim"]).any()
+    claim_has_major = has_major_surgery.reindex(claim_keys, fill_value=False).to_numpy(dtype=bool)
+
+    # Claim-level checks broadcast to every combination of the claim
+    pa_present = pd.Series({key: has_prior_authorization(claim) for key, claim in claims.items()}, dtype=bool)
+    credentialing = pd.Series({key: has_credentialing_issue(claim) for key, claim in claims.items()}, dtype=bool)
+
+    # Modifier requirements, evaluated once per distinct (claim, procedure)
+    needs_modifier = pd.Series(hcpcs_codes).isin(list(MODIFIER_REQUIREMENTS)).to_numpy()
+    modifier_missing = np.zeros(len(combinations), dtype=bool)
+    modifier_memo = {}
+    for i in np.flatnonzero(needs_modifier):
+        memo_key = (claim_keys[i], hcpcs_codes[i])
+        if memo_key not in modifier_memo:
+            modifier_memo[memo_key] = bool(missing_modifiers(hcpcs_codes[i], claims[claim_keys[i]]))
+        modifier_missing[i] = modifier_memo[memo_key]
+
+    frequency_limit = pd.Series(hcpcs_codes).map(FREQUENCY_LIMITS).to_numpy(dtype=float)
+
+    return {
+        "is_duplicate": counts > 1,
+        "ptp_conflict": _truthy(combinations['ptp_denial_reason'].to_numpy()),
+        "primary_procedure": hcpcs_positions == 1,
+        "is_bundled": pd.Series(hcpcs_codes).isin(GLOBAL_PERIOD_BUNDLED_CODES).to_numpy() & claim_has_major,
+        "lcd_not_covered": lcd_covered == 'N',
+        "primary_dx": dx_positions == 1,
+        "secondary_dx": dx_positions > 1,
+        "prior_auth_missing": (pd.Series(hcpcs_codes).isin(PRIOR_AUTH_REQUIRED_CODES).to_numpy()
+                               & ~pa_present.reindex(claim_keys).to_numpy(dtype=bool)),
+        "credentialing_issue": credentialing.reindex(claim_keys).to_numpy(dtype=bool),
+        "modifier_missing": modifier_missing,
+        "mue_risk": _truthy(combinations['mue_threshold'].to_numpy()),
+        "frequency_exceeded": counts > frequency_limit,  # NaN limit (no limit) compares False
+        "ncd_terminated": combinations['ncd_status'].to_numpy(dtype=object) == 'Terminated',
+    }
+
+
+def _condition(features: Dict[str, np.ndarray], names) -> np.ndarray:
+    result = features[names[0]]
+    for name in names[1:]:
+        result = result & features[name]
+    return result
+
+
+def evaluate_risk(combinations: pd.DataFrame, claims: Dict[Any, Dict[str, Any]], claim_column: str = 'CLM_ID',
+                  procedures: Optional[Dict[Any, List[str]]] = None) -> pd.DataFrame:
+    """
+    Evaluate the denial risk rules for many DX-PROC combinations at once
+
+    Args:
+        combinations: One row per combination with the detailed_issues columns
+            dx_position, hcpcs_position, hcpcs_code, lcd_icd10_covered_group,
+            ptp_denial_reason, mue_threshold, ncd_status and claim_column
+        claims: Claim dicts keyed by the values of claim_column
+        claim_column: Column linking each combination to its claim
+        procedures: Optional all_procedures list per claim key (derived from
+            HCPCS_CD_1..45 when omitted)
+
+    Returns:
+        DataFrame with RISK_OUTPUT_COLUMNS, aligned to the combinations index
+    """
+    if combinations.empty:
+        return pd.DataFrame(columns=RISK_OUTPUT_COLUMNS, index=combinations.index)
+
+    if procedures is None:
+        procedures = {key: claim_procedure_codes(claim) for key, claim in claims.items()}
+
+    claim_keys = combinations[claim_column].to_numpy(dtype=object)
+    features = _combination_features(combinations, claims, claim_keys, procedures)
+
+    levels = np.select(
+        [_condition(features, rule["when"]) for rule in DENIAL_RISK_RULES],
+        [rule["level"] for rule in DENIAL_RISK_RULES],
+        default=DEFAULT_RISK_LEVEL
+    )
+    base_scores = np.select(
+        [_condition(features, rule.get("score_when", rule["when"])) for rule in DENIAL_RISK_RULES],
+        [rule["score"] for rule in DENIAL_RISK_RULES],
+        default=DEFAULT_RISK_SCORE
+    )
+
+    hcpcs_positions = combinations['hcpcs_position'].to_numpy()
+    multipliers = np.select(
+        [hcpcs_positions <= max_position for max_position, _ in POSITION_MULTIPLIERS],
+        [multiplier for _, multiplier in POSITION_MULTIPLIERS],
+        default=DEFAULT_POSITION_MULTIPLIER
+    )
+
+    output = {
+        'denial_risk_level': levels.astype(object),
+        'denial_risk_score': np.round(base_scores * multipliers, 1),
+    }
+    for column, (rules, default) in OUTCOME_RULES.items():
+        output[column] = np.select(
+            [_condition(features, names) for names, _ in rules],
+            [value for _, value in rules],
+            default=default
+        ).astype(object)
+
+    return pd.DataFrame(output, index=combinations.index, columns=RISK_OUTPUT_COLUMNS)
+
+
+def evaluate_claim_risk(claim_data: Dict[str, Any], combinations: pd.DataFrame,
+                        all_procedures: Optional[List[str]] = None) -> pd.DataFrame:
+    """Evaluate the denial risk rules for every combination of a single claim"""
+    return evaluate_risk(
+        combinations.assign(_claim_key=0),
+        {0: claim_data},
+        claim_column='_claim_key',
+        procedures={0: all_procedures if all_procedures is not None else claim_procedure_codes(claim_data)}
+    )
@@ -0,0 +1,474 @@
+#!/usr/bin/env python3
+"""
+Compact Similar-Claim Index
+Exact cosine search over the 68 claim features in a local NumPy matrix, one
+row per claim. The claim_analysis_metadata collection stores the same
+features padded with random noise to 768 dimensions; only the first 68
+columns carry signal, so the compact rows are 11x smaller and the ranking is
+not perturbed by the padding.
+
+The index is filled on first use and kept current as claims are analyzed.
+A file written by the build command (SIMILAR_CLAIM_INDEX_PATH, default
+similar_claims.npz next to this module) is loaded instead of scrolling the
+collection's vectors, as long as it holds as many claims as the collection
+has summary points and its latest analysis_timestamp is the collection's
+latest (a re-analyzed claim makes it stale); otherwise the index is rebuilt
+from Qdrant. Recall against the padded Qdrant vectors is measured with
+benchmark_recall().
+
+Build:     python similar_claim_index.py build [--output similar_claims.npz]
+Benchmark: python similar_claim_index.py benchmark [--sample 200] [--limit 5]
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client import models
+
+from claim_metadata_store import (claim_summaries_filter, claim_summary_point_id, iter_claim_summaries,
+                                  COLLECTION_NAME, SCROLL_BATCH_SIZE)
+
+# Width of NewClaimAnalyzer._create_feature_matrix rows (leading columns of the padded vectors)
+FEATURE_DIMENSIONS = 68
+PADDED_DIMENSIONS = 768
+PADDING_STD = 0.01
+DEFAULT_CAPACITY = 1024
+
+# Claim summary payload kept next to each row (filters and search results)
+INDEX_PAYLOAD_FIELDS = ["claim_id", "provider_type", "risk_categories", "service_date", "claim_metadata",
+                        "analysis_timestamp"]
+
+DEFAULT_INDEX_PATH = os.environ.get(
+    "SIMILAR_CLAIM_INDEX_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "similar_claims.npz")
+)
+
+
+def claim_index_payload(claim_id, metadata: Dict[str, Any], detailed_issues: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Claim fields the index filters on (also stored on the claim's summary point)"""
+    return {
+        "claim_id": str(claim_id),
+        "provider_type": str(metadata.get("provider_type", "Unknown")),
+        "service_date": str((detailed_issues[0] if detailed_issues else {}).get("clm_from_dt", "")),
+        "risk_categories": sorted({str(issue.get("risk_category", "LOW")) for issue in detailed_issues})
+    }
+
+
+def _as_list(value: Union[str, Sequence[str], None]) -> Optional[set]:
+    if value is None or value == "" or value == []:
+        return None
+    if isinstance(value, (list, tuple, set)):
+        return {str(v) for v in value}
+    return {str(value)}
+
+
+class SimilarClaimIndex:
+    """Unit-normalized claim feature rows with exact dot-product search"""
+
+    def __init__(self, dimensions: int = FEATURE_DIMENSIONS, capacity: int = DEFAULT_CAPACITY):
+        self.dimensions = dimensions
+        self._matrix = np.zeros((max(1, capacity), dimensions), dtype=np.float32)
+        self._claim_ids = []
+        self._payloads = []
+        self._rows = {}  # claim_id -> row
+        self._lock = threading.RLock()
+        self.loaded_from = None
+        self.saved_latest_analysis = None  # latest_analysis() when the loaded file was saved
+
+    def __len__(self):
+        return len(self._claim_ids)
+
+    def __contains__(self, claim_id):
+        return str(claim_id) in self._rows
+
+    # ------------------------------------------------------------------
+    # Updates
+    # ------------------------------------------------------------------
+    def _normalize(self, features) -> np.ndarray:
+        """Leading `dimensions` columns as unit-length float32 rows (padded vectors are truncated)"""
+        matrix = np.atleast_2d(np.asarray(features, dtype=np.float32))[:, :self.dimensions]
+        if matrix.shape[1] < self.dimensions:
+            matrix = np.hstack([matrix, np.zeros((matrix.shape[0], self.dimensions - matrix.shape[1]), np.float32)])
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+    def add(self, claim_id, features, payload: Optional[Dict[str, Any]] = None):
+        """Insert or replace one claim's row"""
+        self.add_many([claim_id], features, [payload])
+
+    def add_many(self, claim_ids: List[Any], features, payloads: Optional[List[Optional[Dict[str, Any]]]] = None):
+        """Insert or replace many claims (features: N x 68, or N x 768 padded vectors)"""
+        rows = self._normalize(features)
+        payloads = payloads or [None] * len(claim_ids)
+        with self._lock:
+            for claim_id, row, payload in zip(claim_ids, rows, payloads):
+                claim_id = str(claim_id)
+                payload = {k: v for k, v in (payload or {}).items() if k in INDEX_PAYLOAD_FIELDS}
+                payload["claim_id"] = claim_id
+                position = self._rows.get(claim_id)
+                if position is None:
+                    position = len(self._claim_ids)
+                    if position == len(self._matrix):
+                        grown = np.zeros((len(self._matrix) * 2, self.dimensions), dtype=np.float32)
+                        grown[:position] = self._matrix
+                        self._matrix = grown
+                    self._rows[claim_id] = position
+                    self._claim_ids.append(claim_id)
+                    self._payloads.append(payload)
+                else:
+                    self._payloads[position] = payload
+                self._matrix[position] = row
+
+    def latest_analysis(self) -> str:
+        """Newest analysis_timestamp of the indexed claims ("" if none is known)"""
+        with self._lock:
+            return max((str(payload.get("analysis_timestamp", "")) for payload in self._payloads), default="")
+
+    def remove(self, claim_id) -> bool:
+        """Drop a claim's row (the last row moves into its slot)"""
+        with self._lock:
+            position = self._rows.pop(str(claim_id), None)
+            if position is None:
+                return False
+            last = len(self._claim_ids) - 1
+            if position != last:
+                self._matrix[position] = self._matrix[last]
+                self._claim_ids[position] = self._claim_ids[last]
+                self._payloads[position] = self._payloads[last]
+                self._rows[self._claim_ids[position]] = position
+            self._matrix[last] = 0.0
+            self._claim_ids.pop()
+            self._payloads.pop()
+            return True
+
+    # ------------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------------
+    def _filter_mask(self, provider_type, risk_category) -> Optional[np.ndarray]:
+        provider_types = _as_list(provider_type)
+        risk_categories = _as_list(risk_category)
+        if provider_types is None and risk_categories is None:
+            return None
+        return np.fromiter(
+            (
+                (provider_types is None or str(payload.get("provider_type")) in provider_types)
+                and (risk_categories is None or bool(risk_categories.intersection(payload.get("risk_categories", []))))
+                for payload in self._payloads
+            ),
+            dtype=bool, count=len(self._payloads)
+        )
+
+    def search(self, queries: List[Dict[str, Any]], limit: int = 5,
+               provider_type: Union[str, Sequence[str], None] = None,
+               risk_category: Union[str, Sequence[str], None] = None,
+               payload_fields: Optional[List[str]] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Exact top-k cosine search for many claims at once
+
+        Args:
+            queries: One {"vector": [...], "claim_id": ...} per claim (same shape as
+                query_similar_claims); the query claim itself is excluded
+            limit: Results per claim
+            provider_type: Optional provider type restriction (str or list)
+            risk_category: Only claims with a combination in this risk category (str or list)
+            payload_fields: Payload keys to return (None = the stored summary payload)
+
+        Returns:
+            Per query, a list of {"score", "vector_id", "payload"} in score order;
+            vector_id is the claim's summary point
+        """
+        if not queries:
+            return []
+
+        query_matrix = self._normalize([query["vector"] for query in queries])
+        with self._lock:
+            count = len(self._claim_ids)
+            if count == 0:
+                return [[] for _ in queries]
+            scores = query_matrix @ self._matrix[:count].T
+            mask = self._filter_mask(provider_type, risk_category)
+            if mask is not None:
+                scores[:, ~mask] = -np.inf
+            for row, query in enumerate(queries):
+                own_row = self._rows.get(str(query.get("claim_id")))
+                if own_row is not None:
+                    scores[row, own_row] = -np.inf
+
+            k = min(limit, count)
+            if k <= 0:
+                return [[] for _ in queries]
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+
+            results = []
+            for row in range(len(queries)):
+                order = top[row][np.argsort(-scores[row, top[row]], kind="stable")]
+                hits = []
+                for position in order:
+                    score = scores[row, position]
+                    if not np.isfinite(score):
+                        break
+                    payload = self._payloads[position]
+                    if payload_fields is not None:
+                        payload = {k: v for k, v in payload.items() if k in payload_fields}
+                    hits.append({
+                        "score": float(score),
+                        "vector_id": claim_summary_point_id(self._claim_ids[position]),
+                        "payload": dict(payload)
+                    })
+                results.append(hits)
+            return results
+
+    # ------------------------------------------------------------------
+    # Loading / persistence
+    # ------------------------------------------------------------------
+    def load_from_qdrant(self, client: QdrantClient, collection_name: str = COLLECTION_NAME,
+                         page_size: int = SCROLL_BATCH_SIZE) -> int:
+        """Add every claim summary point of the collection (leading 68 vector columns + payload)"""
+        claim_ids, vectors, payloads = [], [], []
+        loaded = 0
+        for point in iter_claim_summaries(client, collection_name, page_size,
+                                          payload_fields=INDEX_PAYLOAD_FIELDS, with_vectors=True):
+            payload = point.payload or {}
+            if point.vector is None or payload.get("claim_id") is None:
+                continue
+            claim_ids.append(payload["claim_id"])
+            vectors.append(list(point.vector)[:self.dimensions])
+            payloads.append(payload)
+            if len(claim_ids) >= page_size:
+                self.add_many(claim_ids, vectors, payloads)
+                loaded += len(claim_ids)
+                claim_ids, vectors, payloads = [], [], []
+        if claim_ids:
+            self.add_many(claim_ids, vectors, payloads)
+            loaded += len(claim_ids)
+        self.loaded_from = collection_name
+        return loaded
+
+    def save(self, path: str):
+        """Write the index to an .npz file (atomically: a concurrent loader never sees a partial file)"""
+        tmp_path = path + ".tmp.npz"
+        with self._lock:
+            try:
+                np.savez(
+                    tmp_path,
+                    matrix=self._matrix[:len(self._claim_ids)],
+                    claim_ids=np.array(self._claim_ids, dtype=object),
+                    payloads=np.array([json.dumps(payload, default=str) for payload in self._payloads], dtype=object),
+                    latest_analysis=np.array(self.latest_analysis())
+                )
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "SimilarClaimIndex":
+        """Read an index written by save()"""
+        data = np.load(path, allow_pickle=True)
+        matrix = data["matrix"]
+        index = cls(dimensions=matrix.shape[1], capacity=max(DEFAULT_CAPACITY, len(matrix)))
+        index.add_many(list(data["claim_ids"]), matrix, [json.loads(p) for p in data["payloads"]])
+        index.loaded_from = path
+        if "latest_analysis" in data.files:
+            index.saved_latest_analysis = str(data["latest_analysis"])
+        return index
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            count = len(self._claim_ids)
+            return {
+                "claims": count,
+                "dimensions": self.dimensions,
+                "matrix_bytes": int(count * self.dimensions * self._matrix.itemsize),
+                "padded_vector_bytes": int(count * PADDED_DIMENSIONS * 4),
+                "loaded_from": self.loaded_from
+            }
+
+
+_shared_index = None
+_shared_index_lock = threading.Lock()
+
+
+def _collection_state(client: QdrantClient, collection_name: str):
+    """Number of claim summary points and their newest analysis_timestamp (payload-only scroll)"""
+    summaries, latest = 0, ""
+    for point in iter_claim_summaries(client, collection_name, payload_fields=["analysis_timestamp"]):
+        summaries += 1
+        latest = max(latest, str((point.payload or {}).get("analysis_timestamp", "")))
+    return summaries, latest
+
+
+def _load_saved_index(path: str, client: Optional[QdrantClient],
+                      collection_name: str) -> Optional[SimilarClaimIndex]:
+    """The saved index at path, or None if there is none or it is stale for the collection"""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        index = SimilarClaimIndex.load(path)
+        if client is not None:
+            summaries, latest = _collection_state(client, collection_name)
+            if summaries != len(index):
+                print(f"Similar-claim index: {path} holds {len(index)} claims, {collection_name} "
+                      f"has {summaries}; rebuilding from Qdrant")
+                return None
+            if index.saved_latest_analysis != latest:
+                print(f"Similar-claim index: {path} was saved at analysis {index.saved_latest_analysis}, "
+                      f"{collection_name} has {latest}; rebuilding from Qdrant")
+                return None
+        print(f"Similar-claim index: loaded {len(index)} claims from {path}")
+        return index
+    except Exception as e:
+        print(f"Warning: Could not load similar-claim index {path}: {e}")
+        return None
+
+
+def get_similar_claim_index(client: Optional[QdrantClient] = None,
+                            collection_name: str = COLLECTION_NAME,
+                            index_path: Optional[str] = None) -> SimilarClaimIndex:
+    """
+    Get the process-wide index, filled on first use
+
+    A saved index (index_path, default DEFAULT_INDEX_PATH) is used when it
+    exists and is current; otherwise the index is filled from the
+    collection's summary points. A failed load leaves an empty index that
+    fills up as claims are analyzed.
+    """
+    global _shared_index
+
+    if _shared_index is None:
+        with _shared_index_lock:
+            if _shared_index is None:
+                index = _load_saved_index(index_path or DEFAULT_INDEX_PATH, client, collection_name)
+                if index is None:
+                    index = SimilarClaimIndex()
+                if client is not None and index.loaded_from is None:
+                    try:
+                        loaded = index.load_from_qdrant(client, collection_name)
+                        print(f"Similar-claim index: loaded {loaded} claims from {collection_name}")
+                    except Exception as e:
+                        print(f"Warning: Could not load similar-claim index from Qdrant: {e}")
+                _shared_index = index
+    return _shared_index
+
+# -------------------------------------------------------------------------
+# Recall benchmark
+# -------------------------------------------------------------------------
+
+def _padded_rankings(client: QdrantClient, claim_ids: List[str], limit: int,
+                     collection_name: str) -> List[List[str]]:
+    """Top claims for each claim by its stored padded vector (Qdrant search over summary points)"""
+    requests = [
+        models.QueryRequest(
+            query=claim_summary_point_id(claim_id),
+            filter=claim_summaries_filter(),
+            limit=limit,
+            with_payload=["claim_id"]
+        )
+        for claim_id in claim_ids
+    ]
+    responses = client.query_batch_points(collection_name=collection_name, requests=requests)
+    return [[str((point.payload or {}).get("claim_id")) for point in response.points] for response in responses]
+
+
+def _simulated_padded_rankings(index: SimilarClaimIndex, claim_ids: List[str], limit: int,
+                               seed: int) -> List[List[str]]:
+    """Same ranking computed locally with freshly padded rows (no Qdrant needed)"""
+    rng = np.random.default_rng(seed)
+    count = len(index)
+    features = index._matrix[:count].astype(np.float64)
+    padded = np.hstack([features, rng.normal(0, PADDING_STD, (count, PADDED_DIMENSIONS - index.dimensions))])
+    padded /= np.maximum(np.linalg.norm(padded, axis=1, keepdims=True), 1e-12)
+    rankings = []
+    for claim_id in claim_ids:
+        row = index._rows[claim_id]
+        scores = padded @ padded[row]
+        scores[row] = -np.inf
+        top = np.argsort(-scores, kind="stable")[:limit]
+        rankings.append([index._claim_ids[position] for position in top])
+    return rankings
+
+
+def benchmark_recall(index: SimilarClaimIndex, client: Optional[QdrantClient] = None,
+                     collection_name: str = COLLECTION_NAME, sample_size: int = 200,
+                     limit: int = 5, seed: int = 0) -> Dict[str, Any]:
+    """
+    Compare the compact index with the padded 768-d vectors
+
+    For a sample of indexed claims, recall@limit is the share of the padded
+    search's top claims that the compact search also returns. With a client the
+    padded ranking comes from Qdrant (stored summary vectors), otherwise it is
+    simulated locally with the analyzer's padding distribution.
+
+    Returns:
+        Recall statistics and per-query latency of both searches
+    """
+    rng = np.random.default_rng(seed)
+    with index._lock:
+        population = list(index._claim_ids)
+    if not population:
+        return {"queries": 0, "error": "index is empty"}
+    sample = [population[i] for i in rng.choice(len(population), min(sample_size, len(population)), replace=False)]
+
+    queries = [{"claim_id": claim_id, "vector": index._matrix[index._rows[claim_id]]} for claim_id in sample]
+    started = time.perf_counter()
+    compact = [[hit["payload"]["claim_id"] for hit in hits] for hits in index.search(queries, limit=limit)]
+    compact_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    if client is not None:
+        padded = _padded_rankings(client, sample, limit + 1, collection_name)
+        padded = [[claim_id for claim_id in ranking if claim_id != own][:limit] for ranking, own in zip(padded, sample)]
+        padded_source = "qdrant"
+    else:
+        padded = _simulated_padded_rankings(index, sample, limit, seed)
+        padded_source = "simulated"
+    padded_seconds = time.perf_counter() - started
+
+    recalls = np.array([
+        len(set(c).intersection(p)) / len(p) if p else 1.0
+        for c, p in zip(compact, padded)
+    ])
+    return {
+        "queries": len(sample),
+        "limit": limit,
+        "padded_source": padded_source,
+        "mean_recall": round(float(recalls.mean()), 4),
+        "min_recall": round(float(recalls.min()), 4),
+        "exact_match_share": round(float((recalls == 1.0).mean()), 4),
+        "compact_ms_per_query": round(compact_seconds * 1000 / len(sample), 4),
+        "padded_ms_per_query": round(padded_seconds * 1000 / len(sample), 4),
+        **index.stats()
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compact similar-claim index")
+    parser.add_argument("command", choices=["build", "benchmark"])
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=6333)
+    parser.add_argument("--collection", default=COLLECTION_NAME)
+    parser.add_argument("--output", default=DEFAULT_INDEX_PATH, help="build: index file to write")
+    parser.add_argument("--sample", type=int, default=200, help="benchmark: query claims")
+    parser.add_argument("--limit", type=int, default=5, help="benchmark: results per query")
+    parser.add_argument("--simulate", action="store_true", help="benchmark: pad locally instead of querying Qdrant")
+    args = parser.parse_args()
+
+    qdrant = QdrantClient(host=args.host, port=args.port)
+    claim_index = SimilarClaimIndex()
+    print(f"Loaded {claim_index.load_from_qdrant(qdrant, args.collection)} claims")
+
+    if args.command == "build":
+        claim_index.save(args.output)
+        print(f"Wrote {args.output}: {claim_index.stats()}")
+    else:
+        report = benchmark_recall(claim_index, None if args.simulate else qdrant, args.collection,
+                                  sample_size=args.sample, limit=args.limit)
+        for key, value in report.items():
+            print(f"{key}: {value}")
@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+"""
+Shared SQL Server Connection Pool
+Reuses pyodbc connections across NewClaimAnalyzer, SQLDatabaseConnector and
+the Streamlit dashboards instead of paying a TLS handshake (Encrypt=yes) per
+pyodbc.connect. Connections are health-checked on checkout; close() and the
+`with` block return them to the pool.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+import pyodbc
+
+DEFAULT_MIN_SIZE = int(os.environ.get("SQL_POOL_MIN_SIZE", 1))
+DEFAULT_MAX_SIZE = int(os.environ.get("SQL_POOL_MAX_SIZE", 8))
+DEFAULT_CHECKOUT_TIMEOUT = 30.0
+HEALTH_CHECK_QUERY = "SELECT 1"
+
+
+class PoolTimeoutError(Exception):
+    """No connection became available within the checkout timeout"""
+
+
+class PooledConnection:
+    """
+    Checked-out pool connection
+
+    Behaves like the pyodbc connection it wraps (cursor(), commit(), pd.read_sql,
+    ...). close() and leaving a `with` block return it to the pool.
+    """
+
+    def __init__(self, pool: "SQLConnectionPool", raw_connection, generation: int = 0):
+        self._pool = pool
+        self._raw = raw_connection
+        self._generation = generation  # pool generation at checkout (see close_all)
+        self._discard = False
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if self._raw is None:
+            raise pyodbc.ProgrammingError("Attempt to use a connection that was returned to the pool")
+        return getattr(self._raw, name)
+
+    def cursor(self):
+        if self._raw is None:
+            raise pyodbc.ProgrammingError("Attempt to use a connection that was returned to the pool")
+        return self._raw.cursor()
+
+    @property
+    def closed(self) -> bool:
+        return self._raw is None
+
+    def invalidate(self):
+        """Mark the connection as broken so the pool closes it instead of reusing it"""
+        self._discard = True
+
+    def close(self):
+        """Return the connection to the pool (safe to call more than once)"""
+        raw, self._raw = self._raw, None
+        if raw is not None:
+            self._pool._release(raw, discard=self._discard, generation=self._generation)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Same transaction handling as a pyodbc connection's `with` block
+        if self._raw is not None:
+            try:
+                if exc_type is None:
+                    self._raw.commit()
+                else:
+                    self._raw.rollback()
+            except Exception:
+                self._discard = True
+        self.close()
+        return False
+
+    def __del__(self):
+        # Connections dropped without close() still go back to the pool
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class SQLConnectionPool:
+    """Thread-safe pool of pyodbc connections for one connection string"""
+
+    def __init__(self, connection_string: str, min_size: int = DEFAULT_MIN_SIZE, max_size: int = DEFAULT_MAX_SIZE,
+                 checkout_timeout: float = DEFAULT_CHECKOUT_TIMEOUT, health_check_interval: float = 0.0,
+                 max_idle_seconds: float = 600.0):
+        """
+        Args:
+            connection_string: ODBC connection string
+            min_size: Connections kept open even when idle
+            max_size: Upper bound on open connections (checked out + idle)
+            checkout_timeout: Seconds to wait for a free connection when the pool is exhausted
+            health_check_interval: Skip the checkout health check for connections used
+                within this many seconds (0 = always check)
+            max_idle_seconds: Idle connections above min_size older than this are closed
+        """
+        self.connection_string = connection_string
+        self.min_size = max(0, min_size)
+        self.max_size = max(1, max_size, self.min_size)
+        self.checkout_timeout = checkout_timeout
+        self.health_check_interval = health_check_interval
+        self.max_idle_seconds = max_idle_seconds
+
+        self._idle = deque()  # (raw connection, last returned at)
+        self._open = 0
+        self._in_use = 0
+        self._condition = threading.Condition(threading.Lock())
+        self._thread_local = threading.local()
+        self._filled = False
+        self._generation = 0  # bumped by close_all; older checkouts are closed on return
+
+        self.metrics = {
+            "connections_created": 0,
+            "connections_closed": 0,
+            "connect_failures": 0,
+            "checkouts": 0,
+            "checkout_timeouts": 0,
+            "health_check_failures": 0,
+            "total_wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+            "peak_in_use": 0
+        }
+
+    # ------------------------------------------------------------------
+    # Checkout / return
+    # ------------------------------------------------------------------
+    def acquire(self, timeout: Optional[float] = None) -> PooledConnection:
+        """
+        Check out a healthy connection
+
+        Raises:
+            PoolTimeoutError: pool exhausted for longer than the timeout
+            pyodbc.Error: a new connection could not be opened
+        """
+        if not self._filled:
+            self._fill_min()
+
+        timeout = self.checkout_timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+
+        while True:
+            raw, last_used, generation = self._take_or_reserve(deadline)
+
+            if raw is None:
+                # A slot was reserved: open a new connection outside the lock
+                try:
+                    raw = self._connect()
+                except Exception:
+                    with self._condition:
+                        self._open -= 1
+                        self._in_use -= 1
+                        self._condition.notify()
+                    raise
+            elif not self._is_healthy(raw, last_used):
+                self.metrics["health_check_failures"] += 1
+                self._close_raw(raw)
+                with self._condition:
+                    self._open -= 1
+                    self._in_use -= 1
+                    self._condition.notify()
+                continue
+
+            waited = time.monotonic() - start
+            with self._condition:
+                self.metrics["checkouts"] += 1
+                self.metrics["total_wait_seconds"] += waited
+                self.metrics["max_wait_seconds"] = max(self.metrics["max_wait_seconds"], waited)
+            return PooledConnection(self, raw, generation)
+
+    def _take_or_reserve(self, deadline: float):
+        """Pop an idle connection, or reserve a slot for a new one; waits while the pool is full"""
+        with self._condition:
+            while True:
+                self._close_expired_idle()
+
+                if self._idle:
+                    raw, last_used = self._idle.pop()
+                    self._in_use += 1
+                    self.metrics["peak_in_use"] = max(self.metrics["peak_in_use"], self._in_use)
+                    return raw, last_used, self._generation
+
+                if self._open < self.max_size:
+                    self._open += 1
+                    self._in_use += 1
+                    self.metrics["peak_in_use"] = max(self.metrics["peak_in_use"], self._in_use)
+                    return None, None, self._generation
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.metrics["checkout_timeouts"] += 1
+                    raise PoolTimeoutError(
+                        f"No SQL connection available within the checkout timeout "
+                        f"({self._in_use}/{self.max_size} in use)"
+                    )
+                self._condition.wait(remaining)
+
+    def _release(self, raw, discard: bool = False, generation: Optional[int] = None):
+        """Return a connection to the pool (called by PooledConnection.close)"""
+        if generation is not None and generation != self._generation:
+            # Checked out before close_all()
+            discard = True
+        if not discard:
+            try:
+                # Leave no open transaction behind for the next borrower
+                raw.rollback()
+            except Exception:
+                discard = True
+
+        if discard:
+            self._close_raw(raw)
+
+        with self._condition:
+            self._in_use -= 1
+            if discard:
+                self._open -= 1
+            else:
+                self._idle.append((raw, time.monotonic()))
+            self._condition.notify()
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None):
+        """`with pool.connection() as conn:` - checkout for the duration of the block"""
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    # ------------------------------------------------------------------
+    # Per-thread checkout
+    # ------------------------------------------------------------------
+    def thread_connection(self) -> PooledConnection:
+        """
+        Connection pinned to the calling thread (or worker)
+
+        Repeated calls from the same thread return the same checkout until
+        release_thread_connection() is called.
+        """
+        conn = getattr(self._thread_local, "connection", None)
+        if conn is None or conn.closed:
+            conn = self.acquire()
+            self._thread_local.connection = conn
+        return conn
+
+    def release_thread_connection(self):
+        """Return the calling thread's pinned connection to the pool"""
+        conn = getattr(self._thread_local, "connection", None)
+        self._thread_local.connection = None
+        if conn is not None:
+            conn.close()
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+    def _connect(self):
+        try:
+            raw = pyodbc.connect(self.connection_string)
+        except Exception:
+            self.metrics["connect_failures"] += 1
+            raise
+        self.metrics["connections_created"] += 1
+        return raw
+
+    def _close_raw(self, raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+        self.metrics["connections_closed"] += 1
+
+    def _is_healthy(self, raw, last_used: float) -> bool:
+        if self.health_check_interval and time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            cursor = raw.cursor()
+            cursor.execute(HEALTH_CHECK_QUERY)
+            cursor.fetchall()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def _close_expired_idle(self):
+        """Close idle connections above min_size that sat unused too long (lock held)"""
+        now = time.monotonic()
+        while self._idle and self._open > self.min_size and now - self._idle[0][1] > self.max_idle_seconds:
+            raw, _ = self._idle.popleft()
+            self._open -= 1
+            self._close_raw(raw)
+
+    def _fill_min(self):
+        """Open min_size connections up front (failures are reported, not raised)"""
+        with self._condition:
+            if self._filled:
+                return
+            self._filled = True
+            missing = self.min_size - self._open
+            self._open += max(0, missing)
+
+        for _ in range(max(0, missing)):
+            try:
+                raw = self._connect()
+            except Exception as e:
+                print(f"Warning: Could not pre-open pooled SQL connection: {e}")
+                with self._condition:
+                    self._open -= 1
+                continue
+            with self._condition:
+                self._idle.append((raw, time.monotonic()))
+                self._condition.notify()
+
+    def close_all(self):
+        """Close every idle connection (checked-out connections close when returned)"""
+        with self._condition:
+            self._generation += 1
+            while self._idle:
+                raw, _ = self._idle.popleft()
+                self._open -= 1
+                self._close_raw(raw)
+            self._filled = False
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool occupancy and checkout metrics"""
+        with self._condition:
+            checkouts = self.metrics["checkouts"]
+            return {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "open": self._open,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                **self.metrics,
+                "avg_wait_seconds": round(self.metrics["total_wait_seconds"] / checkouts, 6) if checkouts else 0.0
+            }
+
+
+# -------------------------------------------------------------------------
+# Process-wide registry
+# -------------------------------------------------------------------------
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(connection_string: str, **kwargs) -> SQLConnectionPool:
+    """
+    Shared pool for a connection string
+
+    Pools are per process: a forked worker gets its own pool and never reuses
+    sockets opened by its parent.
+    """
+    key = (os.getpid(), connection_string)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = SQLConnectionPool(connection_string, **kwargs)
+                _pools[key] = pool
+    return pool
+
+
+def pooled_connect(connection_string: str) -> PooledConnection:
+    """Drop-in replacement for pyodbc.connect that checks out from the shared pool"""
+    return get_pool(connection_string).acquire()
+
+
+def _connection_label(connection_string: str) -> str:
+    """uid@server/database of a connection string (no password or driver options)"""
+    parts = {}
+    for part in connection_string.split(";"):
+        name, _, value = part.partition("=")
+        parts[name.strip().lower()] = value.strip()
+    return (f"{parts.get('uid') or parts.get('user id') or 'default'}@{parts.get('server', 'default')}"
+            f"/{parts.get('database', 'default')}")
+
+
+def pool_stats() -> Dict[str, Dict[str, Any]]:
+    """Metrics for every pool in this process, keyed by uid@server/database"""
+    stats = {}
+    for (pid, connection_string), pool in list(_pools.items()):
+        if pid != os.getpid():
+            continue
+        label = _connection_label(connection_string)
+        # Connection strings differing only in other options are separate pools
+        key, n = label, 1
+        while key in stats:
+            n += 1
+            key = f"{label} #{n}"
+        stats[key] = pool.stats()
+    return stats
@@ -0,0 +1,194 @@
+"""
+Shared fixtures for the claim_analysis_tools equivalence tests
+
+The hub links every module under a descriptive name
+(NEW_ANALYZER_claim_analysis_tools_risk_rules_main.py), while the modules
+import each other by their original names (risk_rules). The finder below
+resolves those original names to the hub files, so the tests import the
+modules exactly as the analyzers do.
+"""
+
+import importlib.abc
+import importlib.util
+import os
+import sqlite3
+import sys
+
+import pytest
+
+HUB_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HUB_PREFIX = "NEW_ANALYZER_claim_analysis_tools_"
+HUB_SUFFIXES = ("_main", "_v1")
+
+
+def _hub_modules():
+    modules = {}
+    for filename in os.listdir(HUB_DIR):
+        if not (filename.startswith(HUB_PREFIX) and filename.endswith(".py")):
+            continue
+        name = filename[len(HUB_PREFIX):-len(".py")]
+        for suffix in HUB_SUFFIXES:
+            if name.endswith(suffix):
+                modules[name[:-len(suffix)]] = os.path.join(HUB_DIR, filename)
+    return modules
+
+
+class _HubModuleFinder(importlib.abc.MetaPathFinder):
+    """Import hub files by their original module names"""
+
+    def __init__(self, modules):
+        self.modules = modules
+
+    def find_spec(self, fullname, path=None, target=None):
+        if fullname in self.modules:
+            return importlib.util.spec_from_file_location(fullname, self.modules[fullname])
+        return None
+
+
+sys.meta_path.insert(0, _HubModuleFinder(_hub_modules()))
+
+
+# -------------------------------------------------------------------------
+# Fixture claims and reference data
+# -------------------------------------------------------------------------
+
+def make_claim(clm_id="C100", dx_codes=("4019", "25000", "V5869", "I10"),
+               hcpcs_codes=("27447", "93000", "36415", "36415", "E0114", "G0299", "80053"),
+               provider="123456", prior_authorization=False, modifiers=None):
+    """Claim dict in the analyze_new_claim input shape"""
+    return {
+        "CLM_ID": clm_id,
+        "DESYNPUF_ID": "P001",
+        "CLM_FROM_DT": "20240105",
+        "CLM_THRU_DT": "20240107",
+        "PRVDR_NUM": provider,
+        "diagnosis_codes": {f"ICD9_DGNS_CD_{i}": code for i, code in enumerate(dx_codes, 1)},
+        "procedure_codes": {f"HCPCS_CD_{i}": code for i, code in enumerate(hcpcs_codes, 1)},
+        "prior_authorization": {"approved": prior_authorization},
+        "modifiers": modifiers or {},
+    }
+
+
+# (database, table) -> (columns, rows); text columns compare case-insensitively as in the built snapshot
+REFERENCE_ROWS = {
+    ("_gems", "vw_icd9_to_icd10_cm_mapping"): (
+        ["icd9_code", "icd10_code", "icd10_description"],
+        [("4019", "I10", "Essential (primary) hypertension"),
+         ("25000", "E119", "Type 2 diabetes mellitus without complications"),
+         ("25000", "E1165", "Type 2 diabetes mellitus with hyperglycemia"),
+         ("V5869", "Z79899", "Other long term (current) drug therapy")]
+    ),
+    ("_gems", "icd10cm_codes_2018_fixed"): (
+        ["icd10_code", "description"],
+        [("I10", "Essential (primary) hypertension"),
+         ("E119", "Type 2 diabetes mellitus without complications"),
+         ("Z79899", "Other long term (current) drug therapy")]
+    ),
+    ("_ncci_", "vw_NCCI_Daily_Denial_Alerts"): (
+        ["procedure_code", "ptp_denial_reason", "mue_threshold", "mue_denial_type"],
+        [("27447", "Column 2 code 20680 bundled", None, None),
+         ("36415", None, "3", "Per day"),
+         ("93000", "", 0, None)]
+    ),
+    ("_ref", "hcpcs_master"): (
+        ["hcpcs_code", "seqnum", "long_description", "short_description"],
+        [("27447", 1, "003Total knee arthroplasty", "Total knee arthroplasty"),
+         ("93000", 1, "Electrocardiogram complete", "ECG"),
+         ("36415", 2, "Routine venipuncture, later row", None),
+         ("36415", 1, "004Collection of venous blood by venipuncture", None)]
+    ),
+    ("_ncd", "ncd_trkg"): (
+        ["NCD_id", "NCD_mnl_sect", "NCD_mnl_sect_title", "NCD_efctv_dt", "NCD_trmntn_dt", "NCD_lab"],
+        [(20, "190.3", "Blood Counts", "2002-11-25", None, 1),
+         (21, "280.1", "Durable Medical Equipment", "2005-01-01", "2019-12-31", 0)]
+    ),
+    ("_ncd", "toc_hcpcs_matches"): (
+        ["hcpcs_code", "section", "long_description"],
+        [("36415", 190.3, "003Venipuncture for blood counts"),
+         ("E0114", 280.1, "Crutches underarm other than wood"),
+         ("G0299", 999.0, "No tracked NCD")]
+    ),
+}
+
+
+def write_reference_snapshot(path, rows=REFERENCE_ROWS):
+    """Write a small reference snapshot file in the layout build_snapshot produces"""
+    from reference_snapshot import snapshot_table_name
+
+    conn = sqlite3.connect(path)
+    try:
+        for (database, table), (columns, table_rows) in rows.items():
+            column_types = []
+            for position, column in enumerate(columns):
+                values = [row[position] for row in table_rows if row[position] is not None]
+                if values and all(isinstance(value, int) for value in values):
+                    column_type = "INTEGER"
+                elif values and all(isinstance(value, (int, float)) for value in values):
+                    column_type = "REAL"
+                else:
+                    column_type = "TEXT COLLATE NOCASE"
+                column_types.append(f'"{column}" {column_type}')
+            local_name = snapshot_table_name(database, table)
+            conn.execute(f'CREATE TABLE "{local_name}" ({", ".join(column_types)})')
+            conn.executemany(f'INSERT INTO "{local_name}" VALUES ({", ".join("?" * len(columns))})', table_rows)
+        conn.commit()
+    finally:
+        conn.close()
+    return path
+
+
+@pytest.fixture
+def snapshot_path(tmp_path):
+    return write_reference_snapshot(str(tmp_path / "reference_snapshot.sqlite"))
+
+
+@pytest.fixture
+def snapshot_conn(snapshot_path):
+    from reference_snapshot import ReferenceSnapshot
+
+    conn = ReferenceSnapshot(snapshot_path).connect()
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def make_analyzer(snapshot_conn):
+    """
+    Factory of NewClaimAnalyzers that read the fixture snapshot and never touch Qdrant
+
+    Each analyzer gets its own reference cache and combination memo, so two
+    analyzers compared in one test never serve each other's results.
+    """
+    for module in ("numpy", "pandas", "pyodbc", "qdrant_client"):
+        pytest.importorskip(module, exc_type=ImportError)
+    from lcd_coverage import LcdCoverageIndex
+    from new_claim_analyzer1 import NewClaimAnalyzer
+    from reference_cache import ReferenceDataCache
+
+    def factory(**options):
+        analyzer = NewClaimAnalyzer.__new__(NewClaimAnalyzer)
+        settings = {
+            "bulk_lookups": True, "vectorized_rules": True, "incremental": True, "columnar_results": False,
+            "reference_version": "TEST", "reference_backend": "snapshot", "snapshot_path": None,
+            "persistent_connection": True, "defer_similar_search": True,
+            "similar_index": None, "code_set_index": None,
+        }
+        settings.update(options)
+        for name, value in settings.items():
+            setattr(analyzer, name, value)
+        analyzer._connection = snapshot_conn
+        analyzer.reference_cache = ReferenceDataCache()
+        analyzer.combination_memo = ReferenceDataCache()
+        analyzer.lcd_index = LcdCoverageIndex()
+        analyzer.store_metadata_in_qdrant = lambda *args, **kwargs: {"stored": False}
+        # The shared snapshot connection outlives each analysis
+        analyzer.close = lambda: None
+        return analyzer
+
+    return factory
+
+
+def issue_rows(result):
+    """detailed_issues without the per-run analysis_timestamp"""
+    assert "error" not in result, result.get("error")
+    return [{k: v for k, v in row.items() if k != "analysis_timestamp"} for row in result["detailed_issues"]]
@@ -0,0 +1,37 @@
+"""Set-based reference lookups against the per-code queries on the fixture snapshot"""
+
+import pytest
+
+from conftest import issue_rows, make_claim
+
+DX_CODES = ["4019", "25000", "V5869", "I10", "99999"]
+HCPCS_CODES = ["27447", "93000", "36415", "E0114", "G0299", "80053"]
+
+
+def test_bulk_lookup_resolves_codes_like_per_code_queries(make_analyzer, snapshot_conn):
+    per_code = make_analyzer(bulk_lookups=False)
+    bulk = make_analyzer(bulk_lookups=True)
+    reference = bulk._bulk_reference_lookup(snapshot_conn, DX_CODES, HCPCS_CODES)
+
+    assert (bulk._resolve_diagnoses(snapshot_conn, DX_CODES, reference)
+            == per_code._resolve_diagnoses(snapshot_conn, DX_CODES))
+    assert (bulk._resolve_procedures(snapshot_conn, HCPCS_CODES, None, reference)
+            == per_code._resolve_procedures(snapshot_conn, HCPCS_CODES, None))
+
+
+def test_bulk_lookup_caches_misses_for_the_per_code_path(make_analyzer, snapshot_conn):
+    analyzer = make_analyzer()
+    analyzer._bulk_reference_lookup(snapshot_conn, DX_CODES, HCPCS_CODES)
+
+    assert analyzer.reference_cache.lookup("ncci_data", "E0114") == (True, {})
+    assert analyzer.reference_cache.lookup("icd10_mapping", "99999") == (True, None)
+    assert analyzer.reference_cache.lookup("procedure_name", "G0299") == (True, "Healthcare service G0299")
+
+
+@pytest.mark.parametrize("claim", [make_claim(), make_claim("C200", hcpcs_codes=("G0299", "E0114", "e0114"))],
+                         ids=lambda claim: claim["CLM_ID"])
+def test_analysis_rows_match_per_code_lookups(make_analyzer, claim):
+    per_code = make_analyzer(bulk_lookups=False).analyze_new_claim(claim)
+    bulk = make_analyzer(bulk_lookups=True).analyze_new_claim(claim)
+
+    assert issue_rows(bulk) == issue_rows(per_code)
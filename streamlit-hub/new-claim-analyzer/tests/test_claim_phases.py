@@ -0,0 +1,35 @@
+"""Per-DX / per-HCPCS / per-pair phases of analyze_new_claim on the fixture claims"""
+
+from conftest import make_claim
+
+
+def test_rows_cover_every_pair_in_claim_order(make_analyzer):
+    claim = make_claim()
+    result = make_analyzer().analyze_new_claim(claim)
+
+    positions = [(row["dx_position"], row["hcpcs_position"]) for row in result["detailed_issues"]]
+    assert positions == [(dx, hcpcs) for dx in range(1, 5) for hcpcs in range(1, 8)]
+    duplicates = [row for row in result["detailed_issues"] if row["hcpcs_code"] == "36415"]
+    assert {row["hcpcs_position"] for row in duplicates} == {3, 4}
+    assert all(row["denial_risk_level"] == "HIGH: Duplicate Procedure Billing" for row in duplicates)
+
+
+def test_reference_data_is_resolved_once_per_distinct_code(make_analyzer):
+    analyzer = make_analyzer(bulk_lookups=False)
+    calls = []
+    get_ncci_data = analyzer._get_ncci_data
+    get_icd10_mapping = analyzer._get_icd10_mapping
+
+    def counting_ncci(conn, hcpcs_code):
+        calls.append(("ncci", hcpcs_code))
+        return get_ncci_data(conn, hcpcs_code)
+
+    def counting_mapping(conn, icd9_code):
+        calls.append(("icd10", icd9_code))
+        return get_icd10_mapping(conn, icd9_code)
+
+    analyzer._get_ncci_data = counting_ncci
+    analyzer._get_icd10_mapping = counting_mapping
+    analyzer.analyze_new_claim(make_claim(dx_codes=("4019", "25000", "4019"), hcpcs_codes=("36415", "93000", "36415")))
+
+    assert sorted(calls) == [("icd10", "25000"), ("icd10", "4019"), ("ncci", "36415"), ("ncci", "93000")]
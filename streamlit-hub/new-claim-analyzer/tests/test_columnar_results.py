@@ -0,0 +1,35 @@
+"""Columnar (DataFrame) results against the list-of-dicts path on the fixture claims"""
+
+import pytest
+
+from conftest import issue_rows, make_claim
+
+CLAIMS = [
+    make_claim(),
+    make_claim("C200", provider="999001", prior_authorization=True, modifiers={"27447": ["50"], "93000": ["26"]}),
+    make_claim("C300", dx_codes=("25000",), hcpcs_codes=("E0114",)),
+]
+
+
+def _claim_level(result):
+    metadata = {k: v for k, v in result["metadata"].items() if k != "analysis_timestamp"}
+    return result["claim_summary"], result["actionable_fixes"], metadata
+
+
+@pytest.mark.parametrize("claim", CLAIMS, ids=lambda claim: claim["CLM_ID"])
+def test_columnar_results_match_dict_rows(make_analyzer, claim):
+    rows_result = make_analyzer(columnar_results=False).analyze_new_claim(claim)
+    frame_result = make_analyzer(columnar_results=True).analyze_new_claim(claim)
+
+    assert issue_rows(frame_result) == issue_rows(rows_result)
+    assert _claim_level(frame_result) == _claim_level(rows_result)
+    assert len(frame_result["detailed_issues_frame"]) == len(rows_result["detailed_issues"])
+
+
+def test_columnar_results_with_memoized_rows(make_analyzer):
+    analyzer = make_analyzer(columnar_results=True)
+    first = analyzer.analyze_new_claim(CLAIMS[0])
+    again = analyzer.analyze_new_claim(CLAIMS[0])
+
+    assert again["incremental"]["recomputed_combinations"] == 0
+    assert issue_rows(again) == issue_rows(first)
@@ -0,0 +1,62 @@
+"""Content-hash memo of combination rows against fresh analyses of the fixture claims"""
+
+import pytest
+
+from conftest import issue_rows, make_claim
+
+HCPCS_CODES = ("27447", "93000", "36415", "36415", "E0114", "G0299", "80053")
+
+
+def test_unchanged_claim_reuses_every_combination(make_analyzer):
+    analyzer = make_analyzer()
+    claim = make_claim()
+    first = analyzer.analyze_new_claim(claim)
+    again = analyzer.analyze_new_claim(claim)
+
+    assert first["incremental"]["reused_combinations"] == 0
+    assert again["incremental"]["reused_combinations"] == len(first["detailed_issues"])
+    assert again["incremental"]["recomputed_combinations"] == 0
+    assert issue_rows(again) == issue_rows(first)
+    assert again["claim_summary"] == first["claim_summary"]
+
+
+@pytest.mark.parametrize("position, code, recomputed_positions", [
+    # A line with no cross-line effects: only its own combinations change
+    (2, "85018", {2}),
+    # Moving a duplicate onto 93000 changes the counts of 36415 (line 3) and 93000 (line 2) too
+    (4, "93000", {2, 3, 4}),
+    # Dropping the major surgery unbundles 93000, 36415 and 80053 on every line
+    (1, "99213", {1, 2, 3, 4, 7}),
+], ids=["own-line", "duplicate-count", "major-surgery"])
+def test_changed_line_recomputes_only_affected_combinations(make_analyzer, position, code, recomputed_positions):
+    analyzer = make_analyzer()
+    analyzer.analyze_new_claim(make_claim(hcpcs_codes=HCPCS_CODES))
+
+    changed_codes = list(HCPCS_CODES)
+    changed_codes[position - 1] = code
+    changed = make_claim(hcpcs_codes=changed_codes)
+    memoized = analyzer.analyze_new_claim(changed)
+    fresh = make_analyzer(incremental=False).analyze_new_claim(changed)
+
+    assert issue_rows(memoized) == issue_rows(fresh)
+    assert memoized["claim_summary"] == fresh["claim_summary"]
+    assert memoized["incremental"]["recomputed_combinations"] == 4 * len(recomputed_positions)
+    assert {row["hcpcs_position"] for row in memoized["incremental"]["reused"]} == \
+        set(range(1, len(HCPCS_CODES) + 1)) - recomputed_positions
+
+
+def test_prior_authorization_and_reference_version_enter_the_hash():
+    from combination_memo import ClaimHashContext
+
+    procedures = list(HCPCS_CODES)
+    without_pa = ClaimHashContext(make_claim(), procedures, "v1")
+    with_pa = ClaimHashContext(make_claim(prior_authorization=True), procedures, "v1")
+    next_version = ClaimHashContext(make_claim(), procedures, "v2")
+
+    for hcpcs_position, hcpcs_code in enumerate(HCPCS_CODES, 1):
+        key = (1, "4019", hcpcs_position, hcpcs_code)
+        pa_changes_hash = with_pa.combination_hash(*key) != without_pa.combination_hash(*key)
+        assert pa_changes_hash == (hcpcs_code in ("27447", "G0299"))
+        assert next_version.combination_hash(*key) != without_pa.combination_hash(*key)
+        assert ClaimHashContext(make_claim(), procedures, "v1").combination_hash(*key) == \
+            without_pa.combination_hash(*key)
@@ -0,0 +1,110 @@
+"""Batched embedding feature matrix against the per-claim feature builder it replaced"""
+
+from datetime import datetime
+
+import pytest
+
+from conftest import make_claim
+
+np = pytest.importorskip("numpy")
+
+
+def per_claim_features(metadata):
+    """The 68 leading features of the original _create_embedding_from_metadata, before padding"""
+    features = [min(metadata.get("max_risk_score", 0) / 150.0, 1.0),
+                min(metadata.get("avg_risk_score", 0) / 150.0, 1.0)]
+    for key, scale in [("total_issues", 20.0), ("critical_issues", 10.0), ("high_issues", 10.0),
+                       ("medium_issues", 15.0), ("low_issues", 20.0)]:
+        features.append(min(metadata.get(key, 0) / scale, 1.0))
+    features.append(min(len(metadata.get("all_cpt_codes", [])) / 20.0, 1.0))
+    features.append(min(len(metadata.get("icd_codes", [])) / 10.0, 1.0))
+
+    denial_indicators = metadata.get("denial_indicators", {})
+    for key in ["high_denial_risk", "critical_issues_present", "duplicate_billing_risk", "bundling_risk",
+                "pa_required", "ncci_conflicts", "credentialing_issues", "modifier_issues",
+                "frequency_issues", "coverage_issues"]:
+        features.append(1.0 if denial_indicators.get(key, False) else 0.0)
+
+    provider_types = ["Hospital", "Facility", "Physician", "Group", "Laboratory", "Radiology", "Ambulance", "DME"]
+    provider_features = [0.0] * 8
+    if metadata.get("provider_type", "Unknown") in provider_types:
+        provider_features[provider_types.index(metadata["provider_type"])] = 1.0
+    features.extend(provider_features)
+
+    procedure_categories = metadata.get("procedure_categories", {})
+    for category in ["surgery", "radiology", "laboratory", "evaluation_management",
+                     "anesthesia", "pathology", "medicine", "other"]:
+        features.append(min(len(procedure_categories.get(category, [])) / 10.0, 1.0))
+    diagnosis_categories = metadata.get("diagnosis_categories", {})
+    for category in ["musculoskeletal", "cardiovascular", "endocrine", "respiratory", "gastrointestinal",
+                     "neurological", "mental_health", "infectious_disease", "neoplasms", "other"]:
+        features.append(min(len(diagnosis_categories.get(category, [])) / 5.0, 1.0))
+
+    billing_patterns = metadata.get("billing_patterns", {})
+    for key, scale in [("duplicate_procedures", 5.0), ("high_cost_procedures", 3.0), ("bundled_procedures", 5.0),
+                       ("frequent_procedures", 5.0), ("unusual_combinations", 3.0)]:
+        features.append(min(len(billing_patterns.get(key, [])) / scale, 1.0))
+    risk_metadata = metadata.get("risk_metadata", {})
+    for key, scale in [("duplicate_issues", 5.0), ("bundling_issues", 5.0), ("pa_issues", 3.0),
+                       ("credentialing_issues", 2.0), ("modifier_issues", 5.0), ("frequency_issues", 5.0),
+                       ("ncci_conflicts", 3.0), ("coverage_issues", 5.0), ("mue_risks", 5.0), ("ncd_issues", 3.0)]:
+        features.append(min(risk_metadata.get(key, 0) / scale, 1.0))
+
+    units = metadata.get("units", {})
+    total_units = sum(units.values())
+    unique_procedures = len(units)
+    avg_units = total_units / unique_procedures if unique_procedures > 0 else 0
+    features.extend([min(total_units / 50.0, 1.0), min(unique_procedures / 20.0, 1.0), min(avg_units / 5.0, 1.0)])
+    features.append(min(len(metadata.get("modifiers", [])) / 10.0, 1.0))
+
+    service_date = metadata.get("service_date")
+    if service_date:
+        features.extend([np.sin(2 * np.pi * service_date.month / 12), np.cos(2 * np.pi * service_date.month / 12),
+                         np.sin(2 * np.pi * service_date.weekday() / 7),
+                         np.cos(2 * np.pi * service_date.weekday() / 7)])
+    else:
+        features.extend([0.0, 0.0, 0.0, 0.0])
+    return features
+
+
+@pytest.fixture
+def metadata_list(make_analyzer):
+    analyzer = make_analyzer()
+    claims = [
+        make_claim(),
+        make_claim("C200", provider="999001", prior_authorization=True, modifiers={"27447": ["50"]}),
+        make_claim("C300", dx_codes=("25000",), hcpcs_codes=("E0114",)),
+    ]
+    analyzed = [analyzer.analyze_new_claim(claim)["metadata"] for claim in claims]
+    hand_made = [
+        {},
+        {"provider_type": "DME", "max_risk_score": 400, "units": {"E0114": 0}, "modifiers": ["RT"] * 12,
+         "service_date": datetime(2024, 12, 29), "risk_metadata": {"ncd_issues": 1}},
+        {"provider_type": "Unknown", "denial_indicators": {"pa_required": True}, "service_date": None},
+    ]
+    return analyzed + hand_made
+
+
+def test_feature_matrix_matches_per_claim_features(make_analyzer, metadata_list):
+    matrix = make_analyzer()._create_feature_matrix(metadata_list)
+    expected = np.array([per_claim_features(metadata) for metadata in metadata_list])
+
+    assert matrix.shape == (len(metadata_list), 68)
+    np.testing.assert_allclose(matrix, expected, rtol=0, atol=1e-12)
+
+
+def test_batched_rows_match_single_claim_calls(make_analyzer, metadata_list):
+    analyzer = make_analyzer()
+    batch = analyzer._create_feature_matrix(metadata_list)
+    for row, metadata in zip(batch, metadata_list):
+        np.testing.assert_array_equal(row, analyzer._create_feature_matrix([metadata])[0])
+
+
+def test_embedding_matrix_pads_features_to_float32_vectors(make_analyzer, metadata_list):
+    analyzer = make_analyzer()
+    embeddings = analyzer._create_embedding_matrix(metadata_list)
+
+    assert embeddings.shape == (len(metadata_list), 768)
+    assert embeddings.dtype == np.float32
+    np.testing.assert_allclose(embeddings[:, :68], analyzer._create_feature_matrix(metadata_list), atol=1e-6)
+    assert len(analyzer._create_embedding_from_metadata(metadata_list[0])) == 768
@@ -0,0 +1,58 @@
+"""T-SQL translation of the reference snapshot against the SQL Server semantics the lookups rely on"""
+
+import pytest
+
+from reference_snapshot import translate_tsql
+
+
+def test_three_part_names_map_to_snapshot_tables():
+    query = "SELECT description FROM [_gems].[dbo].[icd10cm_codes_2018_fixed] WHERE icd10_code = ?"
+    assert translate_tsql(query) == "SELECT description FROM _gems__icd10cm_codes_2018_fixed WHERE icd10_code = ?"
+
+
+def test_top_becomes_limit_on_the_outer_query():
+    translated = translate_tsql("SELECT DISTINCT TOP 1 icd9_code FROM [_gems].[dbo].[vw_icd9_to_icd10_master];")
+    assert translated == "SELECT DISTINCT icd9_code FROM _gems__vw_icd9_to_icd10_master\nLIMIT 1"
+    assert translate_tsql("SELECT TOP (5) x FROM t") == "SELECT x FROM t\nLIMIT 5"
+
+
+def test_try_convert_float_and_single_top_only():
+    assert translate_tsql("SELECT TRY_CONVERT( FLOAT , nt.NCD_mnl_sect) FROM t") == \
+        "SELECT try_convert_float( nt.NCD_mnl_sect) FROM t"
+    with pytest.raises(ValueError):
+        translate_tsql("SELECT TOP 1 a FROM (SELECT TOP 2 a FROM t) s")
+
+
+def test_top_one_follows_order_by(snapshot_conn):
+    cursor = snapshot_conn.cursor()
+    cursor.execute("""
+        SELECT TOP 1 long_description, short_description
+        FROM [_ref].[dbo].[hcpcs_master]
+        WHERE hcpcs_code = ?
+        ORDER BY seqnum
+    """, ["36415"])
+    assert cursor.fetchall() == [("004Collection of venous blood by venipuncture", None)]
+
+
+def test_text_compares_case_insensitively(snapshot_conn):
+    cursor = snapshot_conn.execute(
+        "SELECT TOP 1 description FROM [_gems].[dbo].[icd10cm_codes_2018_fixed] WHERE icd10_code = ?", ["e119"]
+    )
+    assert cursor.fetchall() == [("Type 2 diabetes mellitus without complications",)]
+
+
+def test_try_convert_join_matches_numeric_sections(snapshot_conn):
+    query = """
+        SELECT TOP 1 nt.NCD_id, nt.NCD_trmntn_dt
+        FROM [_ncd].[dbo].[ncd_trkg] nt
+        INNER JOIN [_ncd].[dbo].[toc_hcpcs_matches] thm
+            ON TRY_CONVERT(FLOAT, nt.NCD_mnl_sect) = thm.section
+        WHERE thm.hcpcs_code = ?
+    """
+    assert snapshot_conn.execute(query, ["E0114"]).fetchall() == [(21, "2019-12-31")]
+    assert snapshot_conn.execute(query, ["G0299"]).fetchall() == []
+
+
+def test_snapshot_connection_is_read_only(snapshot_conn):
+    with pytest.raises(Exception):
+        snapshot_conn.execute("DELETE FROM [_ref].[dbo].[hcpcs_master]")
@@ -0,0 +1,188 @@
+"""ReportingWriter staging, stale-row DELETE and MERGE semantics against an in-memory results table"""
+
+from datetime import datetime
+
+import pytest
+
+# pyodbc raises a plain ImportError when the ODBC driver manager is missing
+pyodbc = pytest.importorskip("pyodbc", exc_type=ImportError)
+
+import reporting_writer  # noqa: E402  (after the importorskip)
+from reporting_writer import KEY_COLUMNS, RESULT_COLUMNS  # noqa: E402
+
+KEY_INDEXES = [RESULT_COLUMNS.index(column) for column in KEY_COLUMNS]
+
+
+class FakeReportingDatabase:
+    """
+    The results table plus the session temp tables, with the statements the writer
+    runs applied in Python; DELETE_STALE/MERGE work on a copy that commit() publishes
+    """
+
+    def __init__(self):
+        self.results = {}
+        self.connections = 0
+        self.inputsizes = []
+        self.fail_on = None
+
+    def connect(self, connection_string):
+        self.connections += 1
+        return FakeConnection(self)
+
+
+class FakeConnection:
+    def __init__(self, database):
+        self.database = database
+        self.pending = dict(database.results)
+        self.claims_stage = []
+        self.stage = []
+        self.closed = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.database.results = dict(self.pending)
+
+    def rollback(self):
+        self.pending = dict(self.database.results)
+
+    def close(self):
+        self.closed = True
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.fast_executemany = False
+
+    def setinputsizes(self, sizes):
+        self.conn.database.inputsizes.append(list(sizes))
+
+    def executemany(self, sql, params):
+        assert self.fast_executemany
+        if sql == reporting_writer.INSERT_CLAIMS_STAGING_SQL:
+            self.conn.claims_stage.extend(claim_id for claim_id, in params)
+        elif sql == reporting_writer.INSERT_STAGING_SQL:
+            self.conn.stage.extend(params)
+        else:
+            raise AssertionError(f"unexpected executemany: {sql}")
+
+    def execute(self, sql):
+        conn = self.conn
+        if sql == conn.database.fail_on:
+            raise pyodbc.Error("simulated failure")
+        if sql == reporting_writer.DELETE_STALE_SQL:
+            staged_keys = {_key(params) for params in conn.stage}
+            conn.pending = {key: row for key, row in conn.pending.items()
+                            if key[0] not in conn.claims_stage or key in staged_keys}
+        elif sql == reporting_writer.MERGE_SQL:
+            for params in conn.stage:
+                conn.pending[_key(params)] = params
+
+
+def _key(params):
+    return tuple(params[index] for index in KEY_INDEXES)
+
+
+def issue_row(clm_id, dx_position, hcpcs_position, level="OK"):
+    return {
+        "CLM_ID": clm_id, "DESYNPUF_ID": "P001", "clm_from_dt": "20240105", "clm_thru_dt": "2024-01-07",
+        "PRVDR_NUM": "123456", "dx_position": dx_position, "icd9_dgns_code": "4019",
+        "hcpcs_position": hcpcs_position, "hcpcs_code": "93000", "denial_risk_level": level,
+        "denial_risk_score": 0.0, "risk_category": "LOW",
+        "analysis_timestamp": "2024-01-08T10:15:30.123456",
+    }
+
+
+def result(clm_id, positions, level="OK"):
+    return {"claim_summary": {"CLM_ID": clm_id} if positions else {},
+            "detailed_issues": [issue_row(clm_id, dx, hcpcs, level) for dx, hcpcs in positions]}
+
+
+@pytest.fixture
+def database(monkeypatch):
+    database = FakeReportingDatabase()
+    monkeypatch.setattr(reporting_writer, "pooled_connect", database.connect)
+    return database
+
+
+def table_keys(database):
+    return sorted(database.results)
+
+
+def write(*results):
+    writer = reporting_writer.ReportingWriter("fake")
+    for item in results:
+        writer.add_result(item)
+    writer.flush()
+    return writer
+
+
+def test_reanalysis_deletes_stale_combinations_of_written_claims_only(database):
+    write(result("C100", [(1, 1), (1, 2), (2, 1)]), result("C200", [(1, 1), (1, 2)]))
+    write(result("C100", [(1, 1), (3, 1)], level="HIGH: NCCI PTP Conflict"))
+
+    assert table_keys(database) == [("C100", 1, 1), ("C100", 3, 1), ("C200", 1, 1), ("C200", 1, 2)]
+    merged = database.results[("C100", 1, 1)]
+    assert merged[RESULT_COLUMNS.index("denial_risk_level")] == "HIGH: NCCI PTP Conflict"
+
+
+def test_successful_empty_result_clears_the_claim(database):
+    write(result("C100", [(1, 1), (1, 2)]), result("C200", [(1, 1)]))
+    writer = reporting_writer.ReportingWriter("fake")
+    writer.add_result({"detailed_issues": [], "claim_summary": {}}, claim_id="C100")
+    writer.flush()
+
+    assert table_keys(database) == [("C200", 1, 1)]
+    assert writer.stats()["claims_cleared"] == 1
+
+
+def test_error_result_is_not_staged_and_keeps_last_good_rows(database):
+    write(result("C100", [(1, 1), (1, 2)]))
+    writer = reporting_writer.ReportingWriter("fake")
+    writer.add_result({"error": "connection reset", "detailed_issues": []}, claim_id="C100")
+
+    assert writer.flush() == 0
+    assert database.connections == 1
+    assert table_keys(database) == [("C100", 1, 1), ("C100", 1, 2)]
+    assert writer.stats()["errors_skipped"] == 1
+
+
+def test_overlong_claim_id_is_rejected_not_truncated(database):
+    long_id = "C" * (reporting_writer.CLAIM_ID_SIZE + 1)
+    write(result(long_id[:reporting_writer.CLAIM_ID_SIZE], [(1, 1)]))
+    writer = reporting_writer.ReportingWriter("fake")
+    writer.add_result(result(long_id, [(1, 2)]))
+    writer.add_result({"detailed_issues": []}, claim_id=long_id)
+    writer.flush()
+
+    assert table_keys(database) == [(long_id[:reporting_writer.CLAIM_ID_SIZE], 1, 1)]
+    assert writer.stats()["claims_rejected"] == 2
+
+
+def test_rows_bind_with_column_input_sizes(database):
+    write(result("C100", [(1, 1)]))
+
+    claim_sizes, row_sizes = database.inputsizes
+    assert claim_sizes == [(pyodbc.SQL_WVARCHAR, reporting_writer.CLAIM_ID_SIZE, 0)]
+    assert row_sizes[RESULT_COLUMNS.index("analysis_timestamp")] == (pyodbc.SQL_TYPE_TIMESTAMP, 27, 7)
+    row = database.results[("C100", 1, 1)]
+    assert row[RESULT_COLUMNS.index("analysis_timestamp")] == datetime(2024, 1, 8, 10, 15, 30, 123456)
+    assert row[RESULT_COLUMNS.index("clm_thru_dt")] == datetime(2024, 1, 7).date()
+
+
+def test_failed_flush_rolls_back_and_requeues(database):
+    write(result("C100", [(1, 1), (1, 2)]))
+    database.fail_on = reporting_writer.MERGE_SQL
+    writer = reporting_writer.ReportingWriter("fake")
+    writer.add_result(result("C100", [(2, 2)]))
+
+    with pytest.raises(pyodbc.Error):
+        writer.flush()
+    assert table_keys(database) == [("C100", 1, 1), ("C100", 1, 2)]
+    assert writer.stats()["rows_buffered"] == 1
+
+    database.fail_on = None
+    assert writer.flush() == 1
+    assert table_keys(database) == [("C100", 2, 2)]
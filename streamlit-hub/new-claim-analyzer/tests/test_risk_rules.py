@@ -0,0 +1,83 @@
+"""Vectorized risk rules against the per-pair _calculate_risk_analysis on the fixture claims"""
+
+import itertools
+
+import pytest
+
+from conftest import issue_rows, make_claim
+
+CLAIMS = [
+    # Major surgery first: PTP on the primary line, bundling, missing PA and modifiers, duplicate 36415
+    make_claim(),
+    # Short provider number, approved PA, modifiers present, 36415 over its frequency limit
+    make_claim("C200", provider="12345", prior_authorization=True,
+               modifiers={"27447": ["50", "51"], "93000": ["26"]},
+               hcpcs_codes=("93000", "27447", "36415", "36415", "36415", "36415", "36415")),
+    # Test provider, no major surgery (nothing bundles), partial modifiers
+    make_claim("C300", provider="999001", dx_codes=("25000", "V5869"),
+               hcpcs_codes=("36415", "80053", "G0299", "E0114"), modifiers={"27447": ["50"]}),
+    # Missing provider number, a single line
+    make_claim("C400", provider="", dx_codes=("4019",), hcpcs_codes=("E0114",)),
+    # Clean provider and no surgery, so the lower-priority rules decide
+    make_claim("C500", dx_codes=("4019", "25000", "V5869"), hcpcs_codes=("93000", "80053", "E0114")),
+]
+
+# Reference columns cycle through the values SQL hands back, including the falsy ones
+PTP_VALUES = ["Column 2 code 20680 bundled", None, "", 0, float("nan")]
+MUE_VALUES = [None, "3", 0, "", 7.0]
+NCD_VALUES = ["Terminated", None, "Active"]
+LCD_VALUES = ["N", "Y", None, "N"]
+
+
+def claim_pairs(claim):
+    dx_codes = list(claim["diagnosis_codes"].values())
+    hcpcs_codes = list(claim["procedure_codes"].values())
+    pairs = []
+    for index, ((dx_pos, dx_code), (hcpcs_pos, hcpcs_code)) in enumerate(
+            itertools.product(enumerate(dx_codes, 1), enumerate(hcpcs_codes, 1))):
+        pairs.append({
+            "dx_position": dx_pos, "icd9_dgns_code": dx_code, "mapped_icd10_code": None,
+            "hcpcs_position": hcpcs_pos, "hcpcs_code": hcpcs_code,
+            "ptp_denial_reason": PTP_VALUES[index % len(PTP_VALUES)],
+            "mue_threshold": MUE_VALUES[index % len(MUE_VALUES)],
+            "ncd_status": NCD_VALUES[index % len(NCD_VALUES)],
+            "lcd_icd10_covered_group": LCD_VALUES[index % len(LCD_VALUES)],
+        })
+    return pairs
+
+
+@pytest.mark.parametrize("claim", CLAIMS, ids=lambda claim: claim["CLM_ID"])
+def test_vectorized_rules_match_per_pair_rules(make_analyzer, claim):
+    from risk_rules import claim_procedure_codes
+
+    pairs = claim_pairs(claim)
+    all_procedures = claim_procedure_codes(claim)
+    per_pair = make_analyzer(vectorized_rules=False)._risk_analyses(pairs, claim, all_procedures)
+    vectorized = make_analyzer(vectorized_rules=True)._risk_analyses(pairs, claim, all_procedures)
+
+    assert vectorized == per_pair
+
+
+def test_fixture_pairs_reach_every_risk_level(make_analyzer):
+    from risk_rules import claim_procedure_codes
+
+    analyzer = make_analyzer(vectorized_rules=False)
+    levels = set()
+    for claim in CLAIMS:
+        levels.update(risk["denial_risk_level"] for risk in
+                      analyzer._risk_analyses(claim_pairs(claim), claim, claim_procedure_codes(claim)))
+
+    assert {level.split(": ")[-1] for level in levels} >= {
+        "Duplicate Procedure Billing", "NCCI PTP Conflict", "Global Period Bundling", "Primary DX Not Covered",
+        "Prior Authorization Missing", "Provider Credentialing Issue", "Required Modifier Missing", "MUE Risk",
+        "NCD Terminated", "Secondary DX Not Covered", "OK",
+    }
+
+
+@pytest.mark.parametrize("claim", CLAIMS, ids=lambda claim: claim["CLM_ID"])
+def test_analysis_rows_match_per_pair_rules(make_analyzer, claim):
+    per_pair = make_analyzer(vectorized_rules=False).analyze_new_claim(claim)
+    vectorized = make_analyzer(vectorized_rules=True).analyze_new_claim(claim)
+
+    assert issue_rows(vectorized) == issue_rows(per_pair)
+    assert vectorized["claim_summary"] == per_pair["claim_summary"]
@@ -6,10 +6,15 @@ Minimalistic, prestigious design with uniform fonts
 
 import streamlit as st
 import pandas as pd
-import pyodbc
+import os
+import sys
 from datetime import datetime
 import warnings
 
+# Shared modules live with the claim analysis tools
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "manuals", "Raw Data", "claim_analysis_tools"))
+from sql_connection_pool import pooled_connect
+
 # Suppress pandas warnings
 warnings.filterwarnings('ignore', category=UserWarning, module='pandas')
 
@@ -236,11 +241,17 @@ class ClaimAnalysisApp:
             f"UID={self.username};PWD={self.password};"
             "Encrypt=yes;TrustServerCertificate=yes;Connection Timeout=30;"
         )
+        
+        # Per-combination results to read: the SQL-side view, or the table that
+        # reporting_writer loads Python analyses into ([dbo].[claim_combination_risk_results])
+        self.results_source = os.environ.get(
+            "CLAIM_RESULTS_SOURCE", "[_reporting].[dbo].[vw_Enhanced_Claims_Risk_Analysis]"
+        )
     
     def get_connection(self):
-        """Get database connection"""
+        """Get database connection (from the shared pool; close() returns it)"""
         try:
-            return pyodbc.connect(self.conn_str)
+            return pooled_connect(self.conn_str)
         except Exception as e:
             st.error(f"Database connection failed: {e}")
             return None
@@ -252,7 +263,7 @@ class ClaimAnalysisApp:
             return None
         
         try:
-            query = """
+            query = f"""
             SELECT TOP 1
                 CLM_ID,
                 DESYNPUF_ID,
@@ -269,7 +280,7 @@ class ClaimAnalysisApp:
                 SUM(CASE WHEN denial_risk_level LIKE '%MEDIUM%' THEN 1 ELSE 0 END) as medium_issues,
                 SUM(CASE WHEN denial_risk_level LIKE '%LOW%' THEN 1 ELSE 0 END) as low_issues,
                 SUM(CASE WHEN denial_risk_level = 'OK' THEN 1 ELSE 0 END) as ok_combinations
-            FROM [_reporting].[dbo].[vw_Enhanced_Claims_Risk_Analysis]
+            FROM {self.results_source}
             WHERE CLM_ID = ?
             GROUP BY CLM_ID, DESYNPUF_ID, clm_from_dt, clm_thru_dt, PRVDR_NUM
             """
@@ -294,7 +305,7 @@ class ClaimAnalysisApp:
             return None
         
         try:
-            query = """
+            query = f"""
             SELECT 
                 dx_position,
                 icd9_dgns_code,
@@ -309,7 +320,7 @@ class ClaimAnalysisApp:
                 ptp_denial_reason,
                 mue_denial_type,
                 ncd_title
-            FROM [_reporting].[dbo].[vw_Enhanced_Claims_Risk_Analysis]
+            FROM {self.results_source}
             WHERE CLM_ID = ?
             ORDER BY 
                 CASE 
@@ -342,7 +353,7 @@ class ClaimAnalysisApp:
             return None
         
         try:
-            query = """
+            query = f"""
             SELECT 
                 dx_position,
                 icd9_dgns_code,
@@ -356,7 +367,7 @@ class ClaimAnalysisApp:
                 business_impact,
                 ptp_denial_reason,
                 mue_denial_type
-            FROM [_reporting].[dbo].[vw_Enhanced_Claims_Risk_Analysis]
+            FROM {self.results_source}
             WHERE CLM_ID = ? 
             AND denial_risk_level != 'OK'
             ORDER BY 